@@ -0,0 +1,86 @@
+"""
+The joblib `.sav` file is a pickle, so every process that loads it
+gets its own private, unpickled copy of the tree. The export below
+flattens the fitted tree into a handful of raw arrays that a server
+can memory-map read-only, so all workers share one page cache copy.
+
+File layout (all integers little-endian):
+
+| offset | size | contents                                   |
+---------------------------------------------------------------
+|   0    |  8   | magic b'PENGTREE'                          |
+|   8    |  4   | uint32 length of the JSON header           |
+|  12    |  n   | UTF-8 JSON header                          |
+|  ...   |  ... | zero padding up to a 64 byte boundary      |
+|  ...   |  ... | raw arrays, each aligned to 64 bytes       |
+
+The JSON header holds the feature names (in model order), the class
+names, the tree depth, and for every array its dtype, offset and shape.
+`sha256` is the digest of everything after the header padding.
+"""
+
+import hashlib
+import json
+import os
+import struct
+import sys
+
+MAGIC = b'PENGTREE'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def export_tree(model, feature_names, path):
+    tree = model.tree_
+
+    # Class index of the majority class at every node, used once a leaf is reached
+    arrays = {
+        'children_left': tree.children_left.astype('<i4'),
+        'children_right': tree.children_right.astype('<i4'),
+        'feature': tree.feature.astype('<i4'),
+        'threshold': tree.threshold.astype('<f8'),
+        'leaf_class': tree.value[:, 0, :].argmax(axis=1).astype('<i4'),
+    }
+
+    # Lay the arrays out back to back, each one starting on an aligned offset
+    layout = {}
+    payload = bytearray()
+    for name, array in arrays.items():
+        payload.extend(b'\0' * (_align(len(payload)) - len(payload)))
+        layout[name] = {'dtype': array.dtype.str, 'offset': len(payload), 'shape': list(array.shape)}
+        payload.extend(array.tobytes())
+
+    header = {
+        'format': FORMAT_VERSION,
+        'features': [str(name) for name in feature_names],
+        'classes': [str(name) for name in model.classes_],
+        'max_depth': int(tree.max_depth),
+        'node_count': int(tree.node_count),
+        'arrays': layout,
+        'sha256': hashlib.sha256(payload).hexdigest(),
+    }
+
+    # Array offsets in the header are relative to the start of the payload,
+    # so the header can be written before knowing its own padded length
+    header_bytes = json.dumps(header, sort_keys=True).encode('utf-8')
+    prefix = MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes
+    prefix += b'\0' * (_align(len(prefix)) - len(prefix))
+
+    with open(path, 'wb') as f:
+        f.write(prefix)
+        f.write(payload)
+
+    return header
+
+
+if __name__ == '__main__':
+    # Convert an existing joblib model, e.g. `python export.py ../Model.sav ../Model.tree`
+    import joblib
+
+    loaded_model = joblib.load(sys.argv[1])
+    export_tree(loaded_model, loaded_model.feature_names_in_,
+                sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(sys.argv[1])[0] + '.tree')
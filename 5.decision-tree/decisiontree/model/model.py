@@ -6,6 +6,7 @@ from sklearn.tree import DecisionTreeClassifier
 from sklearn.model_selection import train_test_split
 
 from accuracy import accuracy
+from export import export_tree
 from save_figure import save_figure
 
 # This example read from a local CSV file for simplicity,
@@ -59,3 +60,7 @@ accuracy(model, X_test, y_test)
 
 # Save model to root of module
 joblib.dump(model, os.path.join(os.path.dirname(__file__), '../Predict_PenguinSpecies_DecisionTree_Model.sav'))
+
+# Export a flat, memory-mappable copy of the tree for the server to share across workers
+export_tree(model, X_encoded.columns,
+            os.path.join(os.path.dirname(__file__), '../Predict_PenguinSpecies_DecisionTree_Model.tree'))
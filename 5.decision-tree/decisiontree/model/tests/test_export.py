@@ -0,0 +1,37 @@
+import hashlib
+import json
+import os
+import struct
+import tempfile
+from unittest import TestCase
+
+import joblib
+
+from ..export import ALIGNMENT, MAGIC, export_tree
+
+
+class PenguinExportTest(TestCase):
+
+    @staticmethod
+    def test_export_tree():
+        model = joblib.load(os.path.join(os.path.dirname(__file__), '../../Predict_PenguinSpecies_DecisionTree_Model.sav'))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'model.tree')
+            export_tree(model, model.feature_names_in_, path)
+
+            with open(path, 'rb') as f:
+                data = f.read()
+
+        # Header describes the features, classes and arrays of the tree
+        assert data[:len(MAGIC)] == MAGIC
+        (header_length,) = struct.unpack_from('<I', data, len(MAGIC))
+        header = json.loads(data[len(MAGIC) + 4:len(MAGIC) + 4 + header_length])
+
+        assert header['features'] == list(model.feature_names_in_)
+        assert header['classes'] == ['Adelie', 'Chinstrap', 'Gentoo']
+        assert header['node_count'] == model.tree_.node_count
+
+        # Payload starts on an aligned offset and matches its digest
+        payload_start = -(-(len(MAGIC) + 4 + header_length) // ALIGNMENT) * ALIGNMENT
+        assert hashlib.sha256(data[payload_start:]).hexdigest() == header['sha256']
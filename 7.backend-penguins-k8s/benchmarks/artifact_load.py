@@ -0,0 +1,91 @@
+"""
+Compare loading the Decision Tree with `joblib.load` against memory-mapping
+the flat `.tree` export.
+
+Every measurement runs in a fresh interpreter, so load times are cold-start
+times and RSS deltas only include what the loader itself pulled in.
+
+    python -m benchmarks.artifact_load [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+SAV_PATH = BASE_DIR / 'Predict_PenguinSpecies_DecisionTree_Model.sav'
+TREE_PATH = BASE_DIR / 'models' / 'penguins-2023-03-16.tree'
+
+ROW = [[39.1, 18.7, 181.0, 3750.0, 0, 1, 1]]
+
+
+def rss_kb():
+    # Resident set size of this process, read from procfs
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def child(loader):
+    before = rss_kb()
+    start = time.perf_counter()
+
+    if loader == 'joblib':
+        import warnings
+
+        import joblib
+        import pandas as pd
+
+        warnings.simplefilter('ignore')
+        model = joblib.load(SAV_PATH)
+        model.predict(pd.DataFrame(ROW, columns=model.feature_names_in_))
+    else:
+        sys.path.insert(0, str(BASE_DIR))
+        from penguins.artifact import TreeArtifact
+
+        TreeArtifact(TREE_PATH).predict(ROW)
+
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'seconds': elapsed, 'rss_kb': rss_kb() - before}))
+
+
+def measure(loader, runs):
+    results = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-m', 'benchmarks.artifact_load', '--child', loader],
+                                cwd=BASE_DIR, capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output))
+
+    return {
+        'loader': loader,
+        'median_ms': statistics.median(r['seconds'] for r in results) * 1000,
+        'median_rss_kb': statistics.median(r['rss_kb'] for r in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--child', choices=['joblib', 'mmap'])
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    print(f'{"loader":<8} {"load + first predict":>22} {"RSS added":>12}')
+    for loader in ('joblib', 'mmap'):
+        result = measure(loader, args.runs)
+        print(f'{loader:<8} {result["median_ms"]:>19.1f} ms {result["median_rss_kb"] / 1024:>9.1f} MB')
+
+    print(f'\nsize on disk: {os.path.getsize(SAV_PATH)} B (.sav), {os.path.getsize(TREE_PATH)} B (.tree)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""
+Requests per second of the DRF predict view against the plain Django fast
+path, both driven through the Django test client.
+
+    python -m benchmarks.predict_views [--duration 2]
+"""
+import argparse
+
+from benchmarks.utils import requests_per_second, setup_django
+from penguins.features import SAMPLE_PENGUIN
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--duration', type=float, default=2.0, help='Seconds per view')
+    args = parser.parse_args()
+
+    teardown = setup_django()
+    try:
+        from rest_framework.test import APIClient
+
+        client = APIClient()
+        results = {}
+        for name, path in (('drf', '/api/penguins/predict/'), ('fast', '/api/penguins/predict/fast/')):
+            results[name] = requests_per_second(lambda: client.post(path, SAMPLE_PENGUIN, format='json'), args.duration)
+            print(f'{name:<6} {path:<30} {results[name]:>8.0f} req/s')
+
+        print(f'\nfast path is {results["fast"] / results["drf"]:.1f}x the DRF view')
+    finally:
+        teardown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Per-request cost of the default settings against the API pod profile in
+`project/settings_production.py`, through the Django test client.
+
+Settings cannot change once Django is set up, so each profile runs in its
+own interpreter against its own throwaway test database.
+
+    python -m benchmarks.settings_profiles [--duration 2]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.utils import BASE_DIR, requests_per_second, setup_django
+from penguins.features import SAMPLE_PENGUIN
+
+PROFILES = {'default': 'project.settings', 'production': 'project.settings_production'}
+
+
+def child(duration):
+    teardown = setup_django()
+    try:
+        from django.db import connection
+        from rest_framework.test import APIClient
+
+        from penguins.models import Penguin
+
+        client = APIClient()
+        penguin = Penguin.objects.create(**SAMPLE_PENGUIN)
+        calls = {
+            'predict': lambda: client.post('/api/penguins/predict/', SAMPLE_PENGUIN, format='json'),
+            'detail': lambda: client.get(f'/api/penguins/{penguin.pk}/'),
+            'fast': lambda: client.post('/api/penguins/predict/fast/', SAMPLE_PENGUIN, format='json'),
+        }
+
+        results = {name: requests_per_second(call, duration) for name, call in calls.items()}
+
+        # With DEBUG every statement is formatted and logged; the log is reset when the next request starts
+        calls['predict']()
+        results['logged_queries'] = len(connection.queries)
+    finally:
+        teardown()
+
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--duration', type=float, default=2.0, help='Seconds per endpoint')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.duration)
+        return
+
+    results = {}
+    for profile, module in PROFILES.items():
+        # Throwaway values, production settings refuse to start without a key and allowed hosts
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': module, 'DJANGO_SECRET_KEY': 'benchmark',
+               'DJANGO_ALLOWED_HOSTS': 'localhost'}
+        output = subprocess.run([sys.executable, '-m', 'benchmarks.settings_profiles', '--child',
+                                 '--duration', str(args.duration)],
+                                cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True).stdout
+        results[profile] = json.loads(output.strip().splitlines()[-1])
+
+    default, production = results['default'], results['production']
+    print(f'{"endpoint":<10} {"default":>12} {"production":>12} {"saved/request":>15}')
+    for name in ('predict', 'detail', 'fast'):
+        saved = (1 / default[name] - 1 / production[name]) * 1e6
+        print(f'{name:<10} {default[name]:>8.0f} r/s {production[name]:>8.0f} r/s {saved:>12.0f} us')
+
+    print(f'\nSQL statements logged per predict request: {default["logged_queries"]} (default), '
+          f'{production["logged_queries"]} (production)')
+
+
+if __name__ == '__main__':
+    main()
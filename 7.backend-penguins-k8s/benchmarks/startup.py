@@ -0,0 +1,135 @@
+"""
+Start-up cost of the project, each phase timed in a fresh interpreter:
+`django.setup()`, loading the URL conf (what system checks, `manage.py`
+commands and the first request do) and the first prediction. One more run
+under `python -X importtime` shows which packages the time goes to.
+
+    python -m benchmarks.startup [--runs 5] [--top 15] [--output startup.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from benchmarks.utils import BASE_DIR
+
+PHASES = ('setup', 'urlconf', 'predict')
+
+# Marks the end of a phase in the `-X importtime` output, which goes to stderr
+PHASE_MARKER = 'phase: '
+
+
+def child():
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+    timings = {}
+
+    def done(phase, start):
+        timings[phase] = time.perf_counter() - start
+        print(f'{PHASE_MARKER}{phase}', file=sys.stderr, flush=True)
+
+    start = time.perf_counter()
+    import django
+
+    django.setup()
+    done('setup', start)
+
+    start = time.perf_counter()
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns
+    done('urlconf', start)
+
+    start = time.perf_counter()
+    from penguins.features import SAMPLE_PENGUIN
+    from penguins.models import Penguin
+    from penguins.service import PenguinService
+
+    PenguinService.predict(Penguin(**SAMPLE_PENGUIN))
+    done('predict', start)
+
+    print(json.dumps(timings))
+
+
+def run_child(importtime=False):
+    # Returns the phase timings and the child's stderr
+    command = [sys.executable, *(['-X', 'importtime'] if importtime else []), '-m', 'benchmarks.startup', '--child']
+    process = subprocess.run(command, cwd=BASE_DIR, capture_output=True, text=True, check=True)
+    return json.loads(process.stdout.strip().splitlines()[-1]), process.stderr
+
+
+def measure_phases(runs=5):
+    """
+    Seconds per start-up phase, median, min and max over `runs` fresh
+    interpreters, in the format of `benchmarks.utils.measure`.
+    """
+    timings = defaultdict(list)
+    for _ in range(runs):
+        for phase, seconds in run_child()[0].items():
+            timings[phase].append(seconds)
+
+    return {phase: {'median': statistics.median(values), 'min': min(values), 'max': max(values), 'number': 1,
+                    'repeat': runs} for phase, values in timings.items()}
+
+
+def parse_importtime(stderr):
+    """
+    Sum the `-X importtime` self times per phase and top level package,
+    returned as {phase: {package: (seconds, modules)}}.
+    """
+    packages = defaultdict(lambda: defaultdict(lambda: [0.0, 0]))
+    pending = defaultdict(lambda: [0.0, 0])
+
+    for line in stderr.splitlines():
+        if line.startswith(PHASE_MARKER):
+            packages[line[len(PHASE_MARKER):]] = pending
+            pending = defaultdict(lambda: [0.0, 0])
+        elif line.startswith('import time:') and not line.endswith('| imported package'):
+            self_us, _, name = line[len('import time:'):].split('|')
+            package = pending[name.strip().split('.')[0]]
+            package[0] += int(self_us) / 1e6
+            package[1] += 1
+
+    return {phase: {name: tuple(value) for name, value in modules.items()} for phase, modules in packages.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to time the phases in')
+    parser.add_argument('--top', type=int, default=15, help='Packages to list per phase')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    phases = measure_phases(args.runs)
+    imports = parse_importtime(run_child(importtime=True)[1])
+
+    print(f'{"phase":<10} {"median":>10} {"min":>10} {"max":>10}')
+    for phase in PHASES:
+        result = phases[phase]
+        print(f'{phase:<10} {result["median"] * 1e3:>7.1f} ms {result["min"] * 1e3:>7.1f} ms '
+              f'{result["max"] * 1e3:>7.1f} ms')
+
+    # Import times are inflated by `-X importtime` itself, compare them with each other rather than the phases
+    for phase in PHASES:
+        packages = sorted(imports.get(phase, {}).items(), key=lambda item: item[1][0], reverse=True)
+        total = sum(seconds for _, (seconds, _) in packages)
+        print(f'\nimports during {phase}: {total * 1e3:.1f} ms in {sum(count for _, (_, count) in packages)} modules')
+        for name, (seconds, count) in packages[:args.top]:
+            print(f'  {name:<24} {seconds * 1e3:>8.1f} ms {count:>5} modules')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'phases': phases, 'imports': imports}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
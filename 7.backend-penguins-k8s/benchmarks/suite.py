@@ -0,0 +1,258 @@
+"""
+Benchmark suite for the penguins service: model inference, serialization and
+the list, detail and predict endpoints, written to JSON with the environment
+it ran in.
+
+    python -m benchmarks.suite [--rows 10000 100000] [--only endpoint] [--output results.json]
+    python -m benchmarks.suite --baseline baseline.json [--threshold 0.1]
+    python -m benchmarks.suite --current results.json --baseline baseline.json
+
+Every result is seconds per call (median, min and max over `--repeat` runs).
+`startup.*` time `django.setup()`, URL conf loading and the first prediction
+in fresh interpreters (`benchmarks.startup` breaks them down per package).
+`service.predict.cold` is the first prediction in a fresh interpreter, model
+load included. Endpoints run through the Django test client against a test
+database filled to each `--rows` size; the list endpoint is not paginated, so
+it renders the whole table and the 1M row run takes minutes.
+
+With `--baseline`, medians more than `--threshold` slower than the baseline
+are reported as regressions and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from importlib import metadata
+
+from benchmarks.utils import BASE_DIR, measure, setup_django
+from penguins.features import SAMPLE_PENGUIN
+
+GROUPS = ('startup', 'service', 'inference', 'serializer', 'endpoint')
+
+BATCH_SIZES = (1, 100, 10000, 100000)
+SERIALIZER_SIZES = (1, 100, 10000)
+
+
+def penguins(count, seed=0):
+    # Plausible random measurements, the same for every run with the same seed
+    generator = random.Random(seed)
+    for _ in range(count):
+        yield {
+            'bill_length_mm': round(generator.uniform(32.0, 60.0), 1),
+            'bill_depth_mm': round(generator.uniform(13.0, 21.5), 1),
+            'flipper_length_mm': generator.randint(172, 231),
+            'body_mass_g': generator.randint(2700, 6300),
+            'island': generator.choice(('Biscoe', 'Dream', 'Torgersen')),
+            'sex': generator.choice(('male', 'female')),
+        }
+
+
+def environment():
+    from django.conf import settings
+    from django.db import connection
+
+    from penguins.registry import get_registry
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BASE_DIR, capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    model = get_registry().get(count=False)
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'commit': commit,
+        'python': sys.version.split()[0],
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'packages': {name: metadata.version(name) for name in ('Django', 'djangorestframework', 'numpy')},
+        'database': f'{connection.vendor} {connection.Database.sqlite_version}' if connection.vendor == 'sqlite'
+        else connection.vendor,
+        'debug': settings.DEBUG,
+        'model': {'version': model.name, 'sha256': model.artifact.sha256},
+    }
+
+
+def cold_child():
+    # First prediction in this interpreter, registry and artifact load included
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+
+    import django
+
+    django.setup()
+    from penguins.models import Penguin
+    from penguins.service import PenguinService
+
+    start = time.perf_counter()
+    PenguinService.predict(Penguin(**SAMPLE_PENGUIN))
+    print(json.dumps({'seconds': time.perf_counter() - start}))
+
+
+def bench_startup(results, args):
+    from benchmarks.startup import measure_phases
+
+    for phase, result in measure_phases(args.repeat).items():
+        results[f'startup.{phase}'] = result
+
+
+def bench_service(results, args):
+    from penguins.models import Penguin
+    from penguins.service import PenguinService
+
+    timings = []
+    for _ in range(args.repeat):
+        output = subprocess.run([sys.executable, '-m', 'benchmarks.suite', '--cold-child'], cwd=BASE_DIR,
+                                capture_output=True, text=True, check=True).stdout
+        timings.append(json.loads(output)['seconds'])
+    results['service.predict.cold'] = {'median': statistics.median(timings), 'min': min(timings),
+                                       'max': max(timings), 'number': 1, 'repeat': args.repeat}
+
+    penguin = Penguin(**SAMPLE_PENGUIN)
+    results['service.predict.warm'] = measure(lambda: PenguinService.predict(penguin), args.repeat)
+
+
+def bench_inference(results, args):
+    from penguins.batch import parse_record
+    from penguins.features import featurize
+    from penguins.registry import get_registry
+
+    model = get_registry().get(count=False).artifact
+    for size in BATCH_SIZES:
+        rows = [parse_record(record) for record in penguins(size)]
+        results[f'inference.batch.{size}'] = measure(lambda: model.predict(featurize(rows, model.features)),
+                                                     args.repeat)
+
+
+def bench_serializer(results, args):
+    from penguins.models import Penguin
+    from penguins.serializer import PenguinSerializer
+
+    for size in SERIALIZER_SIZES:
+        records = list(penguins(size))
+        instances = [Penguin(**record) for record in records]
+
+        results[f'serializer.encode.{size}'] = measure(lambda: PenguinSerializer(instances, many=True).data,
+                                                       args.repeat)
+        results[f'serializer.decode.{size}'] = measure(
+            lambda: PenguinSerializer(data=records, many=True).is_valid(raise_exception=True), args.repeat)
+
+
+def bench_endpoints(results, args):
+    from rest_framework.test import APIClient
+
+    from penguins.batch import chunked
+    from penguins.models import Penguin
+
+    client = APIClient()
+    generated = 0
+
+    for size in sorted(args.rows):
+        # Grow the table to the next size, reusing the rows of the previous one
+        new_rows = (Penguin(**record) for record in penguins(size - generated, seed=size))
+        for chunk in chunked(new_rows, 10000):
+            Penguin.objects.bulk_create(chunk)
+        generated = size
+
+        pk = Penguin.objects.order_by('pk').values_list('pk', flat=True)[size // 2]
+        calls = {
+            'list': lambda: client.get('/api/penguins/'),
+            'detail': lambda: client.get(f'/api/penguins/{pk}/'),
+            'predict': lambda: client.post('/api/penguins/predict/', SAMPLE_PENGUIN, format='json'),
+        }
+        for name, call in calls.items():
+            results[f'endpoint.{name}.{size}'] = measure(call, args.repeat, min_time=args.min_time)
+
+
+BENCHMARKS = {'startup': bench_startup, 'service': bench_service, 'inference': bench_inference,
+              'serializer': bench_serializer, 'endpoint': bench_endpoints}
+
+
+def compare(current, baseline, threshold):
+    # Returns (name, baseline median, current median) for every benchmark slower than allowed
+    regressions = []
+    for name, result in sorted(current['results'].items()):
+        before = baseline['results'].get(name)
+        if before is not None and result['median'] > before['median'] * (1 + threshold):
+            regressions.append((name, before['median'], result['median']))
+
+    return regressions
+
+
+def report(results, baseline=None):
+    print(f'{"benchmark":<28} {"median":>12} {"min":>12} {"baseline":>12} {"change":>8}')
+    for name, result in sorted(results.items()):
+        line = f'{name:<28} {_format(result["median"]):>12} {_format(result["min"]):>12}'
+        before = (baseline or {}).get(name)
+        if before is not None:
+            line += f' {_format(before["median"]):>12} {result["median"] / before["median"] - 1:>+8.1%}'
+        print(line)
+
+
+def _format(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds / scale:.2f} {unit}'
+    return f'{seconds / 1e-9:.0f} ns'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--only', nargs='+', choices=GROUPS, default=GROUPS, help='Benchmark groups to run')
+    parser.add_argument('--rows', nargs='+', type=int, default=[10000], help='Table sizes for the endpoints')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2, help='Minimum seconds per endpoint repeat')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--current', help='Compare this results file instead of running the suite')
+    parser.add_argument('--baseline', help='Results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Allowed slowdown, 0.1 is 10%%')
+    parser.add_argument('--cold-child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cold_child:
+        cold_child()
+        return
+
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        teardown = setup_django()
+        try:
+            current = {'environment': environment(), 'options': {'rows': args.rows, 'repeat': args.repeat},
+                       'results': {}}
+            for group in args.only:
+                BENCHMARKS[group](current['results'], args)
+        finally:
+            teardown()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    report(current['results'], baseline and baseline['results'])
+
+    if baseline is not None:
+        regressions = compare(current, baseline, args.threshold)
+        for name, before, after in regressions:
+            print(f'REGRESSION {name}: {_format(before)} -> {_format(after)}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    """
+    Configure Django against a throwaway test database, like the test runner
+    does, so benchmarks never touch `db.sqlite3`. Returns a teardown callable.
+    """
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+
+    import django
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    django.setup()
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+
+    def teardown():
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    return teardown
+
+
+def requests_per_second(call, duration=2.0, warmup=50):
+    for _ in range(warmup):
+        call()
+
+    count = 0
+    start = time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < duration:
+        call()
+        count += 1
+
+    return count / elapsed
+
+
+def measure(call, repeat=5, min_time=0.2):
+    """
+    Seconds per call, timeit style: the loop count is raised until one
+    repeat takes at least `min_time`, then the repeats are summarized.
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        if (elapsed := time.perf_counter() - start) >= min_time or number >= 1 << 20:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+
+    timings = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        timings.append((time.perf_counter() - start) / number)
+
+    return {'median': statistics.median(timings), 'min': min(timings), 'max': max(timings), 'number': number,
+            'repeat': repeat}
@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def strict_query_budgets(settings):
+    # Any test request over its PENGUINS_QUERY_BUDGETS entry fails the test
+    settings.PENGUINS_QUERY_BUDGET_STRICT = True
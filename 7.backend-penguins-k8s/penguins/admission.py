@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+from penguins.metrics import get_metrics
+
+
+class Rejected(Exception):
+    # `reason` is 'queue_full' or 'timeout', used as a metrics label
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class AdmissionController:
+    """
+    Lets at most `limit` predict requests run at once in this process. Up to
+    `queue_size` more wait, in arrival order, until a slot frees up or their
+    deadline passes; anything beyond that is rejected straight away, so a
+    spike is shed in microseconds instead of piling up behind inference
+    until every request times out together.
+
+        controller.acquire(timeout=0.5)   # raises Rejected
+        try:
+            ...
+        finally:
+            controller.release()
+    """
+
+    def __init__(self, limit, queue_size, timeout):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiters = deque()
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    @property
+    def queue_depth(self):
+        return len(self._waiters)
+
+    def acquire(self, timeout=None, queued=0.0):
+        # `queued` is how long the request already waited for a thread of the server, it counts towards the timeout
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+        if queued and queued >= timeout:
+            raise Rejected('timeout')
+        timeout -= queued
+
+        with self._lock:
+            if self._in_flight < self.limit and not self._waiters:
+                self._in_flight += 1
+                return queued
+            if len(self._waiters) >= self.queue_size or timeout <= 0:
+                raise Rejected('queue_full')
+
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+
+        start = time.perf_counter()
+        if waiter.wait(timeout):
+            return queued + time.perf_counter() - start
+
+        with self._lock:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                # Handed a slot between the timeout and taking the lock, keep it
+                return queued + time.perf_counter() - start
+
+        raise Rejected('timeout')
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                # The slot passes straight to the oldest waiter, so the count stays the same
+                self._waiters.popleft().set()
+            else:
+                self._in_flight -= 1
+
+
+class ReleasingIterator:
+    # Holds the slot of a streamed response until the last chunk is sent or the response is closed
+    def __init__(self, iterable, release):
+        self.iterator = iter(iterable)
+        self.release = release
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self.iterator)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        release, self.release = self.release, None
+        if release is not None:
+            getattr(self.iterator, 'close', lambda: None)()
+            release()
+
+
+_arrival = threading.local()
+
+
+def arrived(at):
+    # Called by the server on the thread about to handle a request, with when it came in (`time.monotonic()`)
+    _arrival.at = at
+
+
+def queued_for():
+    # Seconds the request of this thread waited before a thread picked it up, 0 when the server does not tell
+    at = getattr(_arrival, 'at', None)
+    return 0.0 if at is None else max(0.0, time.monotonic() - at)
+
+
+def report(controller):
+    metrics = get_metrics()
+    metrics.set('penguins_admission_in_flight', controller.in_flight)
+    metrics.set('penguins_admission_queue_depth', controller.queue_depth)
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_admission() -> AdmissionController:
+    global _controller
+
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                # `manage.py serve` sizes the limit from the threads of a worker when it is not set
+                _controller = AdmissionController(settings.PENGUINS_ADMISSION_LIMIT or os.cpu_count() or 1,
+                                                  settings.PENGUINS_ADMISSION_QUEUE_SIZE,
+                                                  settings.PENGUINS_ADMISSION_TIMEOUT)
+
+    return _controller
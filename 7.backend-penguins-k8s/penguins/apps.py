@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class PenguinsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'penguins'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from penguins.models import Penguin
+        from penguins.similarity import penguin_deleted, penguin_saved
+
+        # Keeps an in-use similarity index current between rebuilds
+        post_save.connect(penguin_saved, sender=Penguin, dispatch_uid='penguins.similarity.saved')
+        post_delete.connect(penguin_deleted, sender=Penguin, dispatch_uid='penguins.similarity.deleted')
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import mmap
+import struct
+
+# Layout written by `5.decision-tree/decisiontree/model/export.py`
+MAGIC = b'PENGTREE'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+
+class ArtifactError(Exception):
+    pass
+
+
+class TreeArtifact:
+    """
+    Decision Tree exported as flat arrays and memory-mapped read-only.
+
+    Nothing is unpickled: the arrays are views straight into the mapped
+    file, so every worker process on a node shares the same page cache
+    copy and loading costs a header parse rather than rebuilding the tree.
+
+    numpy is imported when an artifact is first loaded, not with this module,
+    so commands and URL loading that never predict do not pay for it.
+    """
+
+    def __init__(self, path, verify=True):
+        import numpy as np
+
+        self.path = str(path)
+
+        with open(self.path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ArtifactError(f'{self.path} is not a decision tree artifact')
+
+        (header_length,) = struct.unpack_from('<I', self._mmap, len(MAGIC))
+        header_end = len(MAGIC) + 4 + header_length
+        self.header = json.loads(self._mmap[len(MAGIC) + 4:header_end])
+
+        if self.header['format'] != FORMAT_VERSION:
+            raise ArtifactError(f'Unsupported artifact format {self.header["format"]}')
+
+        payload_start = (header_end + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+        payload = memoryview(self._mmap)[payload_start:]
+
+        if verify and hashlib.sha256(payload).hexdigest() != self.header['sha256']:
+            raise ArtifactError(f'{self.path} does not match its sha256 header')
+
+        arrays = {}
+        for name, spec in self.header['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            count = int(np.prod(spec['shape']))
+            arrays[name] = np.frombuffer(payload, dtype=dtype, count=count,
+                                         offset=spec['offset']).reshape(spec['shape'])
+
+        self.children_left = arrays['children_left']
+        self.children_right = arrays['children_right']
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.leaf_class = arrays['leaf_class']
+
+        self.features = self.header['features']
+        self.classes = np.array(self.header['classes'])
+        self.sha256 = self.header['sha256']
+
+    def predict_indices(self, x):
+        import numpy as np
+
+        # Scikit Learn compares float32 features against float64 thresholds, so do the same
+        x = np.asarray(x, dtype=np.float32).reshape(-1, len(self.features))
+        rows = np.arange(len(x))
+        node = np.zeros(len(x), dtype=np.intp)
+
+        # Walk every row down the tree one level at a time
+        for _ in range(self.header['max_depth']):
+            feature = self.feature[node]
+            leaf = feature < 0
+            if leaf.all():
+                break
+
+            go_left = x[rows, np.where(leaf, 0, feature)] <= self.threshold[node]
+            node = np.where(leaf, node, np.where(go_left, self.children_left[node], self.children_right[node]))
+
+        return self.leaf_class[node]
+
+    def predict(self, x):
+        return self.classes[self.predict_indices(x)]
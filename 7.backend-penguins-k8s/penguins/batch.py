@@ -0,0 +1,150 @@
+import codecs
+import csv
+import io
+import json
+import re
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from penguins.features import featurize
+from penguins.models import Penguin
+from penguins.serializer import check_measurements
+
+INPUT_FIELDS = ('island', 'sex', 'bill_length_mm', 'bill_depth_mm', 'flipper_length_mm', 'body_mass_g')
+OUTPUT_FIELDS = ('species', 'error')
+
+DECIMAL_FIELDS = ('bill_length_mm', 'bill_depth_mm')
+INTEGER_FIELDS = ('flipper_length_mm', 'body_mass_g')
+
+SEX_CHOICES = set(Penguin.Sex.values)
+TRAILING_ZEROS = re.compile(r'\.0*\s*$')
+
+
+def parse_record(record):
+    """
+    Turn one raw CSV/NDJSON record into a `FEATURE_FIELDS` tuple, applying the
+    same field rules as `PenguinSerializer` without building a serializer
+    per row. Raises `ValueError` with a readable message for invalid rows.
+    """
+    # NDJSON values may be lists or objects, which are neither valid nor hashable for the choice lookup
+    island = record.get('island')
+    if not island or not isinstance(island, str) or len(island) > 50:
+        raise ValueError('island: A valid island of at most 50 characters is required')
+
+    sex = record.get('sex')
+    if sex is None or sex == '':
+        sex = Penguin.Sex.NA
+    if not isinstance(sex, str) or sex not in SEX_CHOICES:
+        raise ValueError(f'sex: "{sex}" is not a valid choice')
+
+    data = {}
+    for field in DECIMAL_FIELDS:
+        try:
+            value = Decimal(str(record[field]).strip())
+        except (KeyError, InvalidOperation):
+            raise ValueError(f'{field}: A valid number is required')
+        if not value.is_finite() or value.as_tuple().exponent < -1 or abs(value) >= 10000:
+            raise ValueError(f'{field}: Ensure no more than 5 digits and 1 decimal place')
+        data[field] = value
+
+    for field in INTEGER_FIELDS:
+        try:
+            data[field] = int(TRAILING_ZEROS.sub('', str(record[field])))
+        except (KeyError, ValueError):
+            raise ValueError(f'{field}: A valid integer is required')
+
+    error = check_measurements(data)
+    if error is not None:
+        raise ValueError(error)
+
+    return (data['bill_length_mm'], data['bill_depth_mm'], data['flipper_length_mm'], data['body_mass_g'],
+            island, sex)
+
+
+def score_records(records, model):
+    """
+    Score a chunk of raw records with one vectorized model call. Returns a
+    `(species, error)` pair per record, in order; invalid rows get an empty
+    species and the validation message instead of failing the chunk.
+    """
+    results = [('', '')] * len(records)
+    rows, positions = [], []
+
+    for position, record in enumerate(records):
+        try:
+            rows.append(parse_record(record))
+            positions.append(position)
+        except ValueError as e:
+            results[position] = ('', str(e))
+
+    if rows:
+        for position, species in zip(positions, model.predict(featurize(rows, model.features)).tolist()):
+            results[position] = (species, '')
+
+    return results
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def read_csv(stream):
+    # Decode lazily, so only the current line of a large upload is held in memory
+    return csv.DictReader(codecs.iterdecode(stream, 'utf-8-sig'))
+
+
+def read_ndjson(stream):
+    for line in codecs.iterdecode(stream, 'utf-8'):
+        if line.strip():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = {}
+            yield record if isinstance(record, dict) else {}
+
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson}
+
+
+def write_csv(text):
+    writer = csv.writer(text)
+    header = []
+
+    def write(record, result):
+        # Echo the input columns, then append the prediction
+        if not header:
+            header.extend(record.keys() if record else INPUT_FIELDS)
+            writer.writerow([*header, *OUTPUT_FIELDS])
+        writer.writerow([*(record.get(field, '') for field in header), *result])
+
+    return write
+
+
+def write_ndjson(text):
+    def write(record, result):
+        text.write(json.dumps({**record, **dict(zip(OUTPUT_FIELDS, result))}) + '\n')
+
+    return write
+
+
+WRITERS = {'csv': write_csv, 'ndjson': write_ndjson}
+
+
+def stream_scored(records, model, writer, chunk_size):
+    """
+    Generator form of the batch pipeline for streamed responses: reads
+    `chunk_size` records, scores them and yields the rendered chunk, so at
+    most one chunk of input and output is held in memory at a time.
+    """
+    buffer = io.StringIO()
+    write = writer(buffer)
+
+    for chunk in chunked(records, chunk_size):
+        for record, result in zip(chunk, score_records(chunk, model)):
+            write(record, result)
+
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
@@ -0,0 +1,70 @@
+import threading
+import tracemalloc
+
+# Allocations made by the tracing machinery itself are noise in every report
+IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+class MemoryTracer:
+    """
+    Start/stop wrapper around `tracemalloc` that keeps a baseline snapshot,
+    so reports show what has been allocated, and is still alive, since
+    tracing started or since the last reset.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._baseline = None
+
+    @property
+    def tracing(self):
+        return tracemalloc.is_tracing()
+
+    def start(self, frames=1):
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+            self._baseline = self._snapshot()
+
+    def reset(self):
+        with self._lock:
+            if tracemalloc.is_tracing():
+                self._baseline = self._snapshot()
+
+    def stop(self):
+        with self._lock:
+            tracemalloc.stop()
+            self._baseline = None
+
+    def report(self, limit=20, group_by='lineno'):
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                return {'tracing': False}
+
+            snapshot = self._snapshot()
+            if self._baseline is None:
+                self._baseline = snapshot
+            stats = snapshot.compare_to(self._baseline, group_by)
+            current, peak = tracemalloc.get_traced_memory()
+
+        # Largest growth first, grouped by file (and line) of the allocation site
+        top = []
+        for stat in stats[:limit]:
+            frame = stat.traceback[0]
+            top.append({'file': frame.filename, 'line': frame.lineno if group_by == 'lineno' else None,
+                        'size_diff': stat.size_diff, 'size': stat.size,
+                        'count_diff': stat.count_diff, 'count': stat.count})
+
+        return {'tracing': True, 'traced_bytes': current, 'peak_bytes': peak, 'group_by': group_by, 'top': top}
+
+    @staticmethod
+    def _snapshot():
+        return tracemalloc.take_snapshot().filter_traces(IGNORED)
+
+
+memory_tracer = MemoryTracer()
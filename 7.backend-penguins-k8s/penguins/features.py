@@ -0,0 +1,31 @@
+# Penguin fields needed to build a feature row, in the order rows are passed around
+FEATURE_FIELDS = ('bill_length_mm', 'bill_depth_mm', 'flipper_length_mm', 'body_mass_g', 'island', 'sex')
+
+NUMERIC_FIELDS = FEATURE_FIELDS[:4]
+
+# A typical Adelie penguin, the request benchmarks, load tests and the model warm-up send
+SAMPLE_PENGUIN = {'bill_length_mm': 39.1, 'bill_depth_mm': 18.7, 'flipper_length_mm': 181.0,
+                  'body_mass_g': 3750.0, 'island': 'Torgersen', 'sex': 'male'}
+
+
+def featurize(rows, features):
+    """
+    Build a float32 feature matrix, in the model's feature order, from rows of
+    `FEATURE_FIELDS` values. This is the vectorized form of
+    `Penguin.formatted_data()`: numeric fields pass through and one hot
+    encoded columns such as `island_Dream` become `island == 'Dream'`.
+    """
+    import numpy as np
+
+    columns = list(zip(*rows)) or [()] * len(FEATURE_FIELDS)
+    values = dict(zip(FEATURE_FIELDS, columns))
+
+    matrix = np.empty((len(values['island']), len(features)), dtype=np.float32)
+    for i, name in enumerate(features):
+        if name in NUMERIC_FIELDS:
+            matrix[:, i] = np.asarray(values[name], dtype=np.float64)
+        else:
+            field, _, category = name.partition('_')
+            matrix[:, i] = np.asarray(values[field], dtype=object) == category
+
+    return matrix
@@ -0,0 +1,210 @@
+import io
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files import File
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from penguins.batch import READERS, WRITERS, chunked, score_records
+from penguins.models import PredictionJob
+from penguins.registry import get_registry
+
+logger = logging.getLogger(__name__)
+
+UNFINISHED = [PredictionJob.Status.QUEUED, PredictionJob.Status.RUNNING]
+
+# Seconds a queued job waits before checking again for a free running slot on the node
+CLAIM_INTERVAL = 1.0
+
+_executor = None
+_executor_lock = threading.Lock()
+_in_flight = 0
+_accepting = True
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class CountingReader(io.RawIOBase):
+    # Wraps the uploaded file to track how many bytes have been consumed, for progress
+    def __init__(self, stream):
+        self.stream = stream
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.stream.read(len(buffer))
+        self.bytes_read += len(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.PENGUINS_JOB_WORKERS,
+                                               thread_name_prefix='penguins-job')
+
+    return _executor
+
+
+def worker_id(pid=None):
+    return f'{socket.gethostname()}:{pid or os.getpid()}'
+
+
+def on_this_host():
+    return Q(worker__startswith=f'{socket.gethostname()}:')
+
+
+def fail_orphaned(pid=None):
+    """
+    Mark the jobs a process on this host accepted but never finished as
+    failed, as they only ever run in that process's executor. With a `pid`,
+    only that process's jobs, otherwise every process's on this host, for
+    when the server starts before any worker runs. Returns how many failed.
+    """
+    if pid is not None:
+        owner = Q(worker=worker_id(pid))
+    else:
+        # Jobs from before owners were recorded are treated as this host's
+        owner = on_this_host() | Q(worker='')
+
+    return PredictionJob.objects.filter(owner, status__in=UNFINISHED) \
+        .update(status=PredictionJob.Status.FAILED, error='The server process running the job exited, submit it again',
+                finished_at=timezone.now())
+
+
+def create(**fields) -> PredictionJob:
+    """
+    Record a job accepted by this process. Raises `JobQueueFull` when the
+    node already has `PENGUINS_JOB_MAX_PENDING` unfinished jobs, counted in
+    the table so every worker process of the server shares the limit.
+    """
+    with transaction.atomic():
+        unfinished = PredictionJob.objects.select_for_update().filter(on_this_host(), status__in=UNFINISHED)
+        if len(unfinished.values_list('pk', flat=True)) >= settings.PENGUINS_JOB_MAX_PENDING:
+            raise JobQueueFull()
+
+        return PredictionJob.objects.create(worker=worker_id(), **fields)
+
+
+def stop_if_idle():
+    """
+    Stop this process from taking jobs, unless it runs some, for a worker
+    about to be recycled. Returns whether it stopped, after which `submit`
+    raises `JobQueueFull`.
+    """
+    global _accepting
+
+    with _executor_lock:
+        if _in_flight:
+            return False
+        _accepting = False
+        return True
+
+
+def submit(job: PredictionJob):
+    global _in_flight
+
+    with _executor_lock:
+        if not _accepting:
+            raise JobQueueFull()
+        _in_flight += 1
+
+    get_executor().submit(_run_in_worker, job.pk)
+
+
+def _run_in_worker(job_id):
+    global _in_flight
+
+    try:
+        run_job(job_id)
+    finally:
+        # Worker threads own their database connections
+        connections.close_all()
+        with _executor_lock:
+            _in_flight -= 1
+
+
+def claim(job_id):
+    """
+    Wait until fewer than `PENGUINS_JOB_WORKERS` jobs run on this node, in
+    any worker process, then mark the job running. Returns False when the
+    job is no longer queued, e.g. because it was submitted twice.
+    """
+    while True:
+        with transaction.atomic():
+            running = PredictionJob.objects.select_for_update() \
+                .filter(on_this_host(), status=PredictionJob.Status.RUNNING).values_list('pk', flat=True)
+            queued = PredictionJob.objects.filter(pk=job_id, status=PredictionJob.Status.QUEUED)
+            if not queued.exists():
+                return False
+            if len(running) < settings.PENGUINS_JOB_WORKERS:
+                return bool(queued.update(status=PredictionJob.Status.RUNNING, started_at=timezone.now()))
+
+        time.sleep(CLAIM_INTERVAL)
+
+
+def run_job(job_id):
+    if not claim(job_id):
+        return
+
+    job = PredictionJob.objects.get(pk=job_id)
+
+    try:
+        model = get_registry().get(job.model_version).artifact
+
+        with job.input_file.open('rb') as upload, tempfile.TemporaryFile(mode='w+b') as output:
+            reader = CountingReader(upload)
+            records = READERS[job.input_format](io.BufferedReader(reader))
+            text = io.TextIOWrapper(output, encoding='utf-8', newline='')
+            write = WRITERS[job.input_format](text)
+
+            for chunk in chunked(records, settings.PENGUINS_JOB_CHUNK_SIZE):
+                results = score_records(chunk, model)
+                for record, result in zip(chunk, results):
+                    write(record, result)
+
+                job.rows_processed += len(chunk)
+                job.rows_failed += sum(1 for _, error in results if error)
+                job.bytes_read = reader.bytes_read
+                job.save(update_fields=['rows_processed', 'rows_failed', 'bytes_read'])
+
+            text.flush()
+            output.seek(0)
+            job.output_file.save(f'{job.pk}.{job.input_format}', File(output), save=False)
+            text.detach()
+
+        job.status = PredictionJob.Status.SUCCEEDED
+    except Exception as e:
+        logger.exception('Prediction job %s failed', job.pk)
+        job.status = PredictionJob.Status.FAILED
+        job.error = str(e)
+
+    job.finished_at = timezone.now()
+    job.save()
+
+
+def input_format(upload, requested=None):
+    if requested in PredictionJob.Format.values:
+        return requested
+
+    extension = os.path.splitext(upload.name or '')[1].lower()
+    if extension in ('.ndjson', '.jsonl') or upload.content_type in ('application/x-ndjson', 'application/jsonl'):
+        return PredictionJob.Format.NDJSON
+
+    return PredictionJob.Format.CSV
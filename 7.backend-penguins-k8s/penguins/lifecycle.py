@@ -0,0 +1,127 @@
+import logging
+import os
+import signal
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.migrations.executor import MigrationExecutor
+
+from penguins.features import FEATURE_FIELDS, SAMPLE_PENGUIN, featurize
+from penguins.registry import get_registry
+
+logger = logging.getLogger(__name__)
+
+# Exercises the model before traffic arrives
+WARMUP_ROW = tuple(SAMPLE_PENGUIN[field] for field in FEATURE_FIELDS)
+
+
+class Lifecycle:
+    """
+    Pod lifecycle for the Kubernetes probes.
+
+    `startup()` verifies every migration is applied, loads the default model
+    through the registry (which checks the artifact's sha256) and runs
+    warm-up inferences, retrying until it succeeds. Only then is the pod
+    ready. On SIGTERM it stops being ready, waits `PENGUINS_DRAIN_DELAY`
+    for the endpoints to drop it, lets in-flight requests finish for up to
+    `PENGUINS_DRAIN_TIMEOUT` and then exits through the previous handler.
+    """
+
+    def __init__(self):
+        self.migrations = False
+        self.model = None
+        self.warm = False
+        self.draining = False
+        self.error = None
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._idle = threading.Condition(self._lock)
+        self._previous_handler = None
+
+    @property
+    def ready(self):
+        return self.migrations and self.model is not None and self.warm and not self.draining
+
+    def status(self):
+        return {'ready': self.ready, 'migrations': self.migrations, 'model': self.model, 'warm': self.warm,
+                'draining': self.draining, 'in_flight': self._in_flight, 'error': self.error}
+
+    def startup(self):
+        try:
+            executor = MigrationExecutor(connection)
+            pending = executor.migration_plan(executor.loader.graph.leaf_nodes())
+            if pending:
+                raise RuntimeError(f'{len(pending)} migrations are not applied')
+            self.migrations = True
+
+            model = get_registry().get(count=False)
+            for size in (1, settings.PENGUINS_WARMUP_BATCH_SIZE):
+                for _ in range(settings.PENGUINS_WARMUP_ROUNDS):
+                    model.artifact.predict(featurize([WARMUP_ROW] * size, model.artifact.features))
+            self.model = model.name
+            self.warm = True
+            self.error = None
+        except Exception as e:
+            self.error = str(e)
+            raise
+
+    def start(self, retry_interval=5.0):
+        # Start up in the background, so liveness answers while the model loads
+        def run():
+            try:
+                while not self.ready and not self.draining:
+                    try:
+                        self.startup()
+                        logger.info('Ready with model %s', self.model)
+                    except Exception:
+                        logger.exception('Start up failed, retrying in %.0fs', retry_interval)
+                        time.sleep(retry_interval)
+            finally:
+                connections.close_all()
+
+        threading.Thread(target=run, name='penguins-startup', daemon=True).start()
+        self.install_drain_handler()
+
+    def request_started(self):
+        with self._lock:
+            self._in_flight += 1
+
+    def request_finished(self):
+        with self._lock:
+            self._in_flight -= 1
+            if not self._in_flight:
+                self._idle.notify_all()
+
+    def drain(self, delay, timeout):
+        # Returns whether every in-flight request finished in time
+        self.draining = True
+        time.sleep(delay)
+
+        with self._lock:
+            return self._idle.wait_for(lambda: not self._in_flight, timeout)
+
+    def install_drain_handler(self):
+        try:
+            self._previous_handler = signal.signal(signal.SIGTERM, self._handle_sigterm)
+        except ValueError:
+            # Not the main thread, the server owns the signals
+            pass
+
+    def _handle_sigterm(self, signum, frame):
+        # Whatever handled SIGTERM before, or the default which exits, gets the signal once drained.
+        # Restoring it right away means a second SIGTERM stops the process without waiting
+        previous = self._previous_handler
+        signal.signal(signal.SIGTERM, previous if previous not in (None, signal.SIG_IGN) else signal.SIG_DFL)
+
+        def run():
+            drained = self.drain(settings.PENGUINS_DRAIN_DELAY, settings.PENGUINS_DRAIN_TIMEOUT)
+            logger.info('Drained, %s', 'exiting' if drained else f'{self._in_flight} requests still in flight')
+            os.kill(os.getpid(), signal.SIGTERM)
+
+        threading.Thread(target=run, name='penguins-drain', daemon=True).start()
+
+
+lifecycle = Lifecycle()
@@ -0,0 +1,253 @@
+import asyncio
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+
+from penguins.features import SAMPLE_PENGUIN
+
+SCENARIOS = ('predict', 'batch', 'list', 'detail')
+
+
+def build_requests(batch_size=100, pks=()):
+    """
+    `(method, path, body, content_type)` factories per scenario. `batch`
+    posts a CSV of `batch_size` penguins to the streaming predict endpoint,
+    `detail` reads a random one of `pks`.
+    """
+    predict_body = json.dumps(SAMPLE_PENGUIN).encode()
+    header = ','.join(SAMPLE_PENGUIN)
+    row = ','.join(str(value) for value in SAMPLE_PENGUIN.values())
+    batch_body = '\n'.join([header, *[row] * batch_size]).encode()
+
+    requests = {
+        'predict': lambda: ('POST', '/api/penguins/predict/', predict_body, 'application/json'),
+        'batch': lambda: ('POST', '/api/penguins/predict/stream/', batch_body, 'text/csv'),
+        'list': lambda: ('GET', '/api/penguins/', None, None),
+    }
+    if pks:
+        requests['detail'] = lambda: ('GET', f'/api/penguins/{random.choice(pks)}/', None, None)
+
+    return requests
+
+
+def parse_mix(value):
+    # "predict=70,list=10" -> {'predict': 70.0, 'list': 10.0}
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f'Unknown scenario "{name}", expected one of {", ".join(SCENARIOS)}')
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise ValueError(f'Weight of "{name}" must be a number')
+
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError('The traffic mix needs at least one scenario with a positive weight')
+
+    return mix
+
+
+class Recorder:
+    # Latencies per scenario, shared by every worker
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, scenario, seconds, ok):
+        with self.lock:
+            self.latencies.setdefault(scenario, []).append(seconds)
+            if not ok:
+                self.errors[scenario] = self.errors.get(scenario, 0) + 1
+
+    def summary(self, elapsed):
+        scenarios = {name: _summarize(latencies, self.errors.get(name, 0), elapsed)
+                     for name, latencies in sorted(self.latencies.items())}
+        everything = [latency for latencies in self.latencies.values() for latency in latencies]
+        return {'duration': elapsed, 'total': _summarize(everything, sum(self.errors.values()), elapsed),
+                'scenarios': scenarios}
+
+
+def percentile(ordered, q):
+    # Nearest rank on an already sorted list
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+def _summarize(latencies, errors, elapsed):
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'error_rate': errors / len(ordered) if ordered else 0.0,
+        'throughput': len(ordered) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(ordered, 50) * 1000,
+        'p95_ms': percentile(ordered, 95) * 1000,
+        'p99_ms': percentile(ordered, 99) * 1000,
+        'max_ms': (ordered[-1] if ordered else 0.0) * 1000,
+    }
+
+
+class WsgiTransport:
+    # In-process through Django's WSGI handler, one test client per worker thread
+    def __init__(self, server_name):
+        from django.test import Client
+
+        self.local = threading.local()
+        self.make_client = lambda: Client(SERVER_NAME=server_name)
+
+    def __call__(self, method, path, body, content_type):
+        client = getattr(self.local, 'client', None) or self.make_client()
+        self.local.client = client
+
+        if method == 'GET':
+            response = client.get(path)
+        else:
+            response = client.post(path, body, content_type=content_type)
+        if response.streaming:
+            b''.join(response.streaming_content)
+
+        return response.status_code < 400
+
+
+class AsgiTransport:
+    """
+    In-process through Django's ASGI handler, for asyncio workers. Drives the
+    application with a hand-built scope, the test `AsyncClient` always sends
+    `Host: testserver`.
+    """
+
+    def __init__(self, server_name):
+        from django.core.asgi import get_asgi_application
+
+        self.application = get_asgi_application()
+        self.server_name = server_name
+
+    async def __call__(self, method, path, body, content_type):
+        headers = [(b'host', self.server_name.encode())]
+        if content_type:
+            headers += [(b'content-type', content_type.encode()), (b'content-length', str(len(body)).encode())]
+
+        scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+                 'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+                 'headers': headers, 'client': ('127.0.0.1', 0), 'server': (self.server_name, 80)}
+        messages = [{'type': 'http.request', 'body': body or b'', 'more_body': False}]
+        done = asyncio.Event()
+        status = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await done.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+            elif message['type'] == 'http.response.body' and not message.get('more_body'):
+                done.set()
+
+        try:
+            await self.application(scope, receive, send)
+        finally:
+            done.set()
+
+        return bool(status) and status[0] < 400
+
+
+class HttpTransport:
+    # A running server, e.g. http://localhost:8000
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def __call__(self, method, path, body, content_type):
+        request = urllib.request.Request(self.base_url + path, data=body, method=method,
+                                         headers={'Content-Type': content_type} if content_type else {})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                return response.status < 400
+        except urllib.error.HTTPError as e:
+            e.read()
+            return False
+        except OSError:
+            return False
+
+
+def _pick(mix):
+    names, weights = list(mix), list(mix.values())
+    return lambda: random.choices(names, weights)[0]
+
+
+def run_threads(transport, requests, mix, workers, duration):
+    """
+    `workers` threads each send requests back to back, picking a scenario
+    by weight every time, until `duration` seconds have passed.
+    """
+    recorder = Recorder()
+    pick = _pick(mix)
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        try:
+            while time.perf_counter() < deadline:
+                scenario = pick()
+                start = time.perf_counter()
+                try:
+                    ok = transport(*requests[scenario]())
+                except Exception:
+                    ok = False
+                recorder.record(scenario, time.perf_counter() - start, ok)
+        finally:
+            connections.close_all()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='loadtest') as executor:
+        for _ in range(workers):
+            executor.submit(worker)
+
+    return recorder.summary(time.perf_counter() - start)
+
+
+def run_asyncio(transport, requests, mix, workers, duration):
+    """
+    Same as `run_threads` with `workers` coroutines on one event loop.
+    Blocking transports (plain HTTP) run in a thread per in-flight request.
+    """
+    recorder = Recorder()
+    pick = _pick(mix)
+
+    async def call(request):
+        if asyncio.iscoroutinefunction(transport.__call__):
+            return await transport(*request)
+        return await asyncio.to_thread(transport, *request)
+
+    async def worker(deadline):
+        while time.perf_counter() < deadline:
+            scenario = pick()
+            start = time.perf_counter()
+            try:
+                ok = await call(requests[scenario]())
+            except Exception:
+                ok = False
+            recorder.record(scenario, time.perf_counter() - start, ok)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=workers, thread_name_prefix='loadtest'))
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(worker(deadline) for _ in range(workers)))
+
+    start = time.perf_counter()
+    asyncio.run(main())
+    return recorder.summary(time.perf_counter() - start)
@@ -0,0 +1,64 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from penguins.synthetic import (fit, generate, read_penguin_table, read_source_csv, save_penguins, write_csv,
+                                write_parquet)
+
+
+class Command(BaseCommand):
+    help = 'Generate realistic synthetic penguins, into the Penguin table or a CSV/Parquet file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int, help='Number of penguins to generate')
+        parser.add_argument('--source', help='Palmer penguins CSV to fit, defaults to the scored Penguin table')
+        parser.add_argument('--output', help='.csv or .parquet file to write instead of the Penguin table')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, the same seed gives the same rows')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Rows generated and written at a time')
+        parser.add_argument('--profile', help='Also write the fitted distributions as JSON to this file')
+
+    def handle(self, *args, **options):
+        if options['count'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('count and --chunk-size must be positive')
+
+        output = options['output']
+        if output and not output.endswith(('.csv', '.parquet')):
+            raise CommandError('--output must be a .csv or .parquet file')
+        if output and output.endswith('.parquet'):
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise CommandError('Parquet output needs pyarrow installed')
+
+        try:
+            if options['source']:
+                with open(options['source'], 'rb') as f:
+                    profile = fit(read_source_csv(f))
+            else:
+                profile = fit(read_penguin_table())
+        except OSError as e:
+            raise CommandError(f'Cannot read {options["source"]}: {e.strerror}')
+        except ValueError as e:
+            raise CommandError(f'{e}, pass --source with the Palmer penguins CSV or score stored penguins first')
+
+        if options['profile']:
+            with open(options['profile'], 'w') as f:
+                json.dump(profile, f, indent=2)
+
+        chunks = generate(profile, options['count'], options['seed'], options['chunk_size'])
+        if not output:
+            progress = save_penguins(chunks)
+        elif output.endswith('.csv'):
+            progress = write_csv(output, chunks)
+        else:
+            progress = write_parquet(output, chunks)
+
+        started = time.perf_counter()
+        written = 0
+        for written in progress:
+            self.stdout.write(f'{written} penguins written ({written / (time.perf_counter() - started):.0f} rows/sec)')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {written} penguins from {len(profile["groups"])} species/island/sex groups '
+            f'into {output or "the Penguin table"} in {time.perf_counter() - started:.2f}s'))
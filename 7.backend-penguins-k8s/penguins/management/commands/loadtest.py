@@ -0,0 +1,87 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from penguins.loadtest import (AsgiTransport, HttpTransport, WsgiTransport, build_requests, parse_mix, run_asyncio,
+                               run_threads)
+from penguins.models import Penguin
+
+
+class Command(BaseCommand):
+    help = 'Send a mix of penguins API traffic for a while and report throughput and latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', default='wsgi',
+                            help='"wsgi" or "asgi" to call the application in-process, or a base URL such as '
+                                 'http://localhost:8000')
+        parser.add_argument('--mode', choices=['threads', 'asyncio'],
+                            help='Worker type, defaults to asyncio for asgi and threads otherwise')
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent workers')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds to run')
+        parser.add_argument('--mix', default='predict=70,batch=5,list=5,detail=20',
+                            help='Scenario weights out of predict, batch, list and detail')
+        parser.add_argument('--batch-size', type=int, default=100, help='Penguins per batch request')
+        parser.add_argument('--pk', type=int, action='append', default=[],
+                            help='Penguin ids for detail requests, defaults to the first 1000 in the database')
+        parser.add_argument('--json', help='Also write the report as JSON to this file, "-" for stdout')
+
+    def handle(self, *args, **options):
+        target = options['target']
+        mode = options['mode'] or ('asyncio' if target == 'asgi' else 'threads')
+        if options['workers'] < 1 or options['duration'] <= 0:
+            raise CommandError('--workers and --duration must be positive')
+
+        try:
+            mix = parse_mix(options['mix'])
+        except ValueError as e:
+            raise CommandError(e)
+
+        if target == 'wsgi':
+            if mode != 'threads':
+                raise CommandError('The in-process WSGI target needs --mode threads')
+            transport = WsgiTransport(_server_name())
+        elif target == 'asgi':
+            if mode != 'asyncio':
+                raise CommandError('The in-process ASGI target needs --mode asyncio')
+            transport = AsgiTransport(_server_name())
+        elif target.startswith(('http://', 'https://')):
+            transport = HttpTransport(target)
+        else:
+            raise CommandError(f'Unknown target "{target}"')
+
+        pks = options['pk'] or list(Penguin.objects.order_by('pk').values_list('pk', flat=True)[:1000])
+        requests = build_requests(options['batch_size'], pks)
+        if 'detail' in mix and 'detail' not in requests:
+            self.stderr.write('No penguins to read, dropping detail requests from the mix')
+            del mix['detail']
+            if not mix:
+                raise CommandError('Nothing left to send')
+
+        run = run_asyncio if mode == 'asyncio' else run_threads
+        report = run(transport, requests, mix, options['workers'], options['duration'])
+        report.update({'target': target, 'mode': mode, 'workers': options['workers'], 'mix': mix})
+
+        if options['json'] == '-':
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+        self.stdout.write(f'{target} with {options["workers"]} {mode} workers for {report["duration"]:.1f}s\n')
+        self.stdout.write(f'{"scenario":<10} {"requests":>9} {"req/s":>9} {"errors":>8} '
+                          f'{"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"max ms":>9}')
+        for name, stats in [*report['scenarios'].items(), ('total', report['total'])]:
+            self.stdout.write(f'{name:<10} {stats["requests"]:>9} {stats["throughput"]:>9.1f} '
+                              f'{stats["error_rate"]:>8.1%} {stats["p50_ms"]:>9.2f} {stats["p95_ms"]:>9.2f} '
+                              f'{stats["p99_ms"]:>9.2f} {stats["max_ms"]:>9.2f}')
+
+
+def _server_name():
+    # The test clients need a host the application accepts
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*' and not host.startswith('.'):
+            return host
+
+    return 'localhost'
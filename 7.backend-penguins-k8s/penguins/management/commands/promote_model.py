@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from penguins.registry import UnknownModelVersion, get_registry
+
+
+class Command(BaseCommand):
+    help = 'Point a model alias (default: the registry default alias) at a Decision Tree version'
+
+    def add_arguments(self, parser):
+        parser.add_argument('version', help='Version name, existing alias or sha256 prefix')
+        parser.add_argument('--alias', help='Alias to move, defaults to PENGUINS_MODEL_DEFAULT_ALIAS')
+
+    def handle(self, *args, **options):
+        registry = get_registry()
+        alias = options['alias'] or registry.default_alias
+
+        try:
+            version = registry.promote(options['version'], alias)
+        except UnknownModelVersion as e:
+            raise CommandError(f'Unknown model version {e}. Available: {", ".join(registry.versions())}')
+
+        self.stdout.write(self.style.SUCCESS(f'{alias} -> {version}'))
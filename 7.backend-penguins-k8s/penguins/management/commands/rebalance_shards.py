@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from penguins import sharding
+from penguins.models import Penguin
+
+
+class Command(BaseCommand):
+    help = 'Move penguins to the shard PENGUINS_SHARDS assigns them, after the mapping changed or sharding was enabled'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows moved per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the rows that would move')
+
+    def handle(self, *args, **options):
+        if not sharding.enabled():
+            raise CommandError('Sharding is off, set PENGUINS_SHARDS or PENGUINS_SHARD_DEFAULT')
+
+        moved = 0
+        for source in sharding.aliases():
+            last_pk = 0
+            while True:
+                rows = list(Penguin.objects.using(source).filter(pk__gt=last_pk).order_by('pk')
+                            [:options['chunk_size']])
+                if not rows:
+                    break
+                last_pk = rows[-1].pk
+
+                targets = {}
+                for penguin in rows:
+                    # Rows from before sharding have no bucket in their id and go by island
+                    target = sharding.alias_for_pk(penguin.pk) or sharding.alias_for_island(penguin.island)
+                    if target != source:
+                        targets.setdefault(target, []).append(penguin)
+
+                for target, penguins in targets.items():
+                    self.stdout.write(f'{source} -> {target}: {len(penguins)} penguins')
+                    moved += len(penguins)
+                    if options['dry_run']:
+                        continue
+
+                    # Copy first and delete second, ids are kept, so a rerun finishes an interrupted move
+                    with transaction.atomic(using=target):
+                        Penguin.objects.using(target).bulk_create(penguins, ignore_conflicts=True)
+                    with transaction.atomic(using=source):
+                        Penguin.objects.using(source).filter(pk__in=[penguin.pk for penguin in penguins]).delete()
+
+        verb = 'would move' if options['dry_run'] else 'moved'
+        self.stdout.write(self.style.SUCCESS(f'{moved} penguins {verb}'))
@@ -0,0 +1,118 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import lru_cache
+
+from django.core.management.base import BaseCommand, CommandError
+
+from penguins.artifact import TreeArtifact
+from penguins.features import FEATURE_FIELDS, featurize
+from penguins.models import Penguin
+from penguins.registry import UnknownModelVersion, get_registry
+
+
+@lru_cache(maxsize=None)
+def _load_model(path):
+    # Each worker maps the artifact once, the pages are shared with every other worker
+    return TreeArtifact(path)
+
+
+def _score_chunk(path, rows):
+    model = _load_model(path)
+    primary_keys = [row[0] for row in rows]
+    predictions = model.predict(featurize([row[1:] for row in rows], model.features))
+
+    return primary_keys, predictions.tolist()
+
+
+class ResumePoint:
+    """
+    Highest primary key below which every submitted range has been written,
+    the `--after-pk` to resume from. Ranges are submitted in primary key
+    order, identified by their last primary key, and may finish in any order.
+    """
+
+    def __init__(self, after_pk):
+        self.completed_through = after_pk
+        self._submitted = deque()
+        self._finished = set()
+
+    def submitted(self, last_pk):
+        self._submitted.append(last_pk)
+
+    def finished(self, last_pk):
+        # Advance over the contiguous prefix of finished ranges, later ranges wait for the ones before them
+        self._finished.add(last_pk)
+        while self._submitted and self._submitted[0] in self._finished:
+            self._finished.remove(self._submitted[0])
+            self.completed_through = self._submitted.popleft()
+
+
+class Command(BaseCommand):
+    help = 'Predict the species of every stored penguin and save it with the model version used'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', help='Version name, alias or sha256 prefix, defaults to the default alias')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Rows per primary key range')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Scoring processes')
+        parser.add_argument('--after-pk', type=int, default=0, help='Resume after this primary key')
+        parser.add_argument('--all', action='store_true',
+                            help='Rescore rows already scored by this model version as well')
+
+    def handle(self, *args, **options):
+        registry = get_registry()
+        try:
+            version = registry.get(options['model'], count=False)
+        except UnknownModelVersion as e:
+            raise CommandError(f'Unknown model version {e}')
+
+        # Rows already scored by this version are skipped, so an interrupted run simply resumes
+        queryset = Penguin.objects.order_by('pk')
+        if not options['all']:
+            queryset = queryset.exclude(model_version=version.name)
+
+        scored = 0
+        started = time.perf_counter()
+        pending = {}
+        last_pk = options['after_pk']
+        resume = ResumePoint(last_pk)
+        max_in_flight = options['workers'] * 2
+
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            while True:
+                # Keep a bounded number of primary key ranges in flight
+                while len(pending) < max_in_flight:
+                    rows = list(queryset.filter(pk__gt=last_pk).values_list('pk', *FEATURE_FIELDS)
+                                [:options['chunk_size']])
+                    if not rows:
+                        break
+
+                    future = executor.submit(_score_chunk, version.artifact.path, rows)
+                    last_pk = rows[-1][0]
+                    pending[future] = last_pk
+                    resume.submitted(last_pk)
+
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    primary_keys, predictions = future.result()
+                    Penguin.objects.bulk_update(
+                        [Penguin(pk=pk, predicted_species=species, model_version=version.name)
+                         for pk, species in zip(primary_keys, predictions)],
+                        ['predicted_species', 'model_version'], batch_size=1000)
+                    scored += len(primary_keys)
+
+                for future in done:
+                    resume.finished(pending.pop(future))
+
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'{scored} rows scored, completed through pk {resume.completed_through} '
+                                  f'({scored / elapsed:.0f} rows/sec)')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Scored {scored} penguins with {version.name} in {elapsed:.2f}s '
+            f'({scored / elapsed if elapsed else 0:.0f} rows/sec)'))
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from penguins.server import PenguinsApplication, default_admission_limit, default_workers
+
+
+class Command(BaseCommand):
+    help = 'Serve the project with gunicorn, preloading Django and the model before forking the workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bind', default=settings.PENGUINS_SERVER_BIND, help='Address to listen on')
+        parser.add_argument('--workers', type=int, default=settings.PENGUINS_SERVER_WORKERS,
+                            help='Worker processes, defaults to one per CPU of the cgroup limit')
+        parser.add_argument('--threads', type=int, default=settings.PENGUINS_SERVER_THREADS,
+                            help='Threads per worker')
+        parser.add_argument('--keepalive', type=int, default=settings.PENGUINS_SERVER_KEEPALIVE,
+                            help='Seconds to hold idle keep-alive connections open')
+        parser.add_argument('--max-requests', type=int, default=settings.PENGUINS_SERVER_MAX_REQUESTS,
+                            help='Recycle a worker after this many requests, 0 to never')
+        parser.add_argument('--max-requests-jitter', type=int, default=settings.PENGUINS_SERVER_MAX_REQUESTS_JITTER,
+                            help='Random extra requests per worker, so workers do not all restart together')
+        parser.add_argument('--timeout', type=int, default=settings.PENGUINS_SERVER_TIMEOUT,
+                            help='Seconds a request may take before its worker is restarted')
+
+    def handle(self, *args, **options):
+        workers = options['workers'] or default_workers()
+        self.stdout.write(f'Serving on {options["bind"]} with {workers} workers x {options["threads"]} threads')
+
+        # Set before the workers fork, so each sizes its admission controller from it
+        if not settings.PENGUINS_ADMISSION_LIMIT:
+            settings.PENGUINS_ADMISSION_LIMIT = default_admission_limit(options['threads'])
+
+        PenguinsApplication({
+            'bind': options['bind'],
+            'workers': workers,
+            'threads': options['threads'],
+            'keepalive': options['keepalive'],
+            'max_requests': options['max_requests'],
+            'max_requests_jitter': options['max_requests_jitter'],
+            'timeout': options['timeout'],
+            # Workers get the drain window on SIGTERM before being killed
+            'graceful_timeout': int(settings.PENGUINS_DRAIN_DELAY + settings.PENGUINS_DRAIN_TIMEOUT),
+            'accesslog': '-',
+        }).run()
@@ -0,0 +1,36 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database onto its SQLite read replicas, standing in for replication locally'
+
+    def add_arguments(self, parser):
+        parser.add_argument('replicas', nargs='*', help='Replica aliases, defaults to PENGUINS_DB_REPLICAS')
+
+    def handle(self, *args, **options):
+        replicas = options['replicas'] or settings.PENGUINS_DB_REPLICAS
+        databases = [DEFAULT_DB_ALIAS, *replicas]
+
+        for alias in databases:
+            if alias not in settings.DATABASES:
+                raise CommandError(f'Unknown database {alias}')
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(f'{alias} is not a SQLite database, it is replicated by its server')
+
+        # SQLite's online backup copies a consistent snapshot while the primary stays writable
+        primary = sqlite3.connect(connections[DEFAULT_DB_ALIAS].settings_dict['NAME'])
+        try:
+            for alias in replicas:
+                connections[alias].close()
+                replica = sqlite3.connect(connections[alias].settings_dict['NAME'])
+                try:
+                    primary.backup(replica)
+                finally:
+                    replica.close()
+                self.stdout.write(self.style.SUCCESS(f'{DEFAULT_DB_ALIAS} -> {alias}'))
+        finally:
+            primary.close()
@@ -0,0 +1,261 @@
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, tuned for sub-millisecond model calls up to slow database writes
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+METRICS = {
+    'penguins_http_requests_total': ('counter', 'HTTP requests by route, method and status'),
+    'penguins_http_request_duration_seconds': ('histogram', 'HTTP request latency by route'),
+    'penguins_predict_stage_seconds': ('histogram', 'Latency of each stage of a predict request'),
+    'penguins_db_queries_total': ('counter', 'SQL statements issued by route'),
+    'penguins_db_request_seconds': ('histogram', 'Total database time per request by route'),
+    'penguins_admission_in_flight': ('gauge', 'Predict requests holding an admission slot'),
+    'penguins_admission_queue_depth': ('gauge', 'Predict requests waiting for an admission slot'),
+    'penguins_admission_rejected_total': ('counter', 'Predict requests shed with a 503, by route and reason'),
+    'penguins_admission_wait_seconds': ('histogram', 'Time predict requests waited for a thread and a slot'),
+}
+
+# Counters and histograms of workers that have exited, folded together so their files can be removed
+AGGREGATE_FILE = 'aggregate.json'
+LOCK_FILE = 'aggregate.lock'
+
+
+class Metrics:
+    """
+    Counters, gauges and histograms kept in plain dictionaries behind one
+    lock, so recording a value costs a dictionary update.
+
+    With a `directory`, each process also dumps its values to
+    `<directory>/<pid>.json` every `flush_interval` seconds from a thread
+    started with `start()`, off the request path, and the exposition sums
+    the files of every worker, like the multiprocess mode of the Prometheus
+    client. `manage.py serve` creates the directory before forking and
+    flushes each worker once more as it exits. Gauges of workers that have exited are
+    left out, their counters and histograms are folded into one aggregate
+    file and the worker's file is removed, so recycled workers do not pile
+    up files.
+    """
+
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._thread = None
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            # One slot per bucket plus +Inf, then the sum
+            values = self._histograms.get(key)
+            if values is None:
+                values = self._histograms[key] = [0] * (len(BUCKETS) + 2)
+            values[bisect_left(BUCKETS, value)] += 1
+            values[-1] += value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, labels, value] for (name, labels), value in self._counters.items()],
+                'gauges': [[name, labels, value] for (name, labels), value in self._gauges.items()],
+                'histograms': [[name, labels, list(values)] for (name, labels), values in self._histograms.items()],
+            }
+
+    def flush(self):
+        if self.directory:
+            self._write(f'{os.getpid()}.json', self.snapshot())
+
+    def start(self):
+        # Threads do not survive a fork, each worker starts its own
+        with self._lock:
+            if self.directory and self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='penguins-metrics', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Flushing metrics to %s failed', self.directory)
+
+    def mark_process_dead(self, pid):
+        # Like `mark_process_dead` of the Prometheus client, called for exited workers
+        if self.directory:
+            with self._directory_lock():
+                self._fold(pid)
+
+    def collect(self):
+        # Merge this process with every other worker sharing the directory
+        snapshots = [(self.snapshot(), True)]
+        if self.directory and os.path.isdir(self.directory):
+            own = f'{os.getpid()}.json'
+
+            # Under the lock, so no file is read both before and after it was folded
+            with self._directory_lock():
+                for filename in os.listdir(self.directory):
+                    if filename.endswith('.json') and filename not in (own, AGGREGATE_FILE) and \
+                            not _alive(filename[:-5]):
+                        self._fold(filename[:-5])
+
+                for filename in os.listdir(self.directory):
+                    if filename.endswith('.json') and filename != own:
+                        snapshot = _read(os.path.join(self.directory, filename))
+                        if snapshot is not None:
+                            snapshots.append((snapshot, filename != AGGREGATE_FILE))
+
+        return _merge(snapshots)
+
+    def _fold(self, pid):
+        # Another process may have folded it already
+        path = os.path.join(self.directory, f'{pid}.json')
+        if not os.path.exists(path):
+            return
+
+        snapshots = [_read(os.path.join(self.directory, AGGREGATE_FILE)), _read(path)]
+        counters, _, histograms = _merge((snapshot, False) for snapshot in snapshots if snapshot is not None)
+        self._write(AGGREGATE_FILE, {
+            'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+            'histograms': [[name, labels, values] for (name, labels), values in histograms.items()],
+        })
+        os.remove(path)
+
+    def _write(self, filename, snapshot):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(temp_path, os.path.join(self.directory, filename))
+
+    @contextmanager
+    def _directory_lock(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, LOCK_FILE), 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def exposition(self):
+        # Prometheus text format 0.0.4
+        counters, gauges, histograms = self.collect()
+        lines = []
+
+        for name, (kind, help_text) in METRICS.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+
+            for (metric, labels), value in sorted({**counters, **gauges}.items()):
+                if metric == name:
+                    lines.append(f'{name}{_labels(labels)} {value}')
+
+            for (metric, labels), values in sorted(histograms.items()):
+                if metric == name:
+                    cumulative = 0
+                    for bound, count in zip([*BUCKETS, '+Inf'], values[:-1]):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{_labels(labels + (("le", str(bound)),))} {cumulative}')
+                    lines.append(f'{name}_sum{_labels(labels)} {values[-1]}')
+                    lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge(snapshots):
+    # Sums `(snapshot, alive)` pairs, gauges only of processes that are alive
+    counters, gauges, histograms = {}, {}, {}
+    for snapshot, alive in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, value in snapshot.get('gauges', []) if alive else []:
+            key = (name, tuple(map(tuple, labels)))
+            gauges[key] = gauges.get(key, 0) + value
+        for name, labels, values in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(key, [0] * len(values))
+            for i, value in enumerate(values):
+                merged[i] += value
+
+    return counters, gauges, histograms
+
+
+def _alive(pid):
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        pass
+
+    return True
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> Metrics:
+    global _metrics
+
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = Metrics(settings.PENGUINS_METRICS_DIR, settings.PENGUINS_METRICS_FLUSH_INTERVAL)
+
+    return _metrics
+
+
+def stage(view, name):
+    # Times one stage of a predict request, e.g. `with stage('predict', 'model'):`
+    return get_metrics().timer('penguins_predict_stage_seconds', view=view, stage=name)
@@ -0,0 +1,303 @@
+import cProfile
+import logging
+import os
+import pstats
+import random
+import re
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse
+from django.utils.crypto import constant_time_compare
+
+from penguins import sharding
+from penguins.admission import Rejected, ReleasingIterator, get_admission, queued_for, report
+from penguins.diagnostics import memory_tracer
+from penguins.lifecycle import lifecycle
+from penguins.metrics import get_metrics
+from penguins.querycount import QueryBudgetExceeded, QueryRecorder, explain
+from penguins.routers import choose_replica, reset
+
+logger = logging.getLogger('penguins.diagnostics')
+
+
+class LifecycleMiddleware:
+    # Counts requests in flight, including streamed responses until they finish, so SIGTERM can drain them
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        lifecycle.request_started()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            lifecycle.request_finished()
+            raise
+
+        if response.streaming:
+            response.streaming_content = ReleasingIterator(response.streaming_content, lifecycle.request_finished)
+        else:
+            lifecycle.request_finished()
+
+        return response
+
+
+class MetricsMiddleware:
+    # Counts and times every request by its URL pattern, so path parameters don't explode the label set
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = request.resolver_match
+        route = match.route if match is not None else 'unmatched'
+
+        metrics = get_metrics()
+        metrics.inc('penguins_http_requests_total', route=route, method=request.method,
+                    status=str(response.status_code))
+        metrics.observe('penguins_http_request_duration_seconds', elapsed, route=route)
+
+        return response
+
+
+class AdmissionControlMiddleware:
+    """
+    Puts `PENGUINS_ADMISSION_ROUTES` behind the process wide
+    `AdmissionController`: a request either gets a slot, waits for one in
+    the bounded queue, or is answered with a 503 and `Retry-After` at once.
+    Streamed responses keep their slot until the stream is finished.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            self._release(request)
+            raise
+
+        release = self._release_callback(request)
+        if release is not None and response.streaming:
+            response.streaming_content = ReleasingIterator(response.streaming_content, release)
+        elif release is not None:
+            release()
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        route = request.resolver_match.route
+        if route not in settings.PENGUINS_ADMISSION_ROUTES:
+            return None
+
+        # Sync views share one thread under ASGI, waiting there would hold up the request owning the slot
+        controller = get_admission()
+        metrics = get_metrics()
+        try:
+            if isinstance(request, ASGIRequest):
+                waited = controller.acquire(0)
+            else:
+                waited = controller.acquire(queued=queued_for())
+        except Rejected as e:
+            metrics.inc('penguins_admission_rejected_total', route=route, reason=e.reason)
+            report(controller)
+            return JsonResponse({'detail': 'The service is busy, retry shortly'}, status=503,
+                                headers={'Retry-After': str(settings.PENGUINS_ADMISSION_RETRY_AFTER)})
+
+        def release():
+            controller.release()
+            report(controller)
+
+        request._admission_release = release
+        metrics.observe('penguins_admission_wait_seconds', waited, route=route)
+        report(controller)
+
+        return None
+
+    @staticmethod
+    def _release_callback(request):
+        release = getattr(request, '_admission_release', None)
+        request._admission_release = None
+        return release
+
+    def _release(self, request):
+        release = self._release_callback(request)
+        if release is not None:
+            release()
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Sends the reads of safe requests to `PENGUINS_DB_REPLICA_ROUTES` to one
+    of `PENGUINS_DB_REPLICAS` through `PrimaryReplicaRouter`. One replica
+    serves the whole request, so its reads agree with each other. Other
+    requests, and any request once it writes, use the primary.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = choose_replica(None)
+        try:
+            return self.get_response(request)
+        finally:
+            reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method in ('GET', 'HEAD', 'OPTIONS') and \
+                request.resolver_match.route in settings.PENGUINS_DB_REPLICA_ROUTES:
+            choose_replica(settings.PENGUINS_DB_REPLICAS)
+
+
+class ProfilingMiddleware:
+    """
+    Runs the rest of the request under cProfile when it carries the
+    `X-Profile` header with `PENGUINS_PROFILE_TOKEN`, or is picked by
+    `PENGUINS_PROFILE_SAMPLE_RATE`.
+
+    Profiles are written to `PENGUINS_PROFILE_DIR` as
+    `<timestamp>-<method>-<path>.prof` (open them with `pstats` or
+    snakeviz), keeping the newest `PENGUINS_PROFILE_KEEP` files. Requests
+    with the token also get the top functions in an `X-Profile-Summary`
+    response header.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = settings.PENGUINS_PROFILE_TOKEN
+        privileged = bool(token) and constant_time_compare(request.headers.get('X-Profile', ''), token)
+        sampled = random.random() < settings.PENGUINS_PROFILE_SAMPLE_RATE
+
+        if not (privileged or sampled):
+            return self.get_response(request)
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is already active on this thread
+            return self.get_response(request)
+
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.disable()
+
+        filename = self._save(request, profile)
+        if privileged:
+            response['X-Profile-File'] = filename
+            response['X-Profile-Summary'] = self._summary(profile)
+
+        return response
+
+    def _save(self, request, profile):
+        directory = settings.PENGUINS_PROFILE_DIR
+        os.makedirs(directory, exist_ok=True)
+
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', request.path).strip('_') or 'root'
+        filename = f'{time.strftime("%Y%m%dT%H%M%S")}-{time.time_ns() % 10 ** 9:09d}-{request.method}-{slug}.prof'
+        profile.dump_stats(os.path.join(directory, filename))
+
+        # Bounded ring: the timestamp prefix makes name order the age order
+        profiles = sorted(name for name in os.listdir(directory) if name.endswith('.prof'))
+        for name in profiles[:-settings.PENGUINS_PROFILE_KEEP]:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+        return filename
+
+    @staticmethod
+    def _summary(profile):
+        stats = pstats.Stats(profile).stats
+        top = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:settings.PENGUINS_PROFILE_TOP]
+
+        return '; '.join(f'{function} ({os.path.basename(path)}:{line}) {cumulative * 1000:.2f}ms'
+                         for (path, line, function), (_, _, _, cumulative, _) in top)
+
+
+class AllocationLoggingMiddleware:
+    """
+    Logs how much traced memory each request to `PENGUINS_ALLOCATION_ROUTES`
+    left behind, and its peak, when `PENGUINS_LOG_ALLOCATIONS` is on. Turning
+    it on starts `tracemalloc`, which slows every allocation down, so this
+    is meant for diagnosing a leak rather than for normal operation.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if settings.PENGUINS_LOG_ALLOCATIONS and not memory_tracer.tracing:
+            memory_tracer.start()
+
+    def __call__(self, request):
+        if not (settings.PENGUINS_LOG_ALLOCATIONS and tracemalloc.is_tracing()):
+            return self.get_response(request)
+
+        # Traced memory is process wide, concurrent requests show up in each other's numbers
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        response = self.get_response(request)
+        after, peak = tracemalloc.get_traced_memory()
+
+        match = request.resolver_match
+        if match is not None and match.route in settings.PENGUINS_ALLOCATION_ROUTES:
+            logger.info('%s %s allocated %+d bytes (peak %d bytes above start)',
+                        request.method, request.path, after - before, peak - before)
+
+        return response
+
+
+class QueryCountMiddleware:
+    """
+    Counts the SQL statements and database time of each request and returns
+    them as `X-DB-Queries` / `X-DB-Time-Ms` headers and metrics. Statements
+    slower than `PENGUINS_SLOW_QUERY_MS` are logged with their EXPLAIN plan.
+
+    `PENGUINS_QUERY_BUDGETS` maps URL patterns to the most statements a
+    request may issue. Going over is logged, or raised when
+    `PENGUINS_QUERY_BUDGET_STRICT` is on, which the test suite enables.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryRecorder(slow_ms=settings.PENGUINS_SLOW_QUERY_MS) as queries:
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        route = match.route if match is not None else 'unmatched'
+
+        response['X-DB-Queries'] = str(queries.count)
+        response['X-DB-Time-Ms'] = f'{queries.seconds * 1000:.2f}'
+
+        metrics = get_metrics()
+        metrics.inc('penguins_db_queries_total', queries.count, route=route)
+        metrics.observe('penguins_db_request_seconds', queries.seconds, route=route)
+
+        for alias, sql, params, many, elapsed in queries.slow:
+            plan = None if many else explain(alias, sql, params)
+            logger.warning('Slow query (%.1f ms) on %s %s [%s]: %s\n%s', elapsed * 1000, request.method,
+                           request.path, alias, sql, plan or '(no plan)')
+
+        budget = settings.PENGUINS_QUERY_BUDGETS.get(route)
+        if budget is not None and sharding.enabled():
+            # Reads spanning the shards run their statement on each of them
+            budget *= len(sharding.aliases())
+        if budget is not None and queries.count > budget:
+            message = f'{request.method} {request.path} issued {queries.count} queries, budget is {budget}'
+            if settings.PENGUINS_QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        return response
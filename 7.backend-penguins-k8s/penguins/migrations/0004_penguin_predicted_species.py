@@ -0,0 +1,23 @@
+# Generated by Django 4.1.6 on 2026-10-19 11:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('penguins', '0003_alter_penguin_bill_depth_mm_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='penguin',
+            name='model_version',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='penguin',
+            name='predicted_species',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+    ]
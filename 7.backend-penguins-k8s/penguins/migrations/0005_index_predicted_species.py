@@ -0,0 +1,23 @@
+# Generated by Django 4.1.6 on 2026-10-19 11:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('penguins', '0004_penguin_predicted_species'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='penguin',
+            name='model_version',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='penguin',
+            name='predicted_species',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=50),
+        ),
+    ]
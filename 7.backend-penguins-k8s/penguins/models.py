@@ -1,5 +1,9 @@
+import uuid
+
 from django.db import models
 
+from penguins import sharding
+
 
 class Penguin(models.Model):
     class Sex(models.TextChoices):
@@ -14,8 +18,58 @@ class Penguin(models.Model):
     flipper_length_mm = models.IntegerField(default=0)
     body_mass_g = models.IntegerField(default=0)
 
+    # Latest species from the Decision Tree and the model version that produced it
+    predicted_species = models.CharField(max_length=50, blank=True, default='', db_index=True)
+    model_version = models.CharField(max_length=100, blank=True, default='', db_index=True)
+
+    objects = sharding.ShardedManager()
+
+    def save(self, *args, **kwargs):
+        # With sharding on, the id names the shard of the island, so it is assigned before the insert
+        if self.pk is None and sharding.enabled():
+            self.pk = sharding.new_id(self.island)
+            kwargs['force_insert'] = True
+
+        super().save(*args, **kwargs)
+
     def formatted_data(self):
         return {'bill_length_mm': self.bill_length_mm, 'bill_depth_mm': self.bill_depth_mm,
                 'flipper_length_mm': self.flipper_length_mm, 'body_mass_g': self.body_mass_g,
                 'island_Dream': self.island == 'Dream', 'island_Torgersen': self.island == 'Torgersen',
-                'sex_male': self.sex == 'MALE'}
+                'sex_male': self.sex == self.Sex.MALE}
+
+
+class PredictionJob(models.Model):
+    class Status(models.TextChoices):
+        QUEUED = 'queued'
+        RUNNING = 'running'
+        SUCCEEDED = 'succeeded'
+        FAILED = 'failed'
+
+    class Format(models.TextChoices):
+        CSV = 'csv'
+        NDJSON = 'ndjson'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=9, choices=Status.choices, default=Status.QUEUED, db_index=True)
+    input_format = models.CharField(max_length=6, choices=Format.choices, default=Format.CSV)
+    input_file = models.FileField(upload_to='jobs/input/')
+    output_file = models.FileField(upload_to='jobs/output/', blank=True)
+    model_version = models.CharField(max_length=100, blank=True, default='')
+    bytes_total = models.BigIntegerField(default=0)
+    bytes_read = models.BigIntegerField(default=0)
+    rows_processed = models.BigIntegerField(default=0)
+    rows_failed = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    # Process that accepted the job as `host:pid`, its executor is the only one that will run it
+    worker = models.CharField(max_length=100, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def progress(self):
+        if self.status == self.Status.SUCCEEDED:
+            return 1.0
+
+        return self.bytes_read / self.bytes_total if self.bytes_total else 0.0
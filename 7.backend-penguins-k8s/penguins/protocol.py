@@ -0,0 +1,127 @@
+"""
+Packed binary predict protocol for `/api/penguins/predict/packed/`.
+
+Request body (`Content-Type: application/octet-stream`), all little-endian:
+
+| offset | type     | field                                         |
+------------------------------------------------------------------------
+|   0    | 4 bytes  | magic b'PNGQ'                                 |
+|   4    | uint8    | protocol version, currently 1                 |
+|   5    | uint8    | flags, must be 0                              |
+|   6    | uint16   | record size in bytes, 19 for version 1        |
+|   8    | uint32   | number of records                             |
+|  12    | uint32   | reserved, must be 0                           |
+|  16    | records  | `count` packed records, no padding            |
+
+Each record holds the model features in training order:
+
+| offset | type     | feature                                       |
+------------------------------------------------------------------------
+|   0    | float32  | bill_length_mm                                |
+|   4    | float32  | bill_depth_mm                                 |
+|   8    | float32  | flipper_length_mm                             |
+|  12    | float32  | body_mass_g                                   |
+|  16    | uint8    | island_Dream (0 or 1)                         |
+|  17    | uint8    | island_Torgersen (0 or 1)                     |
+|  18    | uint8    | sex_male (0 or 1)                             |
+
+Response body (`application/octet-stream`):
+
+| offset | type     | field                                         |
+------------------------------------------------------------------------
+|   0    | 4 bytes  | magic b'PNGR'                                 |
+|   4    | uint8    | protocol version, currently 1                 |
+|   5    | uint8    | flags, 0                                      |
+|   6    | uint16   | reserved, 0                                   |
+|   8    | uint32   | number of predictions                         |
+|  12    | uint8[]  | class index per record, `INVALID` (255) for   |
+|        |          | records failing `PenguinSerializer.validate`  |
+
+Class indices refer to the comma separated names in the `X-Model-Classes`
+response header. The encode/decode functions below are the reference
+implementation; they only depend on numpy so clients can vendor this file.
+"""
+import struct
+
+import numpy as np
+
+VERSION = 1
+
+REQUEST_MAGIC = b'PNGQ'
+RESPONSE_MAGIC = b'PNGR'
+
+REQUEST_HEADER = struct.Struct('<4sBBHII')
+RESPONSE_HEADER = struct.Struct('<4sBBHI')
+
+RECORD_DTYPE = np.dtype([
+    ('bill_length_mm', '<f4'),
+    ('bill_depth_mm', '<f4'),
+    ('flipper_length_mm', '<f4'),
+    ('body_mass_g', '<f4'),
+    ('island_Dream', 'u1'),
+    ('island_Torgersen', 'u1'),
+    ('sex_male', 'u1'),
+])
+
+FEATURES = RECORD_DTYPE.names
+MEASUREMENTS = FEATURES[:4]
+
+INVALID = 255
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def encode_request(rows) -> bytes:
+    # Rows are mappings of feature name to value, e.g. `Penguin.formatted_data()`
+    rows = list(rows)
+    records = np.empty(len(rows), dtype=RECORD_DTYPE)
+    for name in FEATURES:
+        records[name] = [row[name] for row in rows]
+
+    return REQUEST_HEADER.pack(REQUEST_MAGIC, VERSION, 0, RECORD_DTYPE.itemsize, len(records), 0) + records.tobytes()
+
+
+def decode_request(buffer, max_records=None) -> np.ndarray:
+    """
+    Returns a structured array viewing `buffer` directly, nothing is copied.
+    """
+    if len(buffer) < REQUEST_HEADER.size:
+        raise ProtocolError('Body is shorter than the header')
+
+    magic, version, flags, record_size, count, _ = REQUEST_HEADER.unpack_from(buffer)
+    if magic != REQUEST_MAGIC:
+        raise ProtocolError('Body does not start with the request magic')
+    if version != VERSION or flags != 0:
+        raise ProtocolError(f'Unsupported protocol version {version} (flags {flags})')
+    if record_size != RECORD_DTYPE.itemsize:
+        raise ProtocolError(f'Record size must be {RECORD_DTYPE.itemsize} bytes, not {record_size}')
+    if max_records is not None and count > max_records:
+        raise ProtocolError(f'At most {max_records} records are accepted per request')
+    if len(buffer) != REQUEST_HEADER.size + count * record_size:
+        raise ProtocolError(f'Body length does not match {count} records')
+
+    return np.frombuffer(buffer, dtype=RECORD_DTYPE, count=count, offset=REQUEST_HEADER.size)
+
+
+def valid_records(records) -> np.ndarray:
+    # Vectorized `check_measurements`: every measurement must be a positive number
+    valid = np.ones(len(records), dtype=bool)
+    for name in MEASUREMENTS:
+        valid &= np.isfinite(records[name]) & (records[name] > 0)
+
+    return valid
+
+
+def encode_response(indices) -> bytes:
+    indices = np.asarray(indices, dtype=np.uint8)
+    return RESPONSE_HEADER.pack(RESPONSE_MAGIC, VERSION, 0, 0, len(indices)) + indices.tobytes()
+
+
+def decode_response(buffer) -> np.ndarray:
+    magic, version, _, _, count = RESPONSE_HEADER.unpack_from(buffer)
+    if magic != RESPONSE_MAGIC or version != VERSION:
+        raise ProtocolError('Not a version 1 predict response')
+
+    return np.frombuffer(buffer, dtype=np.uint8, count=count, offset=RESPONSE_HEADER.size)
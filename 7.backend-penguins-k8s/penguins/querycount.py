@@ -0,0 +1,83 @@
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+_active = threading.local()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryRecorder:
+    """
+    `connection.execute_wrapper` that counts and times every statement on
+    every database alias while active, remembering the ones slower than
+    `slow_ms` so they can be EXPLAINed once the request is done.
+
+        with QueryRecorder() as queries:
+            client.get('/api/penguins/')
+        assert queries.count <= 2
+
+    Connections belong to a thread, so statements that helper threads run
+    for this one (`sharding.fan_out`) are only counted through `recording()`.
+    """
+
+    def __init__(self, slow_ms=None):
+        self.slow_ms = slow_ms
+        self.count = 0
+        self.seconds = 0.0
+        self.slow = []
+        self._lock = threading.Lock()
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.count += 1
+                self.seconds += elapsed
+                if self.slow_ms is not None and elapsed * 1000 >= self.slow_ms:
+                    self.slow.append((context['connection'].alias, sql, params, many, elapsed))
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        _active.recorders = (*active_recorders(), self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _active.recorders = tuple(recorder for recorder in active_recorders() if recorder is not self)
+        self._stack.close()
+
+
+def active_recorders():
+    # Recorders of this thread, to hand to the threads running queries on its behalf
+    return getattr(_active, 'recorders', ())
+
+
+@contextmanager
+def recording(recorders):
+    # Counts the statements of this thread's connections with the recorders of the thread it works for
+    with ExitStack() as stack:
+        for recorder in recorders:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+        yield
+
+
+def explain(alias, sql, params):
+    # Only plain reads are explained, EXPLAIN ANALYZE style options would run writes again
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return None
+
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+        return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
@@ -0,0 +1,164 @@
+import json
+import os
+import tempfile
+import threading
+from collections import Counter, OrderedDict, namedtuple
+from pathlib import Path
+
+from django.conf import settings
+
+from penguins.artifact import MAGIC, TreeArtifact
+
+ModelVersion = namedtuple('ModelVersion', ['name', 'artifact'])
+
+
+class UnknownModelVersion(KeyError):
+    pass
+
+
+class ModelRegistry:
+    """
+    Decision Tree versions stored as `<name>.tree` files in one directory.
+
+    Requests select a version by alias (`aliases.json`), by file name or by a
+    prefix of the artifact's sha256. At most `capacity` versions stay mapped
+    in memory, the least recently used one is dropped first.
+    """
+
+    ALIASES_FILE = 'aliases.json'
+
+    def __init__(self, directory, default_alias='live', capacity=4):
+        self.directory = Path(directory)
+        self.default_alias = default_alias
+        self.capacity = capacity
+        self.request_counts = Counter()
+
+        self._lock = threading.Lock()
+        self._resident = OrderedDict()
+        self._aliases = {}
+        self._aliases_mtime = None
+        self._versions = []
+        self._versions_mtime = None
+
+    def versions(self):
+        # Re-list the directory only when a file is added, removed or renamed in it
+        mtime = self.directory.stat().st_mtime_ns
+        if mtime != self._versions_mtime:
+            self._versions = sorted(path.stem for path in self.directory.glob('*.tree'))
+            self._versions_mtime = mtime
+
+        return self._versions
+
+    def aliases(self):
+        # Re-read the aliases file only when it changes, so promotions reach every worker
+        path = self.directory / self.ALIASES_FILE
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return {}
+
+        if mtime != self._aliases_mtime:
+            with open(path) as f:
+                self._aliases = json.load(f)
+            self._aliases_mtime = mtime
+
+        return self._aliases
+
+    def resident(self):
+        return list(self._resident)
+
+    def resolve(self, name=None) -> str:
+        name = name or self.default_alias
+        name = self.aliases().get(name, name)
+
+        # Only names of files in the directory are opened, never a path built from the request
+        versions = self.versions()
+        if name in versions:
+            return name
+
+        # Fall back to matching a sha256 prefix from the artifact headers
+        if len(name) >= 8:
+            for version in versions:
+                if self._sha256(version).startswith(name):
+                    return version
+
+        raise UnknownModelVersion(name)
+
+    def get(self, name=None, count=True) -> ModelVersion:
+        version = self.resolve(name)
+
+        with self._lock:
+            artifact = self._resident.get(version)
+
+        # Map and verify a cold version outside the lock, so predictions on resident versions keep going
+        if artifact is None:
+            artifact = TreeArtifact(self.directory / f'{version}.tree')
+
+        with self._lock:
+            # Another request may have loaded the same version meanwhile, keep the one already shared
+            artifact = self._resident.setdefault(version, artifact)
+            self._resident.move_to_end(version)
+            while len(self._resident) > self.capacity:
+                self._resident.popitem(last=False)
+
+            if count:
+                self.request_counts[version] += 1
+
+        return ModelVersion(version, artifact)
+
+    def promote(self, version, alias=None):
+        # An empty version would resolve to the default alias and promote what is already live
+        if not version:
+            raise UnknownModelVersion(version)
+
+        alias = alias or self.default_alias
+        version = self.resolve(version)
+
+        # Refuse to point an alias at an artifact that does not load cleanly
+        TreeArtifact(self.directory / f'{version}.tree')
+
+        aliases = dict(self.aliases())
+        aliases[alias] = version
+
+        # Write next to the real file and rename over it, readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(aliases, f, indent=2, sort_keys=True)
+            f.write('\n')
+        os.replace(temp_path, self.directory / self.ALIASES_FILE)
+
+        return version
+
+    def stats(self):
+        return {
+            'default_alias': self.default_alias,
+            'aliases': self.aliases(),
+            'versions': self.versions(),
+            'resident': self.resident(),
+            'request_counts': dict(self.request_counts),
+        }
+
+    def _sha256(self, version):
+        # Read just the JSON header, the arrays are not needed to compare digests
+        with open(self.directory / f'{version}.tree', 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return ''
+            header_length = int.from_bytes(f.read(4), 'little')
+            return json.loads(f.read(header_length)).get('sha256', '')
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ModelRegistry:
+    global _registry
+
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry(settings.PENGUINS_MODEL_DIR,
+                                          default_alias=settings.PENGUINS_MODEL_DEFAULT_ALIAS,
+                                          capacity=settings.PENGUINS_MODEL_CACHE_SIZE)
+
+    return _registry
@@ -0,0 +1,91 @@
+import random
+from contextvars import ContextVar
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from penguins import sharding
+
+# Replica the current request reads from, None reads from the primary
+_replica = ContextVar('penguins_replica', default=None)
+
+
+def choose_replica(replicas):
+    """
+    Let the rest of the current request (or task) read from one of
+    `replicas`, picked at random. Returns a token for `reset()`.
+    """
+    return _replica.set(random.choice(replicas) if replicas else None)
+
+
+def reset(token):
+    _replica.reset(token)
+
+
+def current_replica():
+    return _replica.get()
+
+
+class PrimaryReplicaRouter:
+    """
+    Writes go to the primary, the `default` database. Reads go to the
+    replica chosen for the current request with `choose_replica()`, which
+    `ReplicaRoutingMiddleware` only does for safe requests to
+    `PENGUINS_DB_REPLICA_ROUTES`. Everything else, job workers and
+    management commands included, reads from the primary.
+
+    A write pins the rest of the request to the primary, so it reads what
+    it wrote, and reads inside a transaction on the primary stay on it.
+    """
+
+    def db_for_read(self, model, **hints):
+        replica = _replica.get()
+        if replica is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        _replica.set(None)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        return db == DEFAULT_DB_ALIAS
+
+
+class ShardRouter:
+    """
+    Sends a `Penguin` to the shard its id (or, before it has one, its island)
+    belongs to when `PENGUINS_SHARDS` is set, see `penguins.sharding`. Rows
+    loaded from a shard are written back where they were found, even if the
+    mapping has changed since. Shards hold only the `Penguin` table. Other
+    models, and everything while sharding is off, go to the next router.
+    """
+
+    def db_for_read(self, model, **hints):
+        return self._shard(model, hints.get('instance'))
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints.get('instance'))
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db != DEFAULT_DB_ALIAS and db in sharding.aliases():
+            return app_label == 'penguins' and model_name == 'penguin'
+        return None
+
+    @staticmethod
+    def _shard(model, instance):
+        if model._meta.label != 'penguins.Penguin' or instance is None or not sharding.enabled():
+            return None
+
+        if instance._state.db is not None and not instance._state.adding:
+            return instance._state.db
+        if instance.pk is not None:
+            return sharding.alias_for_pk(instance.pk) or sharding.alias_for_island(instance.island)
+        return sharding.alias_for_island(instance.island)
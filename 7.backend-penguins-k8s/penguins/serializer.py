@@ -1,23 +1,88 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import Penguin
+from .models import Penguin, PredictionJob
+
+
+# Rules every predict entry point shares, whether the penguin arrives through DRF or in bulk
+MEASUREMENT_RULES = (
+    ('bill_length_mm', "Bill Length (mm) must be greater than zero"),
+    ('bill_depth_mm', "Bill Depth (mm) must be greater than zero"),
+    ('flipper_length_mm', "Flipper Length (mm) must be greater than zero"),
+    ('body_mass_g', "Body Mass (g) must be greater than zero"),
+)
+
+
+def check_measurements(data):
+    for field, message in MEASUREMENT_RULES:
+        if data[field] <= 0:
+            return message
+
+    return None
 
 
 class PenguinSerializer(serializers.ModelSerializer):
     class Meta:
         model = Penguin
-        fields = ('island', 'body_mass_g', 'sex', 'bill_length_mm', 'bill_depth_mm', 'flipper_length_mm')
+        fields = ('island', 'body_mass_g', 'sex', 'bill_length_mm', 'bill_depth_mm', 'flipper_length_mm',
+                  'predicted_species', 'model_version')
+        read_only_fields = ('predicted_species', 'model_version')
 
     def validate(self, data):
-        if data['bill_length_mm'] <= 0:
-            raise serializers.ValidationError("Bill Length (mm) must be greater than zero")
+        error = check_measurements(data)
+        if error is not None:
+            raise serializers.ValidationError(error)
+
+        return data
+
+
+class PredictionJobSerializer(serializers.ModelSerializer):
+    progress = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = PredictionJob
+        fields = ('id', 'status', 'input_format', 'model_version', 'progress', 'rows_processed', 'rows_failed',
+                  'error', 'created_at', 'started_at', 'finished_at')
+        read_only_fields = fields
 
-        if data['bill_depth_mm'] <= 0:
-            raise serializers.ValidationError("Bill Depth (mm) must be greater than zero")
 
-        if data['flipper_length_mm'] <= 0:
-            raise serializers.ValidationError("Flipper Length (mm) must be greater than zero")
+class SimilarQuerySerializer(serializers.Serializer):
+    k = serializers.IntegerField(min_value=1, default=5)
+    island = serializers.CharField(required=False)
+    sex = serializers.ChoiceField(choices=Penguin.Sex.choices, required=False)
 
-        if data['body_mass_g'] <= 0:
-            raise serializers.ValidationError("Body Mass (g) must be greater than zero")
+    def validate_k(self, value):
+        if value > settings.PENGUINS_SIMILAR_MAX_K:
+            raise serializers.ValidationError(f'At most {settings.PENGUINS_SIMILAR_MAX_K} similar penguins')
+
+        return value
+
+
+class SimilarMeasurementsSerializer(SimilarQuerySerializer):
+    bill_length_mm = serializers.FloatField()
+    bill_depth_mm = serializers.FloatField()
+    flipper_length_mm = serializers.FloatField()
+    body_mass_g = serializers.FloatField()
+
+    def validate(self, data):
+        error = check_measurements(data)
+        if error is not None:
+            raise serializers.ValidationError(error)
 
         return data
+
+
+class ModelPromoteSerializer(serializers.Serializer):
+    version = serializers.CharField(max_length=100)
+    alias = serializers.CharField(max_length=100, required=False)
+
+
+class MemoryReportQuerySerializer(serializers.Serializer):
+    limit = serializers.IntegerField(min_value=1, max_value=1000, default=20)
+    group_by = serializers.ChoiceField(choices=['lineno', 'filename'], default='lineno')
+
+
+class MemoryTracingSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=['start', 'reset', 'stop'],
+                                     error_messages={'invalid_choice': 'Expected start, reset or stop'})
+    # Every traced allocation keeps this many frames, deeper traces cost memory in proportion
+    frames = serializers.IntegerField(min_value=1, max_value=100, default=1)
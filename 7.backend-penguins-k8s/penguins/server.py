@@ -0,0 +1,202 @@
+import gc
+import logging
+import math
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from gunicorn.app.base import BaseApplication
+
+from penguins import admission, jobs
+from penguins.lifecycle import lifecycle
+from penguins.metrics import get_metrics
+from penguins.sweep import get_sweeper
+
+logger = logging.getLogger(__name__)
+
+CGROUP_V2_CPU_MAX = '/sys/fs/cgroup/cpu.max'
+CGROUP_V1_QUOTA = '/sys/fs/cgroup/cpu/cpu.cfs_quota_us'
+CGROUP_V1_PERIOD = '/sys/fs/cgroup/cpu/cpu.cfs_period_us'
+
+
+def cpu_limit():
+    """
+    CPUs this container may use: the cgroup CPU quota when one is set (a
+    Kubernetes `limits.cpu` of 1500m gives 1.5), otherwise the CPUs the
+    process is allowed to run on.
+    """
+    try:
+        with open(CGROUP_V2_CPU_MAX) as f:
+            quota, period = f.read().split()
+    except (OSError, ValueError):
+        try:
+            with open(CGROUP_V1_QUOTA) as f, open(CGROUP_V1_PERIOD) as g:
+                quota, period = f.read().strip(), g.read().strip()
+        except OSError:
+            quota, period = 'max', '1'
+
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+    if quota not in ('max', '-1') and int(period) > 0:
+        cpus = min(cpus, int(quota) / int(period))
+
+    return cpus
+
+
+def default_workers():
+    # Inference is CPU bound, one process per CPU; threads cover the time spent waiting on the database
+    return max(1, math.ceil(cpu_limit()))
+
+
+def default_admission_limit(threads):
+    # Below the threads of a worker, so excess predict requests wait where their deadline applies, and one thread
+    # stays free for probes and the other endpoints
+    return max(1, threads - 1)
+
+
+def share_metrics():
+    """
+    Point every worker's metrics at one directory, so a scrape of any worker
+    reports the whole server: `PENGUINS_METRICS_DIR` when set, otherwise a
+    fresh temporary directory. Runs in the master before forking, returns
+    the directory it created, if any.
+    """
+    created = None
+    if not settings.PENGUINS_METRICS_DIR:
+        created = tempfile.mkdtemp(prefix='penguins-metrics-')
+        settings.PENGUINS_METRICS_DIR = os.environ['PENGUINS_METRICS_DIR'] = created
+
+    get_metrics().directory = settings.PENGUINS_METRICS_DIR
+    return created
+
+
+def when_ready(server):
+    # The master has loaded Django and the model, freeze what it holds so workers share those pages
+    gc.freeze()
+
+
+def pre_request(worker, req):
+    # Recycling after max requests exits the worker, and the jobs on its executor with it: hold the count below the
+    # limit while jobs run, and once none do, stop taking new ones for the request that retires the worker
+    if worker.nr + 1 >= worker.max_requests and not jobs.stop_if_idle():
+        worker.nr -= 1
+
+
+def post_fork(server, worker):
+    # A start up that failed in the master (e.g. migrations still running) is retried in each worker
+    if not lifecycle.ready:
+        lifecycle.start()
+
+    # Threads do not survive the fork, each worker stores the stale predictions its reads recompute
+    get_sweeper().start()
+    get_metrics().start()
+
+
+def worker_exit(server, worker):
+    # The last values since the periodic flush, before the master folds this worker's file into the aggregate
+    try:
+        get_metrics().flush()
+    except Exception:
+        logger.exception('Flushing the metrics of worker %s failed', worker.pid)
+
+
+def child_exit(server, worker):
+    try:
+        # Keep the counters of the exited worker without keeping its metrics file
+        get_metrics().mark_process_dead(worker.pid)
+
+        # Jobs a worker accepted only run in its own executor, what it left unfinished never completes
+        failed = jobs.fail_orphaned(worker.pid)
+        if failed:
+            logger.warning('Worker %s exited with %s prediction jobs unfinished, marked failed', worker.pid, failed)
+    except Exception:
+        logger.exception('Cleaning up after worker %s failed', worker.pid)
+    finally:
+        # The master forks the replacement worker next, which must not inherit this connection
+        connections.close_all()
+
+
+def on_exit(server):
+    # Only a directory this server created is removed, a configured one may be shared
+    if server.app.metrics_directory:
+        shutil.rmtree(server.app.metrics_directory, ignore_errors=True)
+
+
+def post_worker_init(worker):
+    # Replaces gunicorn's SIGTERM handler in the worker: stop being ready and drain first, then exit through it
+    lifecycle.install_drain_handler()
+    track_queueing(worker)
+
+
+def track_queueing(worker):
+    """
+    Stamp each request of a threaded worker as it is handed to the thread
+    pool, and pass the stamp on to the thread that picks it up, so the
+    admission deadline counts the time spent waiting for a thread.
+    gunicorn's `pre_request` hook only runs once a thread has the request.
+    """
+    if not hasattr(worker, 'enqueue_req'):
+        return
+
+    enqueue_req, handle = worker.enqueue_req, worker.handle
+
+    def stamped_enqueue_req(conn):
+        conn.penguins_queued_at = time.monotonic()
+        enqueue_req(conn)
+
+    def stamped_handle(conn):
+        admission.arrived(getattr(conn, 'penguins_queued_at', None))
+        return handle(conn)
+
+    worker.enqueue_req, worker.handle = stamped_enqueue_req, stamped_handle
+
+
+class PenguinsApplication(BaseApplication):
+    """
+    gunicorn running the project's WSGI application with `preload_app`:
+    Django, the registry and the memory-mapped Decision Tree are set up once
+    in the master, which forks the workers, so they share it copy-on-write
+    instead of each loading their own.
+    """
+
+    def __init__(self, options):
+        self.options = options
+        self.metrics_directory = None
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+        self.cfg.set('preload_app', True)
+        self.cfg.set('when_ready', when_ready)
+        self.cfg.set('post_fork', post_fork)
+        self.cfg.set('post_worker_init', post_worker_init)
+        self.cfg.set('pre_request', pre_request)
+        self.cfg.set('worker_exit', worker_exit)
+        self.cfg.set('child_exit', child_exit)
+        self.cfg.set('on_exit', on_exit)
+
+    def load(self):
+        self.metrics_directory = share_metrics()
+        application = get_wsgi_application()
+
+        try:
+            lifecycle.startup()
+        except Exception:
+            logger.exception('Start up failed in the master, workers will retry')
+
+        # No worker runs yet, so jobs still queued or running are left from a previous run of the server
+        try:
+            failed = jobs.fail_orphaned()
+            if failed:
+                logger.warning('%s prediction jobs were left unfinished by a previous run, marked failed', failed)
+        except Exception:
+            logger.exception('Could not mark unfinished prediction jobs as failed')
+
+        # Connections must not be shared by the forked workers
+        connections.close_all()
+        return application
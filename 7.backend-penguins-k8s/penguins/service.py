@@ -1,18 +1,43 @@
-import joblib
-import pandas as pd
-
+from penguins.metrics import stage
 from penguins.models import Penguin
+from penguins.registry import ModelVersion, get_registry
+from penguins.shadow import get_shadow
+
+
+def _predict(penguin: Penguin, version: str = None, model: ModelVersion = None):
+    # Load the requested (or default) Decision Tree from the model registry, unless the caller already has
+    loaded_model = model or get_registry().get(version)
+
+    # Arrange the formatted penguin object in the order the model was trained on
+    with stage('predict', 'featurize'):
+        data = penguin.formatted_data()
+        features = [[data[name] for name in loaded_model.artifact.features]]
+
+    # Predict species using the model and the feature row
+    with stage('predict', 'model'):
+        prediction = loaded_model.artifact.predict(features)
+
+    # Hand the same row to the candidate model, if one is being evaluated
+    shadow = get_shadow()
+    if shadow is not None and shadow.shadows(loaded_model.name):
+        shadow.submit(data, prediction[0])
+
+    return loaded_model.name, prediction
 
 
 class PenguinService:
-    def predict(penguin: Penguin) -> str:
-        # Load Decision Tree Model from Joblib export
-        loaded_model = joblib.load('Predict_PenguinSpecies_DecisionTree_Model.sav')
+    def predict(penguin: Penguin, version: str = None, model: ModelVersion = None) -> str:
+        return _predict(penguin, version, model)[1]
+
+    def annotate(penguin: Penguin, version: str = None) -> Penguin:
+        # Store the prediction on the (unsaved) penguin, saving is left to the caller
+        penguin.model_version, prediction = _predict(penguin, version)
+        penguin.predicted_species = prediction[0]
 
-        # Create Pandas DataFrame using a formatted penguin object
-        df = pd.DataFrame([penguin.formatted_data()])
+        return penguin
 
-        # Predict species using the model and the dataframe
-        prediction = loaded_model.predict(df)
+    def active_version() -> str:
+        return get_registry().resolve()
 
-        return prediction
+    def is_stale(penguin: Penguin) -> bool:
+        return penguin.model_version != PenguinService.active_version()
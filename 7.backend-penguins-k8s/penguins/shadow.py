@@ -0,0 +1,129 @@
+import logging
+import queue
+import threading
+from collections import Counter
+
+from django.conf import settings
+
+from penguins.registry import UnknownModelVersion, get_registry
+
+logger = logging.getLogger(__name__)
+
+
+class ShadowEvaluator:
+    """
+    Scores live traffic with a candidate Decision Tree off the request path.
+
+    The request thread only does a non-blocking put onto a bounded queue;
+    when the queue is full the row is dropped and counted, so a slow
+    candidate can never add latency to the live prediction.
+    """
+
+    BATCH_SIZE = 256
+
+    def __init__(self, registry, candidate, max_queue=1000, autostart=True):
+        self.registry = registry
+        self.candidate = candidate
+        self.autostart = autostart
+        self.queue = queue.Queue(maxsize=max_queue)
+
+        self.compared = 0
+        self.disagreements = 0
+        self.dropped = 0
+        self.errors = 0
+        self.confusion = Counter()
+
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def shadows(self, version):
+        # The candidate may be an alias, compare what it points at now, so the live model never shadows itself
+        try:
+            return self.registry.resolve(self.candidate) != version
+        except UnknownModelVersion:
+            # Submitted anyway, failures to load the candidate show up in `errors`
+            return True
+
+    def submit(self, data, live_prediction):
+        if self.autostart and self._thread is None:
+            self.start()
+
+        try:
+            self.queue.put_nowait((data, live_prediction))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='penguins-shadow', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            # Block for one row, then take whatever else is already waiting as a batch
+            batch = [self.queue.get()]
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self._score(batch)
+            except Exception:
+                logger.exception('Shadow model %s failed to score a batch', self.candidate)
+                with self._lock:
+                    self.errors += len(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _score(self, batch):
+        model = self.registry.get(self.candidate, count=False).artifact
+        features = [[data[name] for name in model.features] for data, _ in batch]
+        predictions = model.predict(features)
+
+        with self._lock:
+            for (_, live), candidate in zip(batch, predictions):
+                live, candidate = str(live), str(candidate)
+                self.compared += 1
+                self.disagreements += live != candidate
+                self.confusion[(live, candidate)] += 1
+
+    def stats(self):
+        with self._lock:
+            confusion = {}
+            for (live, candidate), count in sorted(self.confusion.items()):
+                confusion.setdefault(live, {})[candidate] = count
+
+            return {
+                'candidate': self.candidate,
+                'compared': self.compared,
+                'disagreements': self.disagreements,
+                'dropped': self.dropped,
+                'errors': self.errors,
+                'queued': self.queue.qsize(),
+                'confusion': confusion,
+            }
+
+
+_shadow = None
+_shadow_lock = threading.Lock()
+
+
+def get_shadow():
+    # Shadow mode is off unless a candidate version or alias is configured
+    global _shadow
+
+    if settings.PENGUINS_SHADOW_MODEL is None:
+        return None
+
+    if _shadow is None:
+        with _shadow_lock:
+            if _shadow is None:
+                _shadow = ShadowEvaluator(get_registry(), settings.PENGUINS_SHADOW_MODEL,
+                                          max_queue=settings.PENGUINS_SHADOW_QUEUE_SIZE)
+
+    return _shadow
@@ -0,0 +1,350 @@
+"""
+Optional sharding of `Penguin` rows by island across database aliases.
+
+`PENGUINS_SHARDS` maps islands to aliases, islands it does not list go to
+`PENGUINS_SHARD_DEFAULT`. Each island falls into one of 256 buckets (crc32
+of its name), and a row's id carries its bucket:
+
+    | 40 bits: milliseconds since 2023 | 8 bits: bucket | 15 bits: sequence |
+
+so a lookup by primary key goes straight to the alias of the bucket, and
+rows keep their ids when `rebalance_shards` moves them after the mapping
+changes. Ids also sort by creation time across shards. Rows created before
+sharding was turned on have small ids without a bucket; they are looked up
+on every shard.
+
+The shard key is fixed when a row is created: changing a penguin's island
+later does not move it. With sharding off every row stays in `default` with
+an auto increment id, as before.
+"""
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import cmp_to_key, lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, NotSupportedError, connections, models
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.query import FlatValuesListIterable, ModelIterable, ValuesIterable, ValuesListIterable
+
+from penguins.querycount import active_recorders, recording
+
+EPOCH_MS = 1672531200000
+BUCKET_BITS = 8
+SEQUENCE_BITS = 15
+
+# Merged across shards by combining each shard's result
+MERGEABLE = {Count: sum, Sum: sum, Min: min, Max: max}
+
+_sequence = None
+
+
+def _reseed():
+    # Starts at a random point, so processes creating rows in the same millisecond rarely pick the same ids
+    global _sequence
+    _sequence = itertools.count(random.getrandbits(SEQUENCE_BITS))
+
+
+# gunicorn forks its workers from a master that imported this module, each needs its own starting point
+_reseed()
+os.register_at_fork(after_in_child=_reseed)
+
+
+def bucket(island) -> int:
+    return zlib.crc32(island.encode()) & ((1 << BUCKET_BITS) - 1)
+
+
+def new_id(island) -> int:
+    elapsed = int(time.time() * 1000) - EPOCH_MS
+    return elapsed << (BUCKET_BITS + SEQUENCE_BITS) | bucket(island) << SEQUENCE_BITS | \
+        next(_sequence) & ((1 << SEQUENCE_BITS) - 1)
+
+
+def bucket_of(pk):
+    # None for ids assigned before sharding, which have no timestamp
+    if pk >> (BUCKET_BITS + SEQUENCE_BITS) == 0:
+        return None
+    return pk >> SEQUENCE_BITS & ((1 << BUCKET_BITS) - 1)
+
+
+@lru_cache(maxsize=8)
+def _buckets(shards, default):
+    aliases = {}
+    for island, alias in shards:
+        if aliases.setdefault(bucket(island), alias) != alias:
+            raise ImproperlyConfigured(f'PENGUINS_SHARDS: {island} shares a bucket with an island on '
+                                       f'{aliases[bucket(island)]}, they must be on the same alias')
+
+    # `default` keeps the rows created before sharding until they are rebalanced
+    return aliases, tuple(sorted({DEFAULT_DB_ALIAS, default, *aliases.values()}))
+
+
+def _config():
+    return _buckets(tuple(sorted(settings.PENGUINS_SHARDS.items())), settings.PENGUINS_SHARD_DEFAULT)
+
+
+def enabled() -> bool:
+    return aliases() != (DEFAULT_DB_ALIAS,)
+
+
+def aliases():
+    return _config()[1]
+
+
+def alias_for_island(island):
+    return _config()[0].get(bucket(island), settings.PENGUINS_SHARD_DEFAULT)
+
+
+def alias_for_pk(pk):
+    # None when the id carries no bucket and the row could be on any shard
+    shard = bucket_of(pk)
+    if shard is None:
+        return None
+    return _config()[0].get(shard, settings.PENGUINS_SHARD_DEFAULT)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=len(settings.DATABASES),
+                                               thread_name_prefix='penguins-shard')
+
+    return _executor
+
+
+def fan_out(call, databases=None):
+    """
+    `call(alias)` for every shard in parallel, one thread each with its own
+    connection, returning the results in alias order. The threads do not see
+    writes of a transaction the calling thread has not committed yet. Their
+    statements count towards the calling thread's `QueryRecorder`s.
+    """
+    databases = databases or aliases()
+    if len(databases) == 1:
+        return [call(databases[0])]
+
+    recorders = active_recorders()
+
+    def run(alias):
+        # What request_started does for request threads, connections here outlive requests
+        connections[alias].close_if_unusable_or_obsolete()
+        with recording(recorders):
+            return call(alias)
+
+    return list(get_executor().map(run, databases))
+
+
+class ShardedQuerySet(models.QuerySet):
+    """
+    QuerySet that spans every shard unless `using()` picks one. Reads run on
+    all shards in parallel and are merged in the query's order (by primary
+    key, which follows creation time, when it has none). `get()` by primary
+    key goes to the row's shard. Writes go to the shard of each row.
+    """
+
+    def _fans_out(self):
+        return self._db is None and enabled()
+
+    def _shards(self):
+        return [self.using(alias) for alias in aliases()]
+
+    def get(self, *args, **kwargs):
+        pk = kwargs.get('pk', kwargs.get('id'))
+        if self._fans_out() and not args and pk is not None:
+            try:
+                alias = alias_for_pk(int(pk))
+            except (TypeError, ValueError):
+                alias = None
+
+            if alias is not None:
+                try:
+                    return self.using(alias).get(**kwargs)
+                except self.model.DoesNotExist:
+                    # The mapping may have changed and the row not been moved yet
+                    pass
+
+        return super().get(*args, **kwargs)
+
+    def _fetch_all(self):
+        if self._result_cache is None and self._fans_out():
+            merge, limits = self._merge_plan()
+            shards = fan_out(lambda alias: list(self._shard_query(alias, limits)))
+            self._result_cache = list(itertools.islice(merge(shards), *limits))
+
+        super()._fetch_all()
+
+    def iterator(self, chunk_size=None):
+        if not self._fans_out():
+            return super().iterator(chunk_size)
+
+        # Streams shard by shard rather than in parallel, so memory stays bounded by the chunk size
+        merge, limits = self._merge_plan()
+        shards = [self._shard_query(alias, limits).iterator(chunk_size) for alias in aliases()]
+        return itertools.islice(merge(shards), *limits)
+
+    def count(self):
+        if self._result_cache is not None or not self._fans_out():
+            return super().count()
+
+        low, high = self.query.low_mark, self.query.high_mark
+        total = sum(fan_out(lambda alias: self._shard_query(alias, (0, None)).count()))
+        return max(0, min(total, high if high is not None else total) - low)
+
+    def exists(self):
+        if self._result_cache is not None or not self._fans_out():
+            return super().exists()
+
+        return any(queryset.exists() for queryset in self._shards())
+
+    def aggregate(self, *args, **kwargs):
+        if not self._fans_out():
+            return super().aggregate(*args, **kwargs)
+
+        expressions = {**{arg.default_alias: arg for arg in args}, **kwargs}
+        for name, expression in expressions.items():
+            if type(expression) not in MERGEABLE or getattr(expression, 'distinct', False):
+                raise NotSupportedError(f'{name} cannot be merged across shards, only Count, Sum, Min and Max can')
+
+        results = fan_out(lambda alias: self.using(alias).aggregate(**expressions))
+        merged = {}
+        for name, expression in expressions.items():
+            values = [result[name] for result in results if result[name] is not None]
+            merged[name] = MERGEABLE[type(expression)](values) if values else None
+
+        return merged
+
+    def create(self, **kwargs):
+        if not self._fans_out():
+            return super().create(**kwargs)
+
+        # The row's shard is only known from its island, leave the database to the router
+        penguin = self.model(**kwargs)
+        penguin.save(force_insert=True)
+        return penguin
+
+    def bulk_create(self, objs, *args, **kwargs):
+        if not self._fans_out():
+            return super().bulk_create(objs, *args, **kwargs)
+
+        groups = {}
+        objs = list(objs)
+        for obj in objs:
+            if obj.pk is None:
+                obj.pk = new_id(obj.island)
+            groups.setdefault(alias_for_pk(obj.pk) or alias_for_island(obj.island), []).append(obj)
+
+        for alias, group in groups.items():
+            self.using(alias).bulk_create(group, *args, **kwargs)
+
+        return objs
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        if not self._fans_out():
+            return super().bulk_update(objs, fields, batch_size)
+
+        return sum(self.using(alias).bulk_update(group, fields, batch_size)
+                   for alias, group in self._by_shard(objs))
+
+    def update(self, **kwargs):
+        if not self._fans_out():
+            return super().update(**kwargs)
+
+        return sum(queryset.update(**kwargs) for queryset in self._shards())
+
+    def delete(self):
+        if not self._fans_out():
+            return super().delete()
+
+        deleted, counts = 0, {}
+        for queryset in self._shards():
+            count, by_model = queryset.delete()
+            deleted += count
+            for label, value in by_model.items():
+                counts[label] = counts.get(label, 0) + value
+
+        return deleted, counts
+
+    def _by_shard(self, objs):
+        # Rows without a bucket in their id may be on any shard, they are sent to all of them
+        groups = {}
+        for obj in objs:
+            alias = alias_for_pk(obj.pk)
+            for target in ([alias] if alias is not None else aliases()):
+                groups.setdefault(target, []).append(obj)
+
+        return groups.items()
+
+    def _shard_query(self, alias, limits):
+        # Every shard returns its first `high` rows in the query's order, the merge applies the slice
+        queryset = self.using(alias)
+        queryset.query.clear_limits()
+        if not self.ordered and self._iterable_class is ModelIterable:
+            queryset = queryset.order_by('pk')
+        if limits[1] is not None:
+            queryset.query.set_limits(0, limits[1])
+
+        return queryset
+
+    def _merge_plan(self):
+        # How to merge the shards' results, and the slice to apply to the merged rows
+        limits = (self.query.low_mark, self.query.high_mark)
+        ordering = list(self.query.order_by or (self.model._meta.ordering if self.query.default_ordering else []))
+        if not ordering and self._iterable_class is ModelIterable:
+            ordering = ['pk']
+
+        fields = []
+        for name in ordering:
+            if not isinstance(name, str) or name == '?':
+                raise NotSupportedError(f'Cannot merge shards ordered by {name}')
+            fields.append((name.lstrip('-'), name.startswith('-')))
+
+        if not fields:
+            return lambda shards: itertools.chain.from_iterable(shards), limits
+
+        value = self._row_value([name for name, _ in fields])
+
+        def compare(a, b):
+            for name, descending in fields:
+                x, y = value(a, name), value(b, name)
+                if x != y:
+                    return (-1 if x < y else 1) * (-1 if descending else 1)
+            return 0
+
+        return lambda shards: heapq.merge(*shards, key=cmp_to_key(compare)), limits
+
+    def _row_value(self, ordering):
+        # Reads an ordering field from a result row, whatever shape `values()` or `values_list()` gave it
+        pk = self.model._meta.pk.name
+        if self._iterable_class is ModelIterable:
+            return lambda row, name: getattr(row, pk if name == 'pk' else name)
+
+        names = [*self.query.extra_select, *self.query.values_select, *self.query.annotation_select]
+        missing = [name for name in ordering if name not in names and (name != 'pk' or pk not in names)]
+        if missing or self._iterable_class not in (ValuesIterable, ValuesListIterable, FlatValuesListIterable):
+            raise NotSupportedError(f'Cannot merge shards by {", ".join(missing or ordering)}, '
+                                    f'select the ordering fields')
+
+        def position(name):
+            return names.index(name if name in names else pk)
+
+        if self._iterable_class is ValuesIterable:
+            return lambda row, name: row[names[position(name)]]
+        if self._iterable_class is FlatValuesListIterable:
+            return lambda row, name: row
+        return lambda row, name: row[position(name)]
+
+
+ShardedManager = models.Manager.from_queryset(ShardedQuerySet)
@@ -0,0 +1,178 @@
+import itertools
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connections
+
+from penguins.features import NUMERIC_FIELDS
+from penguins.models import Penguin
+
+logger = logging.getLogger(__name__)
+
+# Points of one build of the tree, measurements z-scored with the mean and scale of that build
+Snapshot = namedtuple('Snapshot', ['tree', 'pks', 'islands', 'sexes', 'mean', 'scale', 'built_at'])
+
+Neighbor = namedtuple('Neighbor', ['pk', 'distance'])
+
+
+def measurements(penguin):
+    return [float(getattr(penguin, name)) for name in NUMERIC_FIELDS]
+
+
+class SimilarityIndex:
+    """
+    The stored penguins nearest to a query penguin by bill, flipper and mass
+    measurements, standardized so each of the four counts alike whatever its
+    unit.
+
+    The table is loaded into a KD-tree. Penguins saved afterwards are
+    buffered and searched by brute force, deleted ones are skipped, until
+    the buffer holds `rebuild_size` penguins or the tree is `max_age` seconds
+    old. The tree is then rebuilt from the table in the background, which
+    also picks up rows other processes and `bulk_create` wrote.
+    """
+
+    def __init__(self, rebuild_size, max_age):
+        self.rebuild_size = rebuild_size
+        self.max_age = max_age
+
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._rebuilding = False
+        self._sequence = itertools.count(1)
+
+        # pk -> (sequence, measurements, island, sex) saved and pk -> sequence deleted since the tree was built
+        self._buffer = {}
+        self._removed = {}
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {'indexed': 0 if snapshot is None else len(snapshot.pks), 'buffered': len(self._buffer),
+                'removed': len(self._removed), 'age': None if snapshot is None else time.time() - snapshot.built_at}
+
+    def add(self, penguin):
+        with self._lock:
+            self._buffer[penguin.pk] = (next(self._sequence), measurements(penguin), penguin.island, penguin.sex)
+
+    def remove(self, pk):
+        with self._lock:
+            self._buffer.pop(pk, None)
+            self._removed[pk] = next(self._sequence)
+
+    def rebuild(self):
+        # Anything buffered before the table is read is in the new tree, later changes stay buffered
+        with self._lock:
+            started = next(self._sequence)
+
+        snapshot = self._build()
+
+        with self._lock:
+            self._snapshot = snapshot
+            self._buffer = {pk: entry for pk, entry in self._buffer.items() if entry[0] > started}
+            self._removed = {pk: sequence for pk, sequence in self._removed.items() if sequence > started}
+
+    def search(self, values, k, island=None, sex=None, exclude=None):
+        """
+        The `k` nearest penguins to `values` (measurements in `NUMERIC_FIELDS`
+        order), closest first, optionally only from one island and/or sex.
+        """
+        import numpy as np
+
+        if self._snapshot is None:
+            self.rebuild()
+        elif len(self._buffer) >= self.rebuild_size or time.time() - self._snapshot.built_at >= self.max_age:
+            self._rebuild_in_background()
+
+        with self._lock:
+            snapshot = self._snapshot
+            buffer = list(self._buffer.items())
+            skip = {*self._buffer, *self._removed, exclude}
+
+        query = (np.asarray(values, dtype=np.float64) - snapshot.mean) / snapshot.scale
+        neighbors = self._search_tree(snapshot, query, k, island, sex, skip)
+
+        for pk, (_, point, point_island, point_sex) in buffer:
+            if pk != exclude and island in (None, point_island) and sex in (None, point_sex):
+                distance = float(np.linalg.norm((np.asarray(point) - snapshot.mean) / snapshot.scale - query))
+                neighbors.append(Neighbor(pk, distance))
+
+        return sorted(neighbors, key=lambda neighbor: (neighbor.distance, neighbor.pk))[:k]
+
+    @staticmethod
+    def _search_tree(snapshot, query, k, island, sex, skip):
+        count = len(snapshot.pks)
+        if not count:
+            return []
+
+        # Filtered and skipped points are dropped after the query, so ask for more until k are left or none remain
+        fetch = min(count, 2 * k + len(skip))
+        while True:
+            distances, indices = snapshot.tree.query(query, k=[*range(1, fetch + 1)])
+            neighbors = [Neighbor(int(snapshot.pks[i]), float(distance)) for distance, i in zip(distances, indices)
+                         if (island is None or snapshot.islands[i] == island) and
+                         (sex is None or snapshot.sexes[i] == sex) and snapshot.pks[i] not in skip]
+            if len(neighbors) >= k or fetch == count:
+                return neighbors
+            fetch = min(count, fetch * 4)
+
+    def _build(self):
+        import numpy as np
+        from scipy.spatial import cKDTree
+
+        rows = list(Penguin.objects.values_list('pk', 'island', 'sex', *NUMERIC_FIELDS))
+        points = np.array([row[3:] for row in rows], dtype=np.float64).reshape(-1, len(NUMERIC_FIELDS))
+
+        mean = points.mean(axis=0) if len(points) else np.zeros(len(NUMERIC_FIELDS))
+        scale = points.std(axis=0) if len(points) else np.ones(len(NUMERIC_FIELDS))
+        scale[scale == 0] = 1.0
+
+        return Snapshot(tree=cKDTree((points - mean) / scale), pks=np.array([row[0] for row in rows], dtype=np.int64),
+                        islands=np.array([row[1] for row in rows], dtype=object),
+                        sexes=np.array([row[2] for row in rows], dtype=object), mean=mean, scale=scale,
+                        built_at=time.time())
+
+    def _rebuild_in_background(self):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+
+        def run():
+            try:
+                self.rebuild()
+            except Exception:
+                logger.exception('Rebuilding the similarity index failed')
+            finally:
+                self._rebuilding = False
+                connections.close_all()
+
+        threading.Thread(target=run, name='penguins-similarity', daemon=True).start()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_similarity_index() -> SimilarityIndex:
+    global _index
+
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SimilarityIndex(settings.PENGUINS_SIMILAR_REBUILD_SIZE, settings.PENGUINS_SIMILAR_MAX_AGE)
+
+    return _index
+
+
+def penguin_saved(sender, instance, **kwargs):
+    # Only an index that is in use is kept up to date, saving penguins never builds one
+    if _index is not None:
+        _index.add(instance)
+
+
+def penguin_deleted(sender, instance, **kwargs):
+    if _index is not None:
+        _index.remove(instance.pk)
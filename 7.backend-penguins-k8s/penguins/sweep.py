@@ -0,0 +1,138 @@
+import fcntl
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections
+
+from penguins.features import FEATURE_FIELDS, featurize
+from penguins.models import Penguin
+from penguins.registry import get_registry
+
+logger = logging.getLogger(__name__)
+
+# Held by the process sweeping, so the workers of one server do not all score the same rows
+LOCK_FILE = os.path.join(tempfile.gettempdir(), 'penguins-sweep.lock')
+
+
+class StaleSweeper:
+    """
+    Stores the predictions of penguins scored by another model than the
+    default alias, off the request path.
+
+    Detail reads answer with a fresh prediction and hand it to `defer()`,
+    which only puts it on a bounded queue. A background thread writes the
+    deferred rows and, every `interval` seconds, scores up to `batch_size`
+    stale rows the reads have not reached, so the list endpoint and its
+    `?species=` filter catch up as well. Writes skip rows another request
+    has meanwhile scored with the current model.
+    """
+
+    def __init__(self, interval, batch_size, max_queue=1000):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=max_queue)
+
+        self.swept = 0
+        self.dropped = 0
+
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def defer(self, penguin):
+        try:
+            self.queue.put_nowait((penguin.pk, penguin.predicted_species, penguin.model_version))
+        except queue.Full:
+            # The periodic sweep picks the row up instead
+            with self._lock:
+                self.dropped += 1
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='penguins-sweep', daemon=True)
+                self._thread.start()
+
+    def write_deferred(self):
+        rows = []
+        while True:
+            try:
+                rows.append(self.queue.get_nowait())
+            except queue.Empty:
+                return self._store(rows)
+
+    def sweep(self):
+        """
+        Score one batch of stale rows with the default alias and store them.
+        Returns how many rows were written, 0 when another process on this
+        host holds the sweep. `score_penguins` rescores a whole table faster.
+        """
+        with open(LOCK_FILE, 'w') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return 0
+
+            model = get_registry().get(count=False)
+            rows = list(Penguin.objects.exclude(model_version=model.name).order_by('pk')
+                        .values_list('pk', *FEATURE_FIELDS)[:self.batch_size])
+            if not rows:
+                return 0
+
+            predictions = model.artifact.predict(featurize([row[1:] for row in rows], model.artifact.features))
+            return self._store([(row[0], species, model.name) for row, species in zip(rows, predictions.tolist())])
+
+    def _store(self, rows):
+        # One update per species and version, instead of one per row
+        groups = defaultdict(list)
+        for pk, species, version in rows:
+            groups[(species, version)].append(pk)
+
+        written = 0
+        for (species, version), pks in groups.items():
+            written += Penguin.objects.filter(pk__in=pks).exclude(model_version=version) \
+                .update(predicted_species=species, model_version=version)
+
+        with self._lock:
+            self.swept += written
+        return written
+
+    def _run(self):
+        while True:
+            try:
+                # Deferred rows are written as they arrive, rows no read reached once per interval
+                deadline = time.monotonic() + self.interval
+                while (remaining := deadline - time.monotonic()) > 0:
+                    try:
+                        first = self.queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    self._store([first])
+                    self.write_deferred()
+
+                self.sweep()
+            except Exception:
+                logger.exception('Storing stale predictions failed')
+                time.sleep(self.interval)
+            finally:
+                connections.close_all()
+
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+
+def get_sweeper() -> StaleSweeper:
+    global _sweeper
+
+    if _sweeper is None:
+        with _sweeper_lock:
+            if _sweeper is None:
+                _sweeper = StaleSweeper(settings.PENGUINS_SWEEP_INTERVAL, settings.PENGUINS_SWEEP_BATCH_SIZE)
+
+    return _sweeper
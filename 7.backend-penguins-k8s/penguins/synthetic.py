@@ -0,0 +1,150 @@
+import codecs
+import csv
+from collections import defaultdict
+
+import numpy as np
+
+from penguins.features import NUMERIC_FIELDS
+from penguins.models import Penguin
+
+# Column order of generated rows, the Palmer penguins CSV without `year`
+COLUMNS = ('species', 'island', *NUMERIC_FIELDS, 'sex')
+
+# Smaller species/island/sex groups borrow the spread of their species/island group
+MIN_GROUP_SIZE = 5
+
+
+def read_source_csv(stream):
+    """
+    Records of a Palmer penguins style CSV (`species`, `island`, the four
+    measurements and `sex`). Rows with a missing measurement are skipped and
+    a missing sex becomes `NA`, as in the training notebook's `dropna`.
+    """
+    for row in csv.DictReader(codecs.iterdecode(stream, 'utf-8-sig')):
+        try:
+            measurements = [float(row[field]) for field in NUMERIC_FIELDS]
+        except (KeyError, TypeError, ValueError):
+            continue
+        if not row.get('species') or not row.get('island'):
+            continue
+
+        sex = (row.get('sex') or '').lower()
+        yield {'species': row['species'], 'island': row['island'], 'sex': sex if sex in ('male', 'female') else 'NA',
+               **dict(zip(NUMERIC_FIELDS, measurements))}
+
+
+def read_penguin_table():
+    # Stored penguins labelled with their predicted species, for trees without the training CSV
+    rows = Penguin.objects.exclude(predicted_species='').values_list('predicted_species', 'island', 'sex',
+                                                                     *NUMERIC_FIELDS)
+    for species, island, sex, *measurements in rows.iterator(chunk_size=10000):
+        yield {'species': species, 'island': island, 'sex': sex, **dict(zip(NUMERIC_FIELDS, map(float, measurements)))}
+
+
+def fit(records):
+    """
+    Fit one multivariate normal of the four measurements per species, island
+    and sex, weighted by how often the group occurs. Keeping the covariance,
+    not just per-column spreads, preserves correlations such as heavier
+    penguins having longer flippers. Returns a JSON-serializable profile.
+    """
+    groups = defaultdict(list)
+    for record in records:
+        groups[(record['species'], record['island'], record['sex'])].append(
+            [record[field] for field in NUMERIC_FIELDS])
+
+    if not groups:
+        raise ValueError('No complete penguin records to fit')
+
+    parents = defaultdict(list)
+    for (species, island, _), values in groups.items():
+        parents[(species, island)].extend(values)
+
+    everything = np.array([row for values in groups.values() for row in values], dtype=np.float64)
+    profile = {'groups': [], 'low': everything.min(axis=0).tolist(), 'high': everything.max(axis=0).tolist()}
+
+    for (species, island, sex), values in sorted(groups.items()):
+        values = np.array(values, dtype=np.float64)
+        spread = values if len(values) >= MIN_GROUP_SIZE else np.array(parents[(species, island)])
+        covariance = np.cov(spread, rowvar=False) if len(spread) > 1 else np.zeros((len(NUMERIC_FIELDS),) * 2)
+
+        profile['groups'].append({
+            'species': species, 'island': island, 'sex': sex,
+            'weight': len(values) / len(everything),
+            'mean': values.mean(axis=0).tolist(),
+            'covariance': covariance.tolist(),
+        })
+
+    return profile
+
+
+def generate(profile, count, seed=0, chunk_size=10000):
+    """
+    Yield `count` synthetic rows as lists of `COLUMNS` tuples, `chunk_size`
+    rows at a time. Measurements are rounded like the real data and clipped
+    to the range seen while fitting. The same profile, seed and chunk size
+    always produce the same rows.
+    """
+    groups = profile['groups']
+    weights = np.array([group['weight'] for group in groups])
+    weights /= weights.sum()
+    low, high = np.array(profile['low']), np.array(profile['high'])
+
+    labels = [np.array([group[name] for group in groups], dtype=object) for name in ('species', 'island', 'sex')]
+    rng = np.random.default_rng(seed)
+
+    for start in range(0, count, chunk_size):
+        size = min(chunk_size, count - start)
+        picks = rng.choice(len(groups), size=size, p=weights)
+
+        values = np.empty((size, len(NUMERIC_FIELDS)))
+        for index in np.unique(picks):
+            rows = picks == index
+            values[rows] = rng.multivariate_normal(groups[index]['mean'], groups[index]['covariance'],
+                                                   size=rows.sum(), check_valid='ignore')
+
+        values = np.clip(values, low, high)
+        species, island, sex = (column[picks].tolist() for column in labels)
+        yield list(zip(species, island, np.round(values[:, 0], 1).tolist(), np.round(values[:, 1], 1).tolist(),
+                       np.rint(values[:, 2]).astype(int).tolist(), np.rint(values[:, 3]).astype(int).tolist(), sex))
+
+
+def save_penguins(chunks):
+    # Species is the ground truth and is not a Penguin field, score_penguins fills in predictions
+    saved = 0
+    for chunk in chunks:
+        Penguin.objects.bulk_create([Penguin(island=island, bill_length_mm=bill_length, bill_depth_mm=bill_depth,
+                                             flipper_length_mm=flipper_length, body_mass_g=body_mass, sex=sex)
+                                     for _, island, bill_length, bill_depth, flipper_length, body_mass, sex in chunk],
+                                    batch_size=1000)
+        saved += len(chunk)
+        yield saved
+
+
+def write_csv(path, chunks):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+
+        written = 0
+        for chunk in chunks:
+            writer.writerows(chunk)
+            written += len(chunk)
+            yield written
+
+
+def write_parquet(path, chunks):
+    # pyarrow is only needed for this output, so it is imported here
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([('species', pa.string()), ('island', pa.string()), ('bill_length_mm', pa.float64()),
+                        ('bill_depth_mm', pa.float64()), ('flipper_length_mm', pa.int32()),
+                        ('body_mass_g', pa.int32()), ('sex', pa.string())])
+
+    with pq.ParquetWriter(path, schema) as writer:
+        written = 0
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_arrays([pa.array(column) for column in zip(*chunk)], schema=schema))
+            written += len(chunk)
+            yield written
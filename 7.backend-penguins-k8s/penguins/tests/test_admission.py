@@ -0,0 +1,153 @@
+import threading
+import time
+from io import StringIO
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from mock import patch
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .. import admission
+from ..admission import AdmissionController, Rejected
+from ..metrics import get_metrics
+
+client = APIClient()
+
+PENGUIN = {'bill_length_mm': 39.1, 'bill_depth_mm': 18.7, 'flipper_length_mm': 181.0,
+           'body_mass_g': 3750.0, 'island': 'Torgersen', 'sex': 'male'}
+
+
+class AdmissionControllerTest(SimpleTestCase):
+
+    def test_full_queue_is_rejected_at_once(self):
+        controller = AdmissionController(limit=1, queue_size=0, timeout=5)
+        controller.acquire()
+
+        start = time.perf_counter()
+        with pytest.raises(Rejected) as rejected:
+            controller.acquire()
+
+        assert rejected.value.reason == 'queue_full'
+        assert time.perf_counter() - start < 0.1
+
+    def test_waiter_times_out(self):
+        controller = AdmissionController(limit=1, queue_size=1, timeout=0.05)
+        controller.acquire()
+
+        with pytest.raises(Rejected) as rejected:
+            controller.acquire()
+
+        assert rejected.value.reason == 'timeout'
+        assert controller.queue_depth == 0
+
+    def test_time_queued_in_the_server_counts_towards_the_timeout(self):
+        controller = AdmissionController(limit=1, queue_size=1, timeout=0.5)
+
+        # Shed even with a free slot, the client has waited as long as it was promised already
+        with pytest.raises(Rejected) as rejected:
+            controller.acquire(queued=0.5)
+        assert rejected.value.reason == 'timeout'
+        assert controller.in_flight == 0
+
+        assert controller.acquire(queued=0.2) == 0.2
+        start = time.perf_counter()
+        with pytest.raises(Rejected):
+            controller.acquire(queued=0.45)
+        assert time.perf_counter() - start < 0.25
+
+    def test_released_slot_goes_to_the_oldest_waiter(self):
+        controller = AdmissionController(limit=1, queue_size=2, timeout=5)
+        controller.acquire()
+        admitted = []
+
+        def wait(name):
+            controller.acquire()
+            admitted.append(name)
+
+        first = threading.Thread(target=wait, args=('first',))
+        first.start()
+        while controller.queue_depth < 1:
+            time.sleep(0.001)
+        second = threading.Thread(target=wait, args=('second',))
+        second.start()
+        while controller.queue_depth < 2:
+            time.sleep(0.001)
+
+        controller.release()
+        first.join()
+        controller.release()
+        second.join()
+        controller.release()
+
+        assert admitted == ['first', 'second']
+        assert controller.in_flight == 0
+
+
+class AdmissionMiddlewareTest(TestCase):
+
+    def setUp(self):
+        self.controller = AdmissionController(limit=1, queue_size=0, timeout=0.1)
+        patcher = patch('penguins.middleware.get_admission', return_value=self.controller)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @pytest.mark.django_db
+    def test_busy_predict_is_shed_with_retry_after(self):
+        self.controller.acquire()
+
+        response = client.post('/api/penguins/predict/fast/', PENGUIN, format='json')
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response['Retry-After'] == '1'
+        assert 'penguins_admission_rejected_total{reason="queue_full",route="api/penguins/predict/fast/"}' in \
+               get_metrics().exposition()
+
+        # Other endpoints are not limited
+        assert client.get('/api/penguins/').status_code == status.HTTP_200_OK
+
+    @pytest.mark.django_db
+    def test_slot_is_released_after_the_response(self):
+        response = client.post('/api/penguins/predict/', PENGUIN, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert self.controller.in_flight == 0
+        assert 'penguins_admission_in_flight 0' in get_metrics().exposition().splitlines()
+
+    @pytest.mark.django_db
+    def test_streamed_response_holds_its_slot(self):
+        response = client.post('/api/penguins/predict/stream/', b'island,sex,bill_length_mm,bill_depth_mm,'
+                               b'flipper_length_mm,body_mass_g\nTorgersen,male,39.1,18.7,181,3750\n',
+                               content_type='text/csv')
+
+        assert self.controller.in_flight == 1
+        b''.join(response.streaming_content)
+        assert self.controller.in_flight == 0
+
+    @pytest.mark.django_db
+    @override_settings(PENGUINS_ADMISSION_LIMIT=None)
+    def test_serve_defaults_shed_before_the_threads_run_out(self):
+        with patch('penguins.management.commands.serve.PenguinsApplication'), \
+                patch.object(admission, '_controller', None):
+            call_command('serve', stdout=StringIO())
+            controller = admission.get_admission()
+
+        # Every predict slot of a worker is busy while a thread is still free to take requests
+        assert controller.limit == settings.PENGUINS_SERVER_THREADS - 1
+        for _ in range(controller.limit):
+            controller.acquire()
+
+        with patch('penguins.middleware.get_admission', return_value=controller):
+            # This request sat in the server's queue for longer than its deadline before a thread took it
+            admission.arrived(time.monotonic() - settings.PENGUINS_ADMISSION_TIMEOUT)
+            self.addCleanup(admission.arrived, None)
+
+            start = time.perf_counter()
+            response = client.post('/api/penguins/predict/fast/', PENGUIN, format='json')
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert time.perf_counter() - start < settings.PENGUINS_ADMISSION_TIMEOUT
+        assert 'penguins_admission_rejected_total{reason="timeout",route="api/penguins/predict/fast/"}' in \
+               get_metrics().exposition()
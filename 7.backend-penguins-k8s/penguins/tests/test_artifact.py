@@ -0,0 +1,55 @@
+import os
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from ..artifact import ArtifactError, TreeArtifact
+
+
+class TreeArtifactTest(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.artifact = TreeArtifact(settings.PENGUINS_MODEL_DIR / 'penguins-2023-03-16.tree')
+        cls.model = joblib.load(settings.BASE_DIR / 'Predict_PenguinSpecies_DecisionTree_Model.sav')
+
+    def test_artifact_matches_joblib_model(self):
+        # Random penguins spread across (and beyond) the measured ranges
+        rng = np.random.default_rng(0)
+        size = 5000
+        features = pd.DataFrame({
+            'bill_length_mm': rng.uniform(30, 60, size).round(1),
+            'bill_depth_mm': rng.uniform(13, 22, size).round(1),
+            'flipper_length_mm': rng.integers(170, 235, size),
+            'body_mass_g': rng.integers(2700, 6300, size),
+            'island_Dream': rng.integers(0, 2, size),
+            'island_Torgersen': rng.integers(0, 2, size),
+            'sex_male': rng.integers(0, 2, size),
+        })[self.artifact.features]
+
+        assert list(self.artifact.features) == list(self.model.feature_names_in_)
+        assert (self.artifact.predict(features.to_numpy()) == self.model.predict(features)).all()
+
+    def test_artifact_arrays_are_memory_mapped(self):
+        # Arrays are read-only views into the mapped file rather than private copies
+        assert not self.artifact.threshold.flags.writeable
+        assert not self.artifact.threshold.flags.owndata
+
+    def test_corrupt_artifact_is_rejected(self):
+        with open(self.artifact.path, 'rb') as f:
+            data = bytearray(f.read())
+        data[-1] ^= 0xFF
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'corrupt.tree')
+            with open(path, 'wb') as f:
+                f.write(data)
+
+            with pytest.raises(ArtifactError):
+                TreeArtifact(path)
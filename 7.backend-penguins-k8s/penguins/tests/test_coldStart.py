@@ -0,0 +1,33 @@
+from django.test import SimpleTestCase
+
+from .utils import run_check
+
+# Runs in its own interpreter, this one has long imported everything
+CHECK = '''
+import json
+import sys
+import django
+from django.urls import get_resolver
+
+HEAVY = ('numpy', 'pandas', 'sklearn', 'joblib', 'scipy', 'pyarrow')
+
+django.setup()
+get_resolver().url_patterns
+loaded = [name for name in HEAVY if name in sys.modules]
+
+from penguins.features import FEATURE_FIELDS, SAMPLE_PENGUIN, featurize
+from penguins.registry import get_registry
+
+model = get_registry().get(count=False).artifact
+model.predict(featurize([[SAMPLE_PENGUIN[field] for field in FEATURE_FIELDS]], model.features))
+print(json.dumps({'urlconf': loaded, 'predict': [name for name in HEAVY if name in sys.modules]}))
+'''
+
+
+class ColdStartTest(SimpleTestCase):
+
+    def test_ml_stack_loads_on_first_inference(self):
+        result = run_check(CHECK)
+
+        # Commands, migrations and system checks load the URL conf but never predict
+        assert result == {'urlconf': [], 'predict': ['numpy']}
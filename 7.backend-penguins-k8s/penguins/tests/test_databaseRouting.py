@@ -0,0 +1,89 @@
+import pytest
+from django.db import transaction
+from django.test import SimpleTestCase, TransactionTestCase
+
+from ..models import Penguin
+from ..routers import PrimaryReplicaRouter, choose_replica, current_replica, reset
+from .utils import run_check
+
+router = PrimaryReplicaRouter()
+
+# Runs in its own interpreter against a primary and a replica SQLite file in a temporary directory
+SETTINGS = '''
+from project.settings import *
+
+DATABASES = {{
+    'default': {{'ENGINE': 'django.db.backends.sqlite3', 'NAME': '{directory}/primary.sqlite3'}},
+    'replica0': {{'ENGINE': 'django.db.backends.sqlite3', 'NAME': '{directory}/replica0.sqlite3'}},
+}}
+
+PENGUINS_DB_REPLICAS = ['replica0']
+'''
+
+CHECK = '''
+import io
+import json
+import django
+from django.core.management import call_command
+from django.test import Client
+from django.test.utils import setup_test_environment
+
+django.setup()
+setup_test_environment()
+call_command('migrate', verbosity=0)
+call_command('sync_replicas', stdout=io.StringIO())
+
+client = Client()
+penguin = {'island': 'Biscoe', 'sex': 'male', 'bill_length_mm': 48.2, 'bill_depth_mm': 15.6,
+           'flipper_length_mm': 221, 'body_mass_g': 5100}
+created = client.post('/api/penguins/', penguin, content_type='application/json')
+pk = 1
+before = [len(client.get('/api/penguins/').json()), client.get(f'/api/penguins/{pk}/').status_code]
+
+call_command('sync_replicas', stdout=io.StringIO())
+after = [len(client.get('/api/penguins/').json()), client.get(f'/api/penguins/{pk}/').status_code]
+
+updated = client.put(f'/api/penguins/{pk}/', {**penguin, 'body_mass_g': 5200}, content_type='application/json')
+print(json.dumps({'created': created.status_code, 'before': before, 'after': after,
+                  'updated': [updated.status_code, updated.json()['body_mass_g']]}))
+'''
+
+
+class PrimaryReplicaRouterTest(TransactionTestCase):
+
+    def setUp(self):
+        self.token = choose_replica(['replica0'])
+
+    def tearDown(self):
+        reset(self.token)
+
+    @pytest.mark.django_db
+    def test_reads_go_to_the_chosen_replica(self):
+        assert router.db_for_read(Penguin) == 'replica0'
+        assert router.db_for_write(Penguin) == 'default'
+
+    @pytest.mark.django_db
+    def test_a_write_pins_reads_to_the_primary(self):
+        router.db_for_write(Penguin)
+
+        assert current_replica() is None
+        assert router.db_for_read(Penguin) == 'default'
+
+    @pytest.mark.django_db
+    def test_transactions_read_from_the_primary(self):
+        with transaction.atomic():
+            assert router.db_for_read(Penguin) == 'default'
+
+    @pytest.mark.django_db
+    def test_only_the_primary_is_migrated(self):
+        assert router.allow_migrate('default', 'penguins')
+        assert not router.allow_migrate('replica0', 'penguins')
+
+
+class ReplicaRoutingTest(SimpleTestCase):
+
+    def test_reads_lag_until_replicas_sync(self):
+        result = run_check(CHECK, settings_source=SETTINGS)
+
+        # Reads come from the replica until it is synced again, writes and the reads before them from the primary
+        assert result == {'created': 201, 'before': [0, 404], 'after': [1, 200], 'updated': [200, 5200]}
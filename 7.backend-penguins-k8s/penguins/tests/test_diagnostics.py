@@ -0,0 +1,64 @@
+import pytest
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ..diagnostics import memory_tracer
+
+client = APIClient()
+
+
+class MemoryDiagnosticsViewTest(TestCase):
+
+    def setUp(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.admin_client = APIClient()
+        self.admin_client.force_authenticate(user=admin)
+        self.addCleanup(memory_tracer.stop)
+
+    @pytest.mark.django_db
+    def test_memory_endpoint_requires_admin(self):
+        response = client.post('/api/penguins/diagnostics/memory/', {'action': 'start'}, format='json')
+        assert response.status_code in (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN)
+        assert not memory_tracer.tracing
+
+    @pytest.mark.django_db
+    def test_memory_snapshot_diff(self):
+        response = self.admin_client.post('/api/penguins/diagnostics/memory/', {'action': 'start'}, format='json')
+        assert response.json() == {'tracing': True}
+
+        # Allocate something that stays alive until the report
+        retained = [bytearray(1024) for _ in range(1000)]
+
+        report = self.admin_client.get('/api/penguins/diagnostics/memory/?limit=5', format='json').json()
+        assert report['tracing']
+        assert report['top'][0]['file'].endswith('test_diagnostics.py')
+        assert report['top'][0]['size_diff'] >= 1024 * 1000
+        del retained
+
+        response = self.admin_client.post('/api/penguins/diagnostics/memory/', {'action': 'stop'}, format='json')
+        assert response.json() == {'tracing': False}
+
+    @pytest.mark.django_db
+    def test_memory_endpoint_rejects_invalid_parameters(self):
+        for params in ('limit=many', 'limit=0', 'group_by=module'):
+            response = self.admin_client.get(f'/api/penguins/diagnostics/memory/?{params}', format='json')
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        for data in ({'action': 'start', 'frames': 'deep'}, {'action': 'start', 'frames': 1000}, {'action': 'pause'}):
+            response = self.admin_client.post('/api/penguins/diagnostics/memory/', data, format='json')
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not memory_tracer.tracing
+
+    @pytest.mark.django_db
+    @override_settings(PENGUINS_LOG_ALLOCATIONS=True)
+    def test_allocation_logging(self):
+        memory_tracer.start()
+
+        with self.assertLogs('penguins.diagnostics', level='INFO') as logs:
+            client.get('/api/penguins/', format='json')
+            client.get('/metrics')
+
+        assert len(logs.records) == 1
+        assert 'GET /api/penguins/ allocated' in logs.output[0]
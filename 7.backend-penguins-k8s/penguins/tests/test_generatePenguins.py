@@ -0,0 +1,81 @@
+import csv
+import os
+import tempfile
+from io import BytesIO, StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from ..batch import parse_record
+from ..models import Penguin
+from ..synthetic import fit, generate, read_source_csv
+
+SOURCE = b'''species,island,bill_length_mm,bill_depth_mm,flipper_length_mm,body_mass_g,sex,year
+Adelie,Torgersen,39.1,18.7,181,3750,male,2007
+Adelie,Torgersen,39.5,17.4,186,3800,female,2007
+Adelie,Torgersen,40.3,18,195,3250,female,2007
+Adelie,Torgersen,NA,NA,NA,NA,NA,2007
+Adelie,Torgersen,36.7,19.3,193,3450,female,2007
+Adelie,Torgersen,39.3,20.6,190,3650,male,2007
+Gentoo,Biscoe,46.1,13.2,211,4500,female,2007
+Gentoo,Biscoe,50,16.3,230,5700,male,2007
+Gentoo,Biscoe,48.7,14.1,210,4450,female,2007
+Gentoo,Biscoe,50,15.2,218,5700,male,2007
+Chinstrap,Dream,46.5,17.9,192,3500,female,2007
+Chinstrap,Dream,50,19.5,196,3900,male,2007
+'''
+
+
+class GeneratePenguinsTest(TestCase):
+
+    def setUp(self):
+        fd, self.source = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(SOURCE)
+        self.addCleanup(os.remove, self.source)
+
+    def test_generate_is_reproducible_and_realistic(self):
+        profile = fit(read_source_csv(BytesIO(SOURCE)))
+
+        # Incomplete rows are dropped, groups are weighted by their share of the 11 complete rows
+        assert len(profile['groups']) == 6
+        assert sum(group['weight'] for group in profile['groups']) == pytest.approx(1.0)
+
+        rows = [row for chunk in generate(profile, 500, seed=7, chunk_size=100) for row in chunk]
+        assert rows == [row for chunk in generate(profile, 500, seed=7, chunk_size=100) for row in chunk]
+        assert rows != [row for chunk in generate(profile, 500, seed=8, chunk_size=100) for row in chunk]
+
+        # Every row keeps its group's species and island, stays in the observed ranges and passes validation
+        assert {(species, island) for species, island, *_ in rows} <= \
+               {('Adelie', 'Torgersen'), ('Gentoo', 'Biscoe'), ('Chinstrap', 'Dream')}
+        assert all(36.7 <= row[2] <= 50 and 3250 <= row[5] <= 5700 for row in rows)
+        for species, island, *measurements, sex in rows:
+            parse_record({'island': island, 'sex': sex, **dict(zip(
+                ('bill_length_mm', 'bill_depth_mm', 'flipper_length_mm', 'body_mass_g'), measurements))})
+
+    @pytest.mark.django_db
+    def test_command_fills_penguin_table(self):
+        call_command('generate_penguins', 250, source=self.source, chunk_size=100, stdout=StringIO())
+
+        assert Penguin.objects.count() == 250
+        assert set(Penguin.objects.values_list('island', flat=True)) <= {'Torgersen', 'Biscoe', 'Dream'}
+
+    def test_command_writes_csv(self):
+        output = tempfile.mktemp(suffix='.csv')
+        self.addCleanup(lambda: os.path.exists(output) and os.remove(output))
+
+        call_command('generate_penguins', 42, source=self.source, output=output, stdout=StringIO())
+
+        with open(output) as f:
+            rows = list(csv.DictReader(f))
+        assert len(rows) == 42
+        assert list(rows[0]) == ['species', 'island', 'bill_length_mm', 'bill_depth_mm', 'flipper_length_mm',
+                                 'body_mass_g', 'sex']
+
+    @pytest.mark.django_db
+    def test_command_needs_data_to_fit(self):
+        # Without --source the scored Penguin table is used, and it is empty here
+        with pytest.raises(CommandError):
+            call_command('generate_penguins', 10, stdout=StringIO())
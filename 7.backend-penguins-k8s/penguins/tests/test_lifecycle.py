@@ -0,0 +1,126 @@
+import asyncio
+import signal
+import threading
+
+import pytest
+from django.test import TestCase, override_settings
+from mock import patch
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ..lifecycle import Lifecycle
+from .utils import run_check
+
+client = APIClient()
+
+# Runs in its own interpreter, this one has imported the entry points already
+CHECK = '''
+import json
+import signal
+import threading
+import project.asgi
+import project.wsgi
+
+threads = [thread.name for thread in threading.enumerate() if thread.name.startswith('penguins')]
+print(json.dumps({'sigterm': signal.getsignal(signal.SIGTERM) == signal.SIG_DFL, 'threads': threads}))
+'''
+
+
+class LifecycleTest(TestCase):
+
+    def setUp(self):
+        self.lifecycle = Lifecycle()
+        for target in ('penguins.views.lifecycle', 'penguins.middleware.lifecycle'):
+            patcher = patch(target, self.lifecycle)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_liveness(self):
+        response = client.get('/healthz')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {'status': 'ok'}
+
+    @pytest.mark.django_db
+    def test_ready_after_startup(self):
+        assert client.get('/readyz').status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+        self.lifecycle.startup()
+
+        response = client.get('/readyz')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['model'] == 'penguins-2023-03-16'
+        assert response.json()['migrations'] and response.json()['warm']
+
+    @pytest.mark.django_db
+    def test_pending_migrations_are_not_ready(self):
+        with patch('penguins.lifecycle.MigrationExecutor') as executor:
+            executor.return_value.migration_plan.return_value = [('penguins', '0007_new')]
+            with pytest.raises(RuntimeError):
+                self.lifecycle.startup()
+
+        response = client.get('/readyz')
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.json()['error'] == '1 migrations are not applied'
+
+    @pytest.mark.django_db
+    def test_drain_waits_for_in_flight_requests(self):
+        self.lifecycle.startup()
+        self.lifecycle.request_started()
+
+        drained = []
+        drain = threading.Thread(target=lambda: drained.append(self.lifecycle.drain(0, 5)))
+        drain.start()
+
+        # No longer ready while draining, but still serving
+        response = client.get('/readyz')
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.json()['draining']
+        assert drain.is_alive()
+
+        self.lifecycle.request_finished()
+        drain.join()
+        assert drained == [True]
+
+    @override_settings(PENGUINS_DRAIN_DELAY=0, PENGUINS_DRAIN_TIMEOUT=1)
+    def test_sigterm_exits_through_previous_handler_once_drained(self):
+        previous = signal.getsignal(signal.SIGTERM)
+        self.addCleanup(signal.signal, signal.SIGTERM, previous)
+
+        self.lifecycle.install_drain_handler()
+        with patch('penguins.lifecycle.os.kill') as kill:
+            self.lifecycle._handle_sigterm(signal.SIGTERM, None)
+            for thread in threading.enumerate():
+                if thread.name == 'penguins-drain':
+                    thread.join()
+
+        assert self.lifecycle.draining
+        assert signal.getsignal(signal.SIGTERM) == previous
+        kill.assert_called_once()
+
+
+class EntryPointTest(TestCase):
+
+    def test_importing_the_entry_points_starts_nothing(self):
+        assert run_check(CHECK) == {'sigterm': True, 'threads': []}
+
+    def test_asgi_lifespan_starts_the_lifecycle(self):
+        from project import asgi
+
+        async def run():
+            inbox = asyncio.Queue()
+            outbox = []
+            for message in ('lifespan.startup', 'lifespan.shutdown'):
+                await inbox.put({'type': message})
+
+            async def send(event):
+                outbox.append(event['type'])
+
+            await asgi.application({'type': 'lifespan'}, inbox.get, send)
+            return outbox
+
+        with patch.object(asgi.lifecycle, 'start') as start, patch.object(asgi, 'get_sweeper') as get_sweeper:
+            assert asyncio.run(run()) == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+
+        start.assert_called_once()
+        get_sweeper.return_value.start.assert_called_once()
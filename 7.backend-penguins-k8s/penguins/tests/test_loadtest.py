@@ -0,0 +1,50 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from ..loadtest import parse_mix, percentile
+
+
+class LoadtestCommandTest(TestCase):
+
+    def run_loadtest(self, workers=2, **options):
+        stdout = StringIO()
+        call_command('loadtest', duration=0.3, workers=workers, json='-', stdout=stdout, stderr=StringIO(),
+                     **options)
+        return json.loads(stdout.getvalue())
+
+    @pytest.mark.django_db
+    def test_wsgi_threads(self):
+        report = self.run_loadtest(mix='batch')
+
+        assert report['mode'] == 'threads'
+        assert report['scenarios']['batch']['requests'] > 0
+        assert report['total']['errors'] == 0
+        assert report['total']['p50_ms'] <= report['total']['p99_ms'] <= report['total']['max_ms']
+
+    @pytest.mark.django_db
+    def test_asgi_asyncio(self):
+        # Also covers streaming the batch response after the ASGI handler has closed the request body.
+        # One worker, ASGI requests don't wait for an admission slot and the limit may be a single CPU
+        report = self.run_loadtest(workers=1, target='asgi', mix='batch')
+
+        assert report['mode'] == 'asyncio'
+        assert report['scenarios']['batch']['requests'] > 0
+        assert report['total']['errors'] == 0
+
+    @pytest.mark.django_db
+    def test_rejects_bad_options(self):
+        with pytest.raises(CommandError):
+            call_command('loadtest', mix='predict=70,upload=30')
+        with pytest.raises(CommandError):
+            call_command('loadtest', target='asgi', mode='threads')
+
+    def test_parse_mix_and_percentile(self):
+        assert parse_mix('predict=70,list=10,detail') == {'predict': 70.0, 'list': 10.0, 'detail': 1.0}
+        assert percentile(list(range(1, 101)), 50) == 50
+        assert percentile(list(range(1, 101)), 99) == 99
+        assert percentile([], 95) == 0.0
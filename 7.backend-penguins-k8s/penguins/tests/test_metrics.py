@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+import time
+
+import pytest
+from django.test import SimpleTestCase, TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ..metrics import Metrics
+
+client = APIClient()
+
+
+class MetricsTest(SimpleTestCase):
+
+    @staticmethod
+    def test_exposition_format():
+        metrics = Metrics()
+        metrics.inc('penguins_http_requests_total', route='api/penguins/', method='GET', status='200')
+        metrics.observe('penguins_predict_stage_seconds', 0.0003, view='predict', stage='model')
+        metrics.observe('penguins_predict_stage_seconds', 7, view='predict', stage='model')
+
+        lines = metrics.exposition().splitlines()
+
+        assert '# TYPE penguins_http_requests_total counter' in lines
+        assert 'penguins_http_requests_total{method="GET",route="api/penguins/",status="200"} 1' in lines
+        assert 'penguins_predict_stage_seconds_bucket{stage="model",view="predict",le="0.0005"} 1' in lines
+        assert 'penguins_predict_stage_seconds_bucket{stage="model",view="predict",le="+Inf"} 2' in lines
+        assert 'penguins_predict_stage_seconds_count{stage="model",view="predict"} 2' in lines
+
+    def test_workers_are_summed(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        # Another worker process left its values in the shared directory
+        other = Metrics(directory)
+        other.inc('penguins_http_requests_total', 2, route='metrics', method='GET', status='200')
+        other.flush()
+        shutil.move(f'{directory}/{os.getpid()}.json', f'{directory}/1.json')
+
+        metrics = Metrics(directory)
+        metrics.inc('penguins_http_requests_total', route='metrics', method='GET', status='200')
+
+        assert 'penguins_http_requests_total{method="GET",route="metrics",status="200"} 3' in \
+               metrics.exposition().splitlines()
+
+    def test_exited_workers_keep_counters_but_not_gauges(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        # One worker is still running (pid 1), the other has exited
+        for pid in (1, 99999999):
+            other = Metrics(directory)
+            other.set('penguins_admission_queue_depth', 3)
+            other.inc('penguins_admission_rejected_total', route='api/penguins/predict/', reason='timeout')
+            other.flush()
+            shutil.move(f'{directory}/{os.getpid()}.json', f'{directory}/{pid}.json')
+
+        metrics = Metrics(directory)
+        lines = metrics.exposition().splitlines()
+
+        assert 'penguins_admission_queue_depth 3' in lines
+        assert 'penguins_admission_rejected_total{reason="timeout",route="api/penguins/predict/"} 2' in lines
+
+        # The exited worker's counters were folded into the aggregate and its file removed
+        assert sorted(name for name in os.listdir(directory) if name.endswith('.json')) == ['1.json', 'aggregate.json']
+
+        other = Metrics(directory)
+        other.inc('penguins_admission_rejected_total', route='api/penguins/predict/', reason='timeout')
+        other.flush()
+        shutil.move(f'{directory}/{os.getpid()}.json', f'{directory}/99999998.json')
+        metrics.mark_process_dead(99999998)
+        metrics.mark_process_dead(1)
+
+        assert sorted(name for name in os.listdir(directory) if name.endswith('.json')) == ['aggregate.json']
+        assert 'penguins_admission_rejected_total{reason="timeout",route="api/penguins/predict/"} 3' in \
+               metrics.exposition().splitlines()
+
+    def test_values_are_flushed_off_the_request_thread(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        metrics = Metrics(directory, flush_interval=0.01)
+        metrics.inc('penguins_http_requests_total', route='metrics', method='GET', status='200')
+        assert not os.path.exists(f'{directory}/{os.getpid()}.json')
+
+        metrics.start()
+        deadline = time.monotonic() + 5
+        while not os.path.exists(f'{directory}/{os.getpid()}.json') and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert os.path.exists(f'{directory}/{os.getpid()}.json')
+
+
+class MetricsViewTest(TestCase):
+
+    @pytest.mark.django_db
+    def test_metrics_endpoint_reports_predict_stages(self):
+        client.post('/api/penguins/predict/',
+                    {'bill_length_mm': 39.1, 'bill_depth_mm': 18.7, 'flipper_length_mm': 181.0,
+                     'body_mass_g': 3750.0, 'island': 'Torgersen', 'sex': 'male'},
+                    format='json')
+
+        response = client.get('/metrics')
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+
+        body = response.content.decode()
+        for name in ('parse', 'validate', 'db_write', 'featurize', 'model', 'render'):
+            assert f'penguins_predict_stage_seconds_count{{stage="{name}",view="predict"}}' in body
+        assert 'penguins_http_requests_total{method="POST",route="api/penguins/predict/",status="200"}' in body
@@ -1,15 +1,24 @@
 import pytest
 from django.test import TestCase
+from mock import patch
 from rest_framework.test import APIClient
 from rest_framework import status
 from ..models import Penguin
 from ..serializer import PenguinSerializer
+from ..sweep import StaleSweeper
 
 client = APIClient()
 
 
 class PenguinDetailsViewTest(TestCase):
 
+    def setUp(self):
+        # A fresh sweeper per test, its queue holds only what this test deferred
+        self.sweeper = StaleSweeper(interval=10, batch_size=1000)
+        patcher = patch('penguins.sweep._sweeper', self.sweeper)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
     @classmethod
     def setUpTestData(cls):
         Penguin.objects.create(island='fakeIsland1', body_mass_g=10, sex='female', bill_length_mm=10.0,
@@ -33,29 +42,69 @@ class PenguinDetailsViewTest(TestCase):
     @pytest.mark.django_db
     def test_get_specific_penguin(self):
         primary_key = 1
-        penguin = Penguin.objects.get(pk=primary_key)
-        expected_data = PenguinSerializer(penguin).data
 
         # call `GET` with primary key
         response = client.get(f'/api/penguins/{primary_key}/', format='json')
         assert response.status_code == status.HTTP_200_OK
 
+        # Reading an unscored penguin answers with its predicted species without storing it
+        penguin = Penguin.objects.get(pk=primary_key)
+        expected_data = PenguinSerializer(penguin).data
+        assert penguin.predicted_species == ''
+        assert response.json()['predicted_species'] != ''
+
         # Assert penguins are equal
         assert response is not None
         assert response.status_code == status.HTTP_200_OK
-        assert response.json() == expected_data
+        assert {**response.json(), 'predicted_species': '', 'model_version': ''} == expected_data
 
     @pytest.mark.django_db
     def test_update_penguin(self):
         primary_key = 2
         new_penguin = {'island': 'fakeIsland1', 'body_mass_g': 10, 'sex': 'female', 'bill_length_mm': 10.0,
                        'bill_depth_mm': 10.0, 'flipper_length_mm': 10}
-        expected_data = PenguinSerializer(new_penguin).data
 
         # call `PUT` with new Penguin object
         response = client.put(f'/api/penguins/{primary_key}/', new_penguin, format='json')
+        expected_data = PenguinSerializer(Penguin.objects.get(pk=primary_key)).data
+        assert PenguinSerializer(new_penguin).data.items() <= expected_data.items()
 
         # Assert response is successful and penguin data is updated
         assert response is not None
         assert response.status_code == status.HTTP_200_OK
         assert response.json() == expected_data
+
+    @pytest.mark.django_db
+    def test_get_stale_penguin_is_rescored(self):
+        primary_key = 2
+        Penguin.objects.filter(pk=primary_key).update(predicted_species='Gentoo', model_version='retired-model')
+
+        # call `GET` with primary key
+        response = client.get(f'/api/penguins/{primary_key}/', format='json')
+
+        # Assert the prediction is recomputed with the active model, the read itself stores nothing
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['model_version'] == 'penguins-2023-03-16'
+        assert Penguin.objects.get(pk=primary_key).model_version == 'retired-model'
+
+        # The recomputed prediction is stored in the background
+        assert self.sweeper.write_deferred() == 1
+        assert Penguin.objects.filter(pk=primary_key).values_list('predicted_species', 'model_version').get() == \
+               (response.json()['predicted_species'], 'penguins-2023-03-16')
+
+    @pytest.mark.django_db
+    def test_sweep_stores_stale_rows_for_the_species_filter(self):
+        Penguin.objects.update(predicted_species='Chinstrap', model_version='retired-model')
+        Penguin.objects.create(island='Biscoe', body_mass_g=4500, sex='female', bill_length_mm=46.1,
+                               bill_depth_mm=13.2, flipper_length_mm=211, predicted_species='Chinstrap',
+                               model_version='retired-model')
+
+        # Until the sweep, the list only knows the old predictions
+        assert client.get('/api/penguins/', {'species': 'Gentoo'}, format='json').json() == []
+
+        assert self.sweeper.sweep() == 3
+        assert self.sweeper.sweep() == 0
+
+        listed = client.get('/api/penguins/', {'species': 'Gentoo'}, format='json').json()
+        assert [row['island'] for row in listed] == ['Biscoe']
+        assert listed[0]['model_version'] == 'penguins-2023-03-16'
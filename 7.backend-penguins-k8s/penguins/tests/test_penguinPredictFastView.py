@@ -0,0 +1,56 @@
+import json
+
+import pytest
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ..models import Penguin
+
+client = APIClient()
+
+
+class PenguinPredictFastViewTest(TestCase):
+
+    @pytest.mark.django_db
+    def test_post_predict_fast_matches_drf_view(self):
+        penguins = [{'bill_length_mm': 39.1, 'bill_depth_mm': 18.7, 'flipper_length_mm': 181.0,
+                     'body_mass_g': 3750.0, 'island': 'Torgersen', 'sex': 'male'},
+                    {'bill_length_mm': 46.1, 'bill_depth_mm': 13.2, 'flipper_length_mm': 211,
+                     'body_mass_g': 4500, 'island': 'Biscoe', 'sex': 'female'},
+                    {'bill_length_mm': 46.5, 'bill_depth_mm': 17.9, 'flipper_length_mm': 192,
+                     'body_mass_g': 3500, 'island': 'Dream', 'sex': 'female'}]
+
+        for penguin in penguins:
+            fast = client.post('/api/penguins/predict/fast/', penguin, format='json')
+            drf = client.post('/api/penguins/predict/', penguin, format='json')
+
+            assert fast.status_code == status.HTTP_200_OK
+            assert fast.json() == drf.json()
+
+        # Only the DRF view stores the penguins
+        assert Penguin.objects.count() == len(penguins)
+
+    @pytest.mark.django_db
+    def test_post_predict_fast_invalid(self):
+        response = client.post('/api/penguins/predict/fast/',
+                               {'bill_length_mm': -5, 'bill_depth_mm': -10, 'flipper_length_mm': -15,
+                                'body_mass_g': -2000, 'island': 'someFakeIslandName', 'sex': 'NA'},
+                               format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {'detail': 'Bill Length (mm) must be greater than zero'}
+
+        # Strict JSON: no NaN, and the body must be an object
+        response = client.post('/api/penguins/predict/fast/', '{"bill_length_mm": NaN}',
+                               content_type='application/json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        response = client.post('/api/penguins/predict/fast/', json.dumps([1, 2]), content_type='application/json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        # Choices that are not strings are invalid too
+        for island, sex in (('Dream', ['male']), ('Dream', {}), (['Dream'], 'male')):
+            response = client.post('/api/penguins/predict/fast/',
+                                   {'bill_length_mm': 39.1, 'bill_depth_mm': 18.7, 'flipper_length_mm': 181,
+                                    'body_mass_g': 3750, 'island': island, 'sex': sex}, format='json')
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,59 @@
+import pytest
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .. import protocol
+
+client = APIClient()
+
+ADELIE = {'bill_length_mm': 39.1, 'bill_depth_mm': 18.7, 'flipper_length_mm': 181.0, 'body_mass_g': 3750.0,
+          'island_Dream': 0, 'island_Torgersen': 1, 'sex_male': 1}
+GENTOO = {'bill_length_mm': 46.1, 'bill_depth_mm': 13.2, 'flipper_length_mm': 211, 'body_mass_g': 4500,
+          'island_Dream': 0, 'island_Torgersen': 0, 'sex_male': 0}
+CHINSTRAP = {'bill_length_mm': 46.5, 'bill_depth_mm': 17.9, 'flipper_length_mm': 192, 'body_mass_g': 3500,
+             'island_Dream': 1, 'island_Torgersen': 0, 'sex_male': 0}
+INVALID = {'bill_length_mm': -5, 'bill_depth_mm': -10, 'flipper_length_mm': -15, 'body_mass_g': -2000,
+           'island_Dream': 0, 'island_Torgersen': 0, 'sex_male': 0}
+
+
+class PenguinPredictPackedViewTest(TestCase):
+
+    @staticmethod
+    def test_decode_request_is_zero_copy():
+        body = protocol.encode_request([ADELIE, GENTOO])
+        records = protocol.decode_request(body)
+
+        assert not records.flags.owndata
+        assert records['flipper_length_mm'].tolist() == [181.0, 211.0]
+
+    @pytest.mark.django_db
+    def test_post_packed_predictions(self):
+        body = protocol.encode_request([ADELIE, GENTOO, INVALID, CHINSTRAP])
+
+        # call `POST` with packed records
+        response = client.post('/api/penguins/predict/packed/', body, content_type='application/octet-stream')
+        assert response.status_code == status.HTTP_200_OK
+
+        classes = response['X-Model-Classes'].split(',')
+        indices = protocol.decode_response(response.content)
+        assert [classes[i] if i != protocol.INVALID else None for i in indices] == \
+               ['Adelie', 'Gentoo', None, 'Chinstrap']
+
+    @pytest.mark.django_db
+    def test_post_packed_malformed(self):
+        body = protocol.encode_request([ADELIE])
+
+        response = client.post('/api/penguins/predict/packed/', body[:-1], content_type='application/octet-stream')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        response = client.post('/api/penguins/predict/packed/', body, content_type='application/json')
+        assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+
+    @pytest.mark.django_db
+    @override_settings(PENGUINS_PACKED_MAX_RECORDS=1)
+    def test_post_packed_too_many_records(self):
+        body = protocol.encode_request([ADELIE, GENTOO])
+
+        response = client.post('/api/penguins/predict/packed/', body, content_type='application/octet-stream')
+        assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
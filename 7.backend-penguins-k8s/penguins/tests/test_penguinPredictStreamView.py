@@ -0,0 +1,62 @@
+import itertools
+import tracemalloc
+
+import pytest
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ..batch import read_csv, stream_scored, write_csv
+from ..registry import get_registry
+
+client = APIClient()
+
+HEADER = b'island,sex,bill_length_mm,bill_depth_mm,flipper_length_mm,body_mass_g\n'
+ROWS = [b'Torgersen,male,39.1,18.7,181,3750\n',
+        b'Biscoe,female,46.1,13.2,211,4500\n',
+        b'Dream,female,46.5,17.9,192,3500\n']
+
+
+class PenguinPredictStreamViewTest(TestCase):
+
+    @pytest.mark.django_db
+    def test_stream_predictions(self):
+        body = HEADER + b''.join(ROWS) + b'someFakeIslandName,NA,-5,-10,-15,-2000\nDream,unknown,46.5,17.9,192,3500\n'
+
+        # call `POST` with a CSV body
+        response = client.post('/api/penguins/predict/stream/', body, content_type='text/csv')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+
+        # Species is appended to each row and invalid rows carry their error inline
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        assert lines[0] == 'island,sex,bill_length_mm,bill_depth_mm,flipper_length_mm,body_mass_g,species,error'
+        assert lines[1:4] == [row.decode().strip() + f',{species},'
+                              for row, species in zip(ROWS, ['Adelie', 'Gentoo', 'Chinstrap'])]
+        assert lines[4].endswith(',,Bill Length (mm) must be greater than zero')
+        assert lines[5].endswith(',,"sex: ""unknown"" is not a valid choice"')
+
+    @pytest.mark.django_db
+    @override_settings(PENGUINS_STREAM_CHUNK_SIZE=2)
+    def test_stream_is_chunked(self):
+        response = client.post('/api/penguins/predict/stream/', HEADER + b''.join(ROWS), content_type='text/csv')
+
+        # Header and first two rows, then the last row
+        assert [chunk.count(b'\n') for chunk in response.streaming_content] == [3, 1]
+
+    @staticmethod
+    def test_stream_memory_does_not_grow_with_input():
+        model = get_registry().get().artifact
+
+        def peak_memory(repeat):
+            # Input is generated lazily, like a request body read line by line
+            lines = itertools.chain([HEADER], itertools.islice(itertools.cycle(ROWS), repeat))
+            tracemalloc.start()
+            for _ in stream_scored(read_csv(lines), model, write_csv, 100):
+                pass
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return peak
+
+        peak_memory(100)
+        assert peak_memory(20000) < 2 * peak_memory(1000)
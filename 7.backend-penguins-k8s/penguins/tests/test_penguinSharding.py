@@ -0,0 +1,154 @@
+import os
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+from mock import patch
+
+from .. import sharding
+from .utils import run_check
+
+SHARDS = {'Biscoe': 'shard0', 'Dream': 'shard1', 'Torgersen': 'shard1'}
+
+# Runs in its own interpreter against a default and two shard SQLite files in a temporary directory
+SETTINGS = '''
+from project.settings import *
+
+DATABASES = {{alias: {{'ENGINE': 'django.db.backends.sqlite3', 'NAME': f'{directory}/{{alias}}.sqlite3'}}
+             for alias in ('default', 'shard0', 'shard1')}}
+
+PENGUINS_SHARDS = {shards!r}
+
+PENGUINS_SHARD_DEFAULT = 'shard0'
+
+PENGUINS_QUERY_BUDGET_STRICT = True
+'''
+
+CHECK = '''
+import io
+import json
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.db.models import Count, Max
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment
+
+django.setup()
+setup_test_environment()
+for alias in ('default', 'shard0', 'shard1'):
+    call_command('migrate', database=alias, verbosity=0)
+
+from penguins.models import Penguin
+
+def penguin(island, body_mass_g):
+    return {'island': island, 'sex': 'male', 'bill_length_mm': 45.0, 'bill_depth_mm': 15.0,
+            'flipper_length_mm': 210, 'body_mass_g': body_mass_g}
+
+def placement():
+    return {alias: sorted(Penguin.objects.using(alias).values_list('island', flat=True))
+            for alias in ('default', 'shard0', 'shard1')}
+
+# A row from before sharding, in `default` with an auto increment id
+Penguin.objects.using('default').create(**penguin('Dream', 3000))
+
+client = Client()
+for island, body_mass_g in (('Biscoe', 5000), ('Dream', 3500), ('Torgersen', 3700), ('Elsewhere', 4000)):
+    client.post('/api/penguins/', penguin(island, body_mass_g), content_type='application/json')
+
+pks = list(Penguin.objects.order_by('pk').values_list('pk', flat=True))
+response = client.get('/api/penguins/')
+listed = [row['island'] for row in response.json()]
+details = [client.get(f'/api/penguins/{pk}/').status_code for pk in pks]
+stats = Penguin.objects.aggregate(count=Count('pk'), heaviest=Max('body_mass_g'))
+created = placement()
+
+call_command('rebalance_shards', stdout=io.StringIO())
+rebalanced = placement()
+
+with override_settings(PENGUINS_SHARDS={**settings.PENGUINS_SHARDS, 'Dream': 'shard0'}):
+    moved = [client.get(f'/api/penguins/{pk}/').status_code for pk in pks]
+    call_command('rebalance_shards', stdout=io.StringIO())
+    remapped = placement()
+    after = [client.get(f'/api/penguins/{pk}/').status_code for pk in pks]
+
+print(json.dumps({'listed': listed, 'queries': response['X-DB-Queries'], 'details': details, 'stats': stats,
+                  'count': Penguin.objects.count(),
+                  'created': created, 'rebalanced': rebalanced, 'moved': moved, 'remapped': remapped,
+                  'after': after, 'heaviest_first': list(Penguin.objects.order_by('-body_mass_g')
+                                                         .values_list('body_mass_g', flat=True)[:2])}))
+'''
+
+
+class ShardKeyTest(SimpleTestCase):
+
+    @override_settings(PENGUINS_SHARDS=SHARDS, PENGUINS_SHARD_DEFAULT='shard0')
+    def test_ids_carry_the_shard_of_their_island(self):
+        for island, alias in (*SHARDS.items(), ('Elsewhere', 'shard0')):
+            pk = sharding.new_id(island)
+
+            assert sharding.bucket_of(pk) == sharding.bucket(island)
+            assert sharding.alias_for_pk(pk) == alias
+
+        # Ids made in a later millisecond sort after earlier ones, whatever their island
+        first = sharding.new_id('Dream')
+        time.sleep(0.002)
+        assert first < sharding.new_id('Biscoe')
+
+    def test_forked_processes_do_not_share_the_sequence(self):
+        read, write = os.pipe()
+        # The child inherits the patched random source, so its new starting point is known
+        with patch.object(sharding.random, 'getrandbits', return_value=12345):
+            pid = os.fork()
+            if pid == 0:
+                os.write(write, str(next(sharding._sequence)).encode())
+                os._exit(0)
+
+        os.close(write)
+        os.waitpid(pid, 0)
+        with os.fdopen(read) as f:
+            child = int(f.read())
+
+        assert child == 12345
+
+    @override_settings(PENGUINS_SHARDS=SHARDS, PENGUINS_SHARD_DEFAULT='shard0')
+    def test_ids_from_before_sharding_have_no_shard(self):
+        assert sharding.alias_for_pk(1) is None
+        assert sharding.aliases() == ('default', 'shard0', 'shard1')
+
+    def test_sharding_is_off_by_default(self):
+        assert not sharding.enabled()
+        assert sharding.aliases() == ('default',)
+
+    def test_islands_sharing_a_bucket_must_share_an_alias(self):
+        other = next(name for name in (f'island{i}' for i in range(10000))
+                     if sharding.bucket(name) == sharding.bucket('Dream'))
+
+        with override_settings(PENGUINS_SHARDS={'Dream': 'shard0', other: 'shard1'}):
+            with self.assertRaises(ImproperlyConfigured):
+                sharding.aliases()
+
+
+class PenguinShardingTest(SimpleTestCase):
+
+    def test_rows_are_placed_fanned_out_and_rebalanced(self):
+        result = run_check(CHECK, settings_source=SETTINGS, shards=SHARDS)
+
+        # Lists and stats span every shard, merged in creation order, and every id finds its row
+        assert result['listed'] == ['Dream', 'Biscoe', 'Dream', 'Torgersen', 'Elsewhere']
+        # One statement on each shard, run by the fan out threads and counted for the request
+        assert result['queries'] == '3'
+        assert result['details'] == [200] * 5
+        assert result['stats'] == {'count': 5, 'heaviest': 5000}
+        assert result['count'] == 5
+        assert result['heaviest_first'] == [5000, 4000]
+        assert result['created'] == {'default': ['Dream'], 'shard0': ['Biscoe', 'Elsewhere'],
+                                     'shard1': ['Dream', 'Torgersen']}
+
+        # The row from before sharding moves to its island's shard, then Dream moves with its mapping
+        assert result['rebalanced'] == {'default': [], 'shard0': ['Biscoe', 'Elsewhere'],
+                                        'shard1': ['Dream', 'Dream', 'Torgersen']}
+        assert result['moved'] == [200] * 5
+        assert result['remapped'] == {'default': [], 'shard0': ['Biscoe', 'Dream', 'Dream', 'Elsewhere'],
+                                      'shard1': ['Torgersen']}
+        assert result['after'] == [200] * 5
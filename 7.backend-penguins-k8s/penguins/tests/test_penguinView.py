@@ -56,3 +56,19 @@ class PenguinViewTest(TestCase):
         # Assert response is successful and new penguin data is created
         assert get_response.json() == serializer.data
         assert get_response.status_code == status.HTTP_200_OK
+
+    @pytest.mark.django_db
+    def test_post_new_penguin_stores_prediction(self):
+        # call `POST` with an Adelie penguin
+        post_response = client.post('/api/penguins/',
+                                    {'island': 'Torgersen', 'body_mass_g': 3750, 'sex': 'male',
+                                     'bill_length_mm': 39.1, 'bill_depth_mm': 18.7, 'flipper_length_mm': 181},
+                                    format='json')
+        assert post_response.status_code == status.HTTP_201_CREATED
+        assert post_response.json()['predicted_species'] == 'Adelie'
+        assert post_response.json()['model_version'] == 'penguins-2023-03-16'
+
+        # Filter penguins by their stored species
+        get_response = client.get('/api/penguins/?species=Adelie', format='json')
+        assert get_response.status_code == status.HTTP_200_OK
+        assert [penguin['island'] for penguin in get_response.json()] == ['Torgersen']
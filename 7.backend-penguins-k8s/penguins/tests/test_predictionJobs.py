@@ -0,0 +1,153 @@
+import json
+import shutil
+import tempfile
+
+import mock
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .. import jobs
+from ..models import PredictionJob
+
+client = APIClient()
+
+CSV = (b'island,sex,bill_length_mm,bill_depth_mm,flipper_length_mm,body_mass_g\n'
+       b'Torgersen,male,39.1,18.7,181,3750\n'
+       b'Biscoe,female,46.1,13.2,211,4500\n'
+       b'someFakeIslandName,NA,-5,-10,-15,-2000\n'
+       b'Dream,female,46.5,17.9,192,3500\n')
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, PENGUINS_JOB_CHUNK_SIZE=2)
+class PredictionJobViewTest(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    @pytest.mark.django_db
+    @mock.patch.object(jobs, 'submit')
+    def test_csv_job(self, submit):
+        # call `POST` with a CSV upload
+        response = client.post('/api/penguins/jobs/',
+                               {'file': SimpleUploadedFile('penguins.csv', CSV, content_type='text/csv')},
+                               format='multipart')
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.json()['status'] == 'queued'
+        job_id = response.json()['id']
+        submit.assert_called_once()
+
+        # Results are not available until the job has run
+        assert client.get(f'/api/penguins/jobs/{job_id}/result/').status_code == status.HTTP_409_CONFLICT
+
+        # Run the job on this thread instead of the worker pool
+        jobs.run_job(job_id)
+
+        response = client.get(f'/api/penguins/jobs/{job_id}/', format='json')
+        assert response.json()['status'] == 'succeeded'
+        assert response.json()['rows_processed'] == 4
+        assert response.json()['rows_failed'] == 1
+        assert response.json()['progress'] == 1.0
+
+        # Download the streamed result with species appended
+        response = client.get(f'/api/penguins/jobs/{job_id}/result/')
+        assert response.status_code == status.HTTP_200_OK
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        assert lines[0] == 'island,sex,bill_length_mm,bill_depth_mm,flipper_length_mm,body_mass_g,species,error'
+        assert [line.split(',')[6] for line in lines[1:]] == ['Adelie', 'Gentoo', '', 'Chinstrap']
+        assert lines[3].endswith('Bill Length (mm) must be greater than zero')
+
+    @pytest.mark.django_db
+    @mock.patch.object(jobs, 'submit')
+    def test_ndjson_job(self, submit):
+        records = [{'island': 'Torgersen', 'sex': 'male', 'bill_length_mm': 39.1, 'bill_depth_mm': 18.7,
+                    'flipper_length_mm': 181, 'body_mass_g': 3750.0}, {'island': 'Dream'},
+                   {'island': 'Dream', 'sex': ['male'], 'bill_length_mm': 39.1, 'bill_depth_mm': 18.7,
+                    'flipper_length_mm': 181, 'body_mass_g': 3750.0}]
+        body = ''.join(json.dumps(record) + '\n' for record in records).encode()
+
+        response = client.post('/api/penguins/jobs/', {'file': SimpleUploadedFile('penguins.ndjson', body)},
+                               format='multipart')
+        jobs.run_job(response.json()['id'])
+
+        job = PredictionJob.objects.get(pk=response.json()['id'])
+        results = [json.loads(line) for line in job.output_file.open('rb')]
+        assert job.input_format == 'ndjson'
+        assert results[0]['species'] == 'Adelie'
+        assert results[1]['species'] == '' and results[1]['error']
+        assert results[2]['species'] == '' and results[2]['error'].startswith('sex:')
+        assert job.status == 'succeeded'
+
+    @pytest.mark.django_db
+    @override_settings(PENGUINS_JOB_MAX_PENDING=2)
+    def test_job_rejected_when_node_is_busy(self):
+        # Jobs accepted by other worker processes of this node count towards its limit, other nodes' do not
+        PredictionJob.objects.create(input_file='jobs/input/penguins.csv', status='running',
+                                     worker=jobs.worker_id(1234))
+        PredictionJob.objects.create(input_file='jobs/input/penguins.csv', status='queued', worker='elsewhere:1234')
+        PredictionJob.objects.create(input_file='jobs/input/penguins.csv', status='succeeded',
+                                     worker=jobs.worker_id(5678))
+
+        with mock.patch.object(jobs, 'submit') as submit:
+            accepted = client.post('/api/penguins/jobs/', {'file': SimpleUploadedFile('penguins.csv', CSV)},
+                                   format='multipart')
+            response = client.post('/api/penguins/jobs/', {'file': SimpleUploadedFile('penguins.csv', CSV)},
+                                   format='multipart')
+
+        assert accepted.status_code == status.HTTP_202_ACCEPTED
+        assert submit.call_count == 1
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response['Retry-After']
+        assert PredictionJob.objects.count() == 4
+
+    @pytest.mark.django_db
+    def test_job_rejected_by_a_retiring_worker(self):
+        with mock.patch.object(jobs, '_accepting', False):
+            response = client.post('/api/penguins/jobs/', {'file': SimpleUploadedFile('penguins.csv', CSV)},
+                                   format='multipart')
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert PredictionJob.objects.count() == 0
+
+    @pytest.mark.django_db
+    @override_settings(PENGUINS_JOB_WORKERS=1)
+    def test_job_waits_for_a_running_slot_on_the_node(self):
+        other = PredictionJob.objects.create(input_file='jobs/input/penguins.csv', status='running',
+                                             worker=jobs.worker_id(1234))
+        job = PredictionJob.objects.create(input_file='jobs/input/penguins.csv', worker=jobs.worker_id())
+
+        def finish_other(seconds):
+            PredictionJob.objects.filter(pk=other.pk).update(status='succeeded')
+
+        with mock.patch.object(jobs.time, 'sleep', side_effect=finish_other) as sleep:
+            assert jobs.claim(job.pk)
+
+        assert sleep.call_count == 1
+        assert PredictionJob.objects.get(pk=job.pk).status == 'running'
+        assert not jobs.claim(job.pk)
+
+    @pytest.mark.django_db
+    def test_jobs_left_by_exited_processes_fail(self):
+        def job(status, worker):
+            return PredictionJob.objects.create(input_file='jobs/input/penguins.csv', status=status, worker=worker)
+
+        exited = job('running', jobs.worker_id(1234))
+        queued = job('queued', jobs.worker_id(1234))
+        other_worker = job('running', jobs.worker_id(5678))
+        other_host = job('queued', 'elsewhere:1234')
+        done = job('succeeded', jobs.worker_id(1234))
+
+        # A worker exiting fails its own unfinished jobs, a server starting every unfinished job of this host
+        assert jobs.fail_orphaned(1234) == 2
+        assert jobs.fail_orphaned() == 1
+
+        statuses = {row.pk: row.status for row in PredictionJob.objects.all()}
+        assert [statuses[row.pk] for row in (exited, queued, other_worker, other_host, done)] == \
+            ['failed', 'failed', 'failed', 'queued', 'succeeded']
+        assert PredictionJob.objects.get(pk=exited.pk).error
@@ -0,0 +1,48 @@
+import os
+from subprocess import CalledProcessError
+
+from django.test import SimpleTestCase
+from mock import patch
+
+from .utils import run_check
+
+# Runs in its own interpreter, settings cannot be swapped once Django is set up
+CHECK = '''
+import json
+import django
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+
+django.setup()
+call_command('check', fail_level='WARNING')
+
+client = Client()
+registry = client.get('/api/penguins/models/')
+print(json.dumps({
+    'debug_cursor': connection.queries_logged,
+    'registry': [registry.status_code, registry['Content-Type'], registry.get('WWW-Authenticate')],
+    'browsable': client.get('/api/penguins/models/', HTTP_ACCEPT='text/html').status_code,
+    'admin': client.get('/admin/').status_code,
+    'healthz': client.get('/healthz').status_code,
+}))
+'''
+
+
+class ProductionSettingsTest(SimpleTestCase):
+
+    def test_api_pod_profile(self):
+        result = run_check(CHECK, 'project.settings_production',
+                           env={'DJANGO_SECRET_KEY': 'test', 'DJANGO_ALLOWED_HOSTS': 'testserver'})
+
+        # No SQL kept, a Basic authentication challenge in JSON, no browsable API and no admin
+        assert result == {'debug_cursor': False, 'registry': [401, 'application/json', 'Basic realm="api"'],
+                          'browsable': 406, 'admin': 404, 'healthz': 200}
+
+    def test_allowed_hosts_are_required(self):
+        with patch.dict(os.environ):
+            os.environ.pop('DJANGO_ALLOWED_HOSTS', None)
+            with self.assertRaises(CalledProcessError) as error:
+                run_check(CHECK, 'project.settings_production', env={'DJANGO_SECRET_KEY': 'test'})
+
+        assert "KeyError: 'DJANGO_ALLOWED_HOSTS'" in error.exception.stderr
@@ -0,0 +1,50 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+client = APIClient()
+
+PROFILE_DIR = tempfile.mkdtemp()
+
+PENGUIN = {'bill_length_mm': 39.1, 'bill_depth_mm': 18.7, 'flipper_length_mm': 181.0,
+           'body_mass_g': 3750.0, 'island': 'Torgersen', 'sex': 'male'}
+
+
+@override_settings(PENGUINS_PROFILE_TOKEN='secret', PENGUINS_PROFILE_DIR=PROFILE_DIR, PENGUINS_PROFILE_KEEP=2)
+class ProfilingMiddlewareTest(TestCase):
+
+    def tearDown(self):
+        shutil.rmtree(PROFILE_DIR, ignore_errors=True)
+
+    @pytest.mark.django_db
+    def test_privileged_request_is_profiled(self):
+        # Warm up first, so first-request imports do not crowd the view out of the summary
+        client.post('/api/penguins/predict/', PENGUIN, format='json')
+        response = client.post('/api/penguins/predict/', PENGUIN, format='json', HTTP_X_PROFILE='secret')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert 'post (views.py:' in response['X-Profile-Summary']
+        assert os.listdir(PROFILE_DIR) == [response['X-Profile-File']]
+
+    @pytest.mark.django_db
+    def test_requests_without_token_are_not_profiled(self):
+        response = client.post('/api/penguins/predict/', PENGUIN, format='json', HTTP_X_PROFILE='wrong')
+
+        assert 'X-Profile-Summary' not in response
+        assert not os.path.exists(PROFILE_DIR) or os.listdir(PROFILE_DIR) == []
+
+    @pytest.mark.django_db
+    @override_settings(PENGUINS_PROFILE_SAMPLE_RATE=1.0)
+    def test_sampled_profiles_are_kept_in_a_ring(self):
+        for _ in range(3):
+            response = client.get('/api/penguins/', format='json')
+
+            # Sampled requests are written to disk only
+            assert 'X-Profile-Summary' not in response
+
+        assert len(os.listdir(PROFILE_DIR)) == 2
@@ -0,0 +1,49 @@
+import pytest
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from penguins.models import Penguin
+from penguins.querycount import QueryBudgetExceeded, QueryRecorder
+
+client = APIClient()
+
+PENGUIN = {'bill_length_mm': 39.1, 'bill_depth_mm': 18.7, 'flipper_length_mm': 181.0,
+           'body_mass_g': 3750.0, 'island': 'Torgersen', 'sex': 'male'}
+
+
+class QueryCountMiddlewareTest(TestCase):
+
+    @pytest.mark.django_db
+    def test_response_reports_queries(self):
+        Penguin.objects.create(**PENGUIN)
+
+        response = client.get('/api/penguins/')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response['X-DB-Queries'] == '1'
+        assert float(response['X-DB-Time-Ms']) >= 0
+
+    @pytest.mark.django_db
+    def test_recorder_counts_queries(self):
+        with QueryRecorder() as queries:
+            client.post('/api/penguins/', PENGUIN, format='json')
+            client.get('/api/penguins/')
+
+        assert queries.count == 2
+        assert queries.seconds > 0
+
+    @pytest.mark.django_db
+    @override_settings(PENGUINS_QUERY_BUDGETS={'api/penguins/': 0})
+    def test_exceeding_budget_fails(self):
+        with pytest.raises(QueryBudgetExceeded):
+            client.get('/api/penguins/')
+
+    @pytest.mark.django_db
+    @override_settings(PENGUINS_SLOW_QUERY_MS=0)
+    def test_slow_queries_are_logged_with_plan(self):
+        with self.assertLogs('penguins.diagnostics', level='WARNING') as logs:
+            client.get('/api/penguins/')
+
+        assert 'Slow query' in logs.output[0]
+        assert 'SCAN' in logs.output[0]
@@ -0,0 +1,127 @@
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+import mock
+import pytest
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ..registry import ModelRegistry, UnknownModelVersion
+
+client = APIClient()
+
+
+class ModelRegistryTest(TestCase):
+
+    def setUp(self):
+        # Registry directory holding two copies of the exported tree
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+        for name in ('v1', 'v2'):
+            shutil.copy(settings.PENGUINS_MODEL_DIR / 'penguins-2023-03-16.tree', self.directory / f'{name}.tree')
+        (self.directory / 'aliases.json').write_text(json.dumps({'live': 'v1'}))
+
+        self.registry = ModelRegistry(self.directory, capacity=1)
+
+    def test_resolve_alias_name_and_hash(self):
+        sha256 = self.registry.get('v1').artifact.sha256
+
+        assert self.registry.resolve() == 'v1'
+        assert self.registry.resolve('v2') == 'v2'
+        assert self.registry.resolve(sha256[:12]) in ('v1', 'v2')
+
+        with pytest.raises(UnknownModelVersion):
+            self.registry.resolve('v3')
+
+    def test_resolve_only_opens_versions_in_the_directory(self):
+        outside = self.directory / 'outside'
+        outside.mkdir()
+        shutil.copy(self.directory / 'v1.tree', outside / 'v3.tree')
+
+        for name in ('outside/v3', '../' + self.directory.name + '/v1', str(self.directory / 'v1')):
+            with pytest.raises(UnknownModelVersion):
+                self.registry.get(name)
+
+    def test_least_recently_used_version_is_evicted(self):
+        self.registry.get('v1')
+        self.registry.get('v2')
+        self.registry.get('v2')
+
+        assert self.registry.resident() == ['v2']
+        assert self.registry.request_counts == {'v1': 1, 'v2': 2}
+
+    def test_promote_moves_alias(self):
+        assert self.registry.promote('v2') == 'v2'
+
+        assert self.registry.resolve() == 'v2'
+        assert json.loads((self.directory / 'aliases.json').read_text()) == {'live': 'v2'}
+        assert not list(self.directory.glob('tmp*'))
+
+        # Without a version nothing is promoted, not even the live version again
+        with pytest.raises(UnknownModelVersion):
+            self.registry.promote('')
+
+    def test_versions_are_listed_again_only_when_the_directory_changes(self):
+        with mock.patch.object(Path, 'glob', wraps=self.registry.directory.glob) as glob:
+            for _ in range(3):
+                assert self.registry.resolve('v2') == 'v2'
+            assert glob.call_count == 1
+
+        shutil.copy(self.directory / 'v1.tree', self.directory / 'v3.tree')
+        assert self.registry.resolve('v3') == 'v3'
+
+
+class ModelRegistryViewTest(TestCase):
+
+    @pytest.mark.django_db
+    def test_models_endpoint_requires_admin(self):
+        response = client.get('/api/penguins/models/', format='json')
+        assert response.status_code in (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN)
+
+    @pytest.mark.django_db
+    def test_models_endpoint_lists_versions(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        admin_client = APIClient()
+        admin_client.force_authenticate(user=admin)
+
+        response = admin_client.get('/api/penguins/models/', format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['aliases'] == {'live': 'penguins-2023-03-16'}
+        assert 'penguins-2023-03-16' in response.json()['versions']
+
+    @pytest.mark.django_db
+    def test_predict_unknown_model_version(self):
+        response = client.post('/api/penguins/predict/?model=does-not-exist',
+                               {'bill_length_mm': 39.1, 'bill_depth_mm': 18.7, 'flipper_length_mm': 181.0,
+                                'body_mass_g': 3750.0, 'island': 'Torgersen', 'sex': 'male'},
+                               format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    @pytest.mark.django_db
+    def test_promote_requires_a_version(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        admin_client = APIClient()
+        admin_client.force_authenticate(user=admin)
+
+        for data in ({}, {'version': ''}, {'alias': 'live'}):
+            response = admin_client.post('/api/penguins/models/promote/', data, format='json')
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+            assert 'version' in response.json()
+
+    @pytest.mark.django_db
+    def test_predict_resolves_the_version_once(self):
+        with mock.patch('penguins.registry.ModelRegistry.resolve', autospec=True,
+                        side_effect=ModelRegistry.resolve) as resolve:
+            response = client.post('/api/penguins/predict/',
+                                   {'bill_length_mm': 39.1, 'bill_depth_mm': 18.7, 'flipper_length_mm': 181.0,
+                                    'body_mass_g': 3750.0, 'island': 'Torgersen', 'sex': 'male'}, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert resolve.call_count == 1
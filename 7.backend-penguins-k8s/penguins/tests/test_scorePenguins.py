@@ -0,0 +1,66 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..management.commands.score_penguins import ResumePoint
+from ..models import Penguin
+
+
+class ScorePenguinsCommandTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for _ in range(3):
+            Penguin.objects.create(island='Torgersen', body_mass_g=3750, sex='male', bill_length_mm=39.1,
+                                   bill_depth_mm=18.7, flipper_length_mm=181)
+            Penguin.objects.create(island='Biscoe', body_mass_g=4500, sex='female', bill_length_mm=46.1,
+                                   bill_depth_mm=13.2, flipper_length_mm=211)
+            Penguin.objects.create(island='Dream', body_mass_g=3500, sex='female', bill_length_mm=46.5,
+                                   bill_depth_mm=17.9, flipper_length_mm=192)
+
+    @pytest.mark.django_db
+    def test_score_penguins(self):
+        call_command('score_penguins', workers=2, chunk_size=2, stdout=StringIO())
+
+        # Every penguin is scored with the live model version
+        assert list(Penguin.objects.values_list('model_version', flat=True).distinct()) == ['penguins-2023-03-16']
+        assert list(Penguin.objects.filter(island='Torgersen').values_list('predicted_species', flat=True)) == \
+               ['Adelie'] * 3
+        assert list(Penguin.objects.filter(island='Biscoe').values_list('predicted_species', flat=True)) == \
+               ['Gentoo'] * 3
+        assert list(Penguin.objects.filter(island='Dream').values_list('predicted_species', flat=True)) == \
+               ['Chinstrap'] * 3
+
+    @pytest.mark.django_db
+    def test_score_penguins_resumes(self):
+        # Rows after the first four are already scored by the live model
+        fourth_pk = Penguin.objects.order_by('pk').values_list('pk', flat=True)[3]
+        Penguin.objects.filter(pk__gt=fourth_pk).update(predicted_species='Gentoo', model_version='penguins-2023-03-16')
+
+        out = StringIO()
+        call_command('score_penguins', workers=1, stdout=out)
+
+        assert 'Scored 4 penguins' in out.getvalue()
+        assert Penguin.objects.filter(model_version='').count() == 0
+
+
+class ResumePointTest(TestCase):
+
+    def test_ranges_finishing_out_of_order(self):
+        resume = ResumePoint(after_pk=10)
+        for last_pk in (20, 30, 40, 50):
+            resume.submitted(last_pk)
+
+        # Later ranges finishing first do not move the resume point past an unfinished one
+        resume.finished(30)
+        resume.finished(50)
+        assert resume.completed_through == 10
+
+        # Once the first range is written, every finished range right after it counts as well
+        resume.finished(20)
+        assert resume.completed_through == 30
+
+        resume.finished(40)
+        assert resume.completed_through == 50
@@ -0,0 +1,146 @@
+import os
+import tempfile
+import threading
+import time
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from mock import patch
+
+from .. import admission, server
+
+
+class ServerTest(SimpleTestCase):
+
+    def cgroup(self, content):
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+
+        patcher = patch.object(server, 'CGROUP_V2_CPU_MAX', path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_cpu_limit_from_cgroup_quota(self):
+        # A Kubernetes limit of 1500m, on a machine with more CPUs
+        self.cgroup('150000 100000\n')
+
+        with patch.object(server.os, 'sched_getaffinity', return_value=set(range(8))):
+            assert server.cpu_limit() == 1.5
+            assert server.default_workers() == 2
+
+    def test_cpu_limit_without_quota(self):
+        self.cgroup('max 100000\n')
+
+        with patch.object(server.os, 'sched_getaffinity', return_value=set(range(8))):
+            assert server.cpu_limit() == 8
+            assert server.default_workers() == 8
+
+    @override_settings(PENGUINS_ADMISSION_LIMIT=None)
+    def test_serve_command_options(self):
+        with patch('penguins.management.commands.serve.PenguinsApplication') as application, \
+                patch('penguins.management.commands.serve.default_workers', return_value=3):
+            call_command('serve', threads=2, max_requests=500, stdout=StringIO())
+
+        options = application.call_args[0][0]
+        assert options['workers'] == 3
+        assert options['threads'] == 2
+        assert options['max_requests'] == 500
+        assert options['max_requests_jitter'] == 1000
+        application.return_value.run.assert_called_once()
+
+    def test_exited_worker_fails_its_unfinished_jobs(self):
+        with patch.object(server.jobs, 'fail_orphaned', return_value=1) as fail_orphaned, \
+                patch.object(server, 'get_metrics') as get_metrics, \
+                patch.object(server.connections, 'close_all') as close_all:
+            server.child_exit(None, type('Worker', (), {'pid': 1234})())
+
+        fail_orphaned.assert_called_once_with(1234)
+        get_metrics.return_value.mark_process_dead.assert_called_once_with(1234)
+        close_all.assert_called_once()
+
+    @override_settings(PENGUINS_ADMISSION_LIMIT=None)
+    def test_serve_sizes_admission_from_the_threads(self):
+        with patch('penguins.management.commands.serve.PenguinsApplication'):
+            call_command('serve', threads=8, stdout=StringIO())
+            assert settings.PENGUINS_ADMISSION_LIMIT == 7
+
+        with override_settings(PENGUINS_ADMISSION_LIMIT=2), \
+                patch('penguins.management.commands.serve.PenguinsApplication'):
+            call_command('serve', threads=8, stdout=StringIO())
+            assert settings.PENGUINS_ADMISSION_LIMIT == 2
+
+    def test_threaded_worker_reports_time_queued_for_a_thread(self):
+        handled = []
+
+        class Worker:
+            def enqueue_req(self, conn):
+                self.queued = conn
+
+            def handle(self, conn):
+                handled.append(admission.queued_for())
+
+        worker = Worker()
+        server.track_queueing(worker)
+        self.addCleanup(admission.arrived, None)
+
+        conn = type('Connection', (), {})()
+        worker.enqueue_req(conn)
+        conn.penguins_queued_at -= 0.3
+        worker.handle(worker.queued)
+
+        assert handled[0] >= 0.3
+
+    @override_settings(PENGUINS_METRICS_DIR=None)
+    def test_workers_share_a_metrics_directory(self):
+        with patch.dict(os.environ), patch.object(server, 'get_metrics') as get_metrics:
+            directory = server.share_metrics()
+            self.addCleanup(os.rmdir, directory)
+
+            # Set in the master, so the forked workers and anything they start inherit it
+            assert os.path.isdir(directory)
+            assert settings.PENGUINS_METRICS_DIR == os.environ['PENGUINS_METRICS_DIR'] == directory
+            assert get_metrics.return_value.directory == directory
+
+        with override_settings(PENGUINS_METRICS_DIR=directory), patch.object(server, 'get_metrics'):
+            assert server.share_metrics() is None
+
+    def test_exiting_worker_flushes_its_metrics(self):
+        with patch.object(server, 'get_metrics') as get_metrics:
+            server.worker_exit(None, type('Worker', (), {'pid': 1234})())
+
+        get_metrics.return_value.flush.assert_called_once()
+
+    def test_worker_is_not_recycled_while_a_job_runs(self):
+        worker = type('Worker', (), {'nr': 8, 'max_requests': 10, 'alive': True})()
+
+        def handle_request():
+            # What a gunicorn worker does with every request, after the hook
+            server.pre_request(worker, None)
+            worker.nr += 1
+            if worker.nr >= worker.max_requests:
+                worker.alive = False
+
+        release = threading.Event()
+        with patch.object(server.jobs, '_accepting', True), \
+                patch.object(server.jobs, 'run_job', side_effect=lambda job_id: release.wait(5)):
+            job = type('Job', (), {'pk': 1})()
+            server.jobs.submit(job)
+
+            # The job is still running when the worker reaches max requests
+            for _ in range(5):
+                handle_request()
+            assert worker.alive
+
+            release.set()
+            while server.jobs._in_flight:
+                time.sleep(0.01)
+            handle_request()
+
+            # Retiring, and a job sent to it meanwhile is turned away instead of dying with the worker
+            assert not worker.alive
+            with self.assertRaises(server.jobs.JobQueueFull):
+                server.jobs.submit(job)
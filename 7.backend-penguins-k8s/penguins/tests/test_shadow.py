@@ -0,0 +1,59 @@
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from ..registry import ModelRegistry
+from ..shadow import ShadowEvaluator
+
+ADELIE = {'bill_length_mm': 39.1, 'bill_depth_mm': 18.7, 'flipper_length_mm': 181.0, 'body_mass_g': 3750.0,
+          'island_Dream': False, 'island_Torgersen': True, 'sex_male': True}
+GENTOO = {'bill_length_mm': 46.1, 'bill_depth_mm': 13.2, 'flipper_length_mm': 211, 'body_mass_g': 4500,
+          'island_Dream': False, 'island_Torgersen': False, 'sex_male': False}
+
+
+class ShadowEvaluatorTest(SimpleTestCase):
+
+    def setUp(self):
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory)
+        shutil.copy(settings.PENGUINS_MODEL_DIR / 'penguins-2023-03-16.tree', directory / 'candidate.tree')
+        shutil.copy(settings.PENGUINS_MODEL_DIR / 'penguins-2023-03-16.tree', directory / 'live.tree')
+        (directory / 'aliases.json').write_text('{"next": "candidate"}')
+
+        self.registry = ModelRegistry(directory)
+
+    def test_disagreements_and_confusion(self):
+        shadow = ShadowEvaluator(self.registry, 'candidate')
+
+        # Live model "said" Chinstrap for the Gentoo penguin, the candidate disagrees
+        shadow.submit(ADELIE, 'Adelie')
+        shadow.submit(GENTOO, 'Chinstrap')
+        shadow.queue.join()
+
+        stats = shadow.stats()
+        assert stats['compared'] == 2
+        assert stats['disagreements'] == 1
+        assert stats['confusion'] == {'Adelie': {'Adelie': 1}, 'Chinstrap': {'Gentoo': 1}}
+        assert self.registry.request_counts == {}
+
+    def test_full_queue_drops_rows(self):
+        shadow = ShadowEvaluator(self.registry, 'candidate', max_queue=1, autostart=False)
+
+        # Nothing is draining the queue, so only the first row fits
+        for _ in range(3):
+            shadow.submit(ADELIE, 'Adelie')
+
+        shadow.start()
+        shadow.queue.join()
+
+        stats = shadow.stats()
+        assert stats['dropped'] == 2
+        assert stats['compared'] == 1
+
+    def test_candidate_alias_does_not_shadow_its_own_version(self):
+        assert not ShadowEvaluator(self.registry, 'next').shadows('candidate')
+        assert ShadowEvaluator(self.registry, 'next').shadows('live')
+        assert not ShadowEvaluator(self.registry, 'candidate').shadows('candidate')
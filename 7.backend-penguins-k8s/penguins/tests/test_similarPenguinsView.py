@@ -0,0 +1,109 @@
+import random
+
+import numpy as np
+import pytest
+from django.test import TestCase
+from mock import patch
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ..models import Penguin
+from ..similarity import SimilarityIndex, measurements
+
+client = APIClient()
+
+
+def penguin(island, sex, bill_length_mm, bill_depth_mm, flipper_length_mm, body_mass_g):
+    return Penguin.objects.create(island=island, sex=sex, bill_length_mm=bill_length_mm, bill_depth_mm=bill_depth_mm,
+                                  flipper_length_mm=flipper_length_mm, body_mass_g=body_mass_g)
+
+
+class SimilarPenguinsViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.adelie = penguin('Torgersen', 'male', 39.1, 18.7, 181, 3750)
+        cls.adelie_like = penguin('Dream', 'male', 39.5, 18.4, 183, 3700)
+        cls.adelie_female = penguin('Torgersen', 'female', 38.0, 17.9, 185, 3450)
+        cls.gentoo = penguin('Biscoe', 'male', 50.0, 15.2, 218, 5700)
+        cls.chinstrap = penguin('Dream', 'female', 46.5, 17.9, 192, 3500)
+
+    def setUp(self):
+        # A fresh index per test, so no rows of other tests linger in it
+        self.index = SimilarityIndex(rebuild_size=1000, max_age=300)
+        patcher = patch('penguins.similarity._index', self.index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @pytest.mark.django_db
+    def test_similar_to_a_stored_penguin(self):
+        response = client.get(f'/api/penguins/{self.adelie.pk}/similar/', {'k': 3})
+        assert response.status_code == status.HTTP_200_OK
+
+        # Closest first, without the penguin itself
+        assert [result['id'] for result in response.data] == [self.adelie_like.pk, self.adelie_female.pk,
+                                                              self.chinstrap.pk]
+        assert response.data[0]['island'] == 'Dream'
+        assert 0 < response.data[0]['distance'] < response.data[1]['distance']
+
+    @pytest.mark.django_db
+    def test_filter_by_island_and_sex(self):
+        response = client.get(f'/api/penguins/{self.adelie.pk}/similar/', {'island': 'Dream'})
+        assert [result['id'] for result in response.data] == [self.adelie_like.pk, self.chinstrap.pk]
+
+        response = client.get(f'/api/penguins/{self.adelie.pk}/similar/', {'sex': 'female', 'island': 'Dream'})
+        assert [result['id'] for result in response.data] == [self.chinstrap.pk]
+
+    @pytest.mark.django_db
+    def test_similar_to_measurements(self):
+        response = client.get('/api/penguins/similar/', {'bill_length_mm': 49.1, 'bill_depth_mm': 15.0,
+                                                         'flipper_length_mm': 220, 'body_mass_g': 5500, 'k': 1})
+        assert response.status_code == status.HTTP_200_OK
+        assert [result['id'] for result in response.data] == [self.gentoo.pk]
+
+    @pytest.mark.django_db
+    def test_invalid_queries(self):
+        assert client.get(f'/api/penguins/{self.adelie.pk}/similar/', {'k': 1000}).status_code == \
+            status.HTTP_400_BAD_REQUEST
+        assert client.get('/api/penguins/similar/', {'bill_length_mm': 49.1}).status_code == \
+            status.HTTP_400_BAD_REQUEST
+        assert client.get('/api/penguins/999/similar/').status_code == status.HTTP_404_NOT_FOUND
+
+    @pytest.mark.django_db
+    def test_saved_penguins_are_found_before_the_next_rebuild(self):
+        client.get(f'/api/penguins/{self.adelie.pk}/similar/')
+        twin = penguin('Biscoe', 'male', 39.1, 18.7, 181, 3751)
+        self.gentoo.delete()
+
+        response = client.get(f'/api/penguins/{self.adelie.pk}/similar/', {'island': 'Biscoe'})
+        assert [result['id'] for result in response.data] == [twin.pk]
+        assert self.index.stats()['indexed'] == 5
+        assert self.index.stats()['buffered'] == 1
+
+
+class SimilarityIndexTest(TestCase):
+
+    @pytest.mark.django_db
+    def test_matches_a_brute_force_search(self):
+        generator = random.Random(0)
+        Penguin.objects.bulk_create([
+            Penguin(island=generator.choice(('Biscoe', 'Dream', 'Torgersen')), sex=generator.choice(('male', 'female')),
+                    bill_length_mm=round(generator.uniform(32, 60), 1),
+                    bill_depth_mm=round(generator.uniform(13, 21), 1),
+                    flipper_length_mm=generator.randint(172, 231), body_mass_g=generator.randint(2700, 6300))
+            for _ in range(300)])
+        penguins = list(Penguin.objects.all())
+
+        points = np.array([measurements(row) for row in penguins])
+        scaled = (points - points.mean(axis=0)) / points.std(axis=0)
+        query = [45.0, 17.0, 200, 4200]
+        distances = np.linalg.norm(scaled - (np.array(query) - points.mean(axis=0)) / points.std(axis=0), axis=1)
+
+        index = SimilarityIndex(rebuild_size=1000, max_age=300)
+        for island, sex in ((None, None), ('Torgersen', None), ('Dream', 'female')):
+            expected = sorted((distance, row.pk) for distance, row in zip(distances, penguins)
+                              if island in (None, row.island) and sex in (None, row.sex))[:10]
+            found = index.search(query, 10, island=island, sex=sex)
+
+            assert [neighbor.pk for neighbor in found] == [pk for _, pk in expected]
+            assert np.allclose([neighbor.distance for neighbor in found], [distance for distance, _ in expected])
@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+from django.test import SimpleTestCase, override_settings
+from mock import patch
+
+from penguins import batch, websocket
+from project.asgi import application
+
+ADELIE = {'bill_length_mm': 39.1, 'bill_depth_mm': 18.7, 'flipper_length_mm': 181.0,
+          'body_mass_g': 3750.0, 'island': 'Torgersen', 'sex': 'male'}
+GENTOO = {'bill_length_mm': 46.1, 'bill_depth_mm': 13.2, 'flipper_length_mm': 211,
+          'body_mass_g': 4500, 'island': 'Biscoe', 'sex': 'female'}
+INVALID = {'bill_length_mm': -5, 'bill_depth_mm': -10, 'flipper_length_mm': -15,
+           'body_mass_g': -2000, 'island': 'someFakeIslandName', 'sex': 'NA'}
+
+
+def converse(messages, path='/ws/penguins/predict/', query_string=b''):
+    # Drive the ASGI application like a server would for one WebSocket connection
+    async def run():
+        inbox = asyncio.Queue()
+        outbox = []
+
+        await inbox.put({'type': 'websocket.connect'})
+        for message in messages:
+            await inbox.put({'type': 'websocket.receive', 'text': message})
+        await inbox.put({'type': 'websocket.disconnect', 'code': 1000})
+
+        async def send(event):
+            outbox.append(event)
+
+        scope = {'type': 'websocket', 'path': path, 'query_string': query_string}
+        await application(scope, inbox.get, send)
+        return outbox
+
+    return asyncio.run(run())
+
+
+class PredictWebSocketTest(SimpleTestCase):
+
+    def test_stream_predictions(self):
+        events = converse([json.dumps({'id': 1, **ADELIE}), json.dumps({'id': 2, **GENTOO}),
+                           json.dumps({'id': 3, **INVALID}), 'not json'])
+
+        assert events[0] == {'type': 'websocket.accept'}
+        assert [json.loads(event['text']) for event in events[1:]] == [
+            {'id': 1, 'species': 'Adelie'},
+            {'id': 2, 'species': 'Gentoo'},
+            {'id': 3, 'error': 'Bill Length (mm) must be greater than zero'},
+            {'error': 'Expected a JSON object'},
+        ]
+
+    @override_settings(PENGUINS_WEBSOCKET_BACKLOG=1, PENGUINS_WEBSOCKET_BATCH_SIZE=1)
+    def test_small_backlog_still_answers_every_message(self):
+        events = converse([json.dumps({'id': i, **ADELIE}) for i in range(20)])
+
+        assert [json.loads(event['text'])['id'] for event in events[1:]] == list(range(20))
+
+    def test_malformed_record_does_not_stop_the_stream(self):
+        events = converse([json.dumps({'id': 1, **ADELIE, 'sex': ['male']}), json.dumps({'id': 2, **ADELIE})])
+
+        assert json.loads(events[1]['text'])['error'].startswith('sex:')
+        assert json.loads(events[2]['text']) == {'id': 2, 'species': 'Adelie'}
+
+    @override_settings(PENGUINS_WEBSOCKET_BACKLOG=1, PENGUINS_WEBSOCKET_BATCH_SIZE=1)
+    def test_failed_batch_is_answered_and_scoring_continues(self):
+        # The first batch fails inside the model call, later ones are scored as usual
+        failures = iter([RuntimeError('model failed')])
+
+        def score_records(records, model):
+            for error in failures:
+                raise error
+            return batch.score_records(records, model)
+
+        with patch.object(websocket, 'score_records', score_records), self.assertLogs('penguins.websocket'):
+            events = converse([json.dumps({'id': i, **ADELIE}) for i in range(5)])
+
+        assert [json.loads(event['text']) for event in events[1:]] == [
+            {'id': 0, 'error': 'The prediction failed'}, *({'id': i, 'species': 'Adelie'} for i in range(1, 5))]
+
+    def test_unknown_route_and_model_are_closed(self):
+        assert converse([], path='/ws/elsewhere/') == [{'type': 'websocket.close', 'code': 4404}]
+        assert converse([], query_string=b'model=does-not-exist') == [{'type': 'websocket.close', 'code': 4404}]
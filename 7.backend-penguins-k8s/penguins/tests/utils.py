@@ -0,0 +1,31 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+
+def run_check(script, settings_module='project.settings', settings_source=None, env=None, **params):
+    """
+    Run `script` in its own interpreter from the project directory, for
+    checks that need fresh imports or other settings than this process, and
+    return the JSON object it prints last.
+
+    `settings_source` becomes the settings module instead of
+    `settings_module`, formatted with the temporary `directory` it is
+    written to (for database files) and `params`.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings_module, **(env or {})}
+        if settings_source is not None:
+            Path(directory, 'check_settings.py').write_text(settings_source.format(directory=directory, **params))
+            env.update(DJANGO_SETTINGS_MODULE='check_settings',
+                       PYTHONPATH=os.pathsep.join([directory, str(settings.BASE_DIR)]))
+
+        output = subprocess.run([sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env, capture_output=True,
+                                text=True, check=True).stdout
+
+    return json.loads(output.strip().splitlines()[-1])
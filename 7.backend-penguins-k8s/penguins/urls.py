@@ -4,5 +4,16 @@ from . import views
 urlpatterns = [
     path('', views.PenguinController.as_view()),
     path('<int:pk>/', views.PenguinDetailController.as_view()),
+    path('<int:pk>/similar/', views.SimilarPenguinsController.as_view()),
+    path('similar/', views.SimilarMeasurementsController.as_view()),
     path('predict/', views.PenguinPredictController.as_view()),
+    path('predict/stream/', views.PenguinPredictStreamController.as_view()),
+    path('predict/packed/', views.predict_packed),
+    path('predict/fast/', views.predict_fast),
+    path('jobs/', views.PredictionJobController.as_view()),
+    path('jobs/<uuid:pk>/', views.PredictionJobDetailController.as_view()),
+    path('jobs/<uuid:pk>/result/', views.PredictionJobResultController.as_view()),
+    path('diagnostics/memory/', views.MemoryDiagnosticsController.as_view()),
+    path('models/', views.ModelRegistryController.as_view()),
+    path('models/promote/', views.ModelPromoteController.as_view()),
 ]
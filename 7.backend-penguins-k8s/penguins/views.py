@@ -1,32 +1,380 @@
+import json
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from rest_framework.generics import GenericAPIView, RetrieveUpdateDestroyAPIView, ListCreateAPIView
+from rest_framework.parsers import MultiPartParser, FileUploadParser
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework import status
-from .models import Penguin
-from .serializer import PenguinSerializer
+from . import jobs
+from .batch import parse_record, read_csv, stream_scored, write_csv
+from .diagnostics import memory_tracer
+from .features import NUMERIC_FIELDS, featurize
+from .lifecycle import lifecycle
+from .metrics import get_metrics, stage
+from .models import Penguin, PredictionJob
+from .registry import UnknownModelVersion, get_registry
+from .serializer import (MemoryReportQuerySerializer, MemoryTracingSerializer, ModelPromoteSerializer,
+                         PenguinSerializer, PredictionJobSerializer, SimilarMeasurementsSerializer,
+                         SimilarQuerySerializer)
 from .service import PenguinService
+from .shadow import get_shadow
+from .similarity import get_similarity_index, measurements
+from .sweep import get_sweeper
 
 
 class PenguinController(ListCreateAPIView):
     queryset = Penguin.objects.all()
     serializer_class = PenguinSerializer
 
+    def get_queryset(self):
+        # Stored predictions are indexed, so filtering by species is a cheap lookup
+        queryset = super().get_queryset()
+
+        species = self.request.query_params.get('species')
+        if species:
+            queryset = queryset.filter(predicted_species=species)
+
+        return queryset
+
+    def perform_create(self, serializer):
+        penguin = PenguinService.annotate(Penguin(**serializer.validated_data))
+        serializer.save(predicted_species=penguin.predicted_species, model_version=penguin.model_version)
+
 
 class PenguinDetailController(RetrieveUpdateDestroyAPIView):
     queryset = Penguin.objects.all()
     serializer_class = PenguinSerializer
 
+    def get_object(self):
+        penguin = super().get_object()
+
+        # Rows scored by an older model are answered with a fresh prediction, stored in the background,
+        # so reads never write and stay on a replica
+        if self.request.method == 'GET' and PenguinService.is_stale(penguin):
+            get_sweeper().defer(PenguinService.annotate(penguin))
+
+        return penguin
+
+    def perform_update(self, serializer):
+        penguin = serializer.instance
+        for attr, value in serializer.validated_data.items():
+            setattr(penguin, attr, value)
+
+        PenguinService.annotate(penguin)
+        serializer.save()
+
+
+class SimilarPenguinsController(APIView):
+
+    def get(self, request, pk, format=None):
+        query = SimilarQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+
+        penguin = get_object_or_404(Penguin.objects.all(), pk=pk)
+        return _similar(measurements(penguin), query.validated_data, exclude=penguin.pk)
+
+
+class SimilarMeasurementsController(APIView):
+
+    def get(self, request, format=None):
+        query = SimilarMeasurementsSerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+
+        return _similar([query.validated_data[name] for name in NUMERIC_FIELDS], query.validated_data)
+
+
+def _similar(values, query, exclude=None):
+    neighbors = get_similarity_index().search(values, query['k'], island=query.get('island'), sex=query.get('sex'),
+                                              exclude=exclude)
+
+    # Penguins deleted by another process since the index saw them are left out
+    penguins = Penguin.objects.in_bulk([neighbor.pk for neighbor in neighbors])
+    return Response([{'id': neighbor.pk, 'distance': round(neighbor.distance, 6),
+                      **PenguinSerializer(penguins[neighbor.pk]).data}
+                     for neighbor in neighbors if neighbor.pk in penguins], status=status.HTTP_200_OK)
+
 
 class PenguinPredictController(GenericAPIView):
     queryset = Penguin.objects.all()
     serializer_class = PenguinSerializer
 
     def post(self, request, format=None):
-        serializer = PenguinSerializer(data=request.data)
+        # Model version can be picked per request, otherwise the default alias is used
+        try:
+            model = get_registry().get(request.headers.get('X-Model-Version') or request.query_params.get('model'))
+        except UnknownModelVersion as e:
+            return Response({'model': [f'Unknown model version {e}']}, status=status.HTTP_400_BAD_REQUEST)
+
+        with stage('predict', 'parse'):
+            data = request.data
+
+        with stage('predict', 'validate'):
+            serializer = PenguinSerializer(data=data)
+            valid = serializer.is_valid()
+
+        if valid:
+            penguin = Penguin(**serializer.validated_data)
+            prediction = PenguinService.predict(penguin, model=model)
 
-        if serializer.is_valid():
-            penguin = Penguin.objects.create(**serializer.validated_data)
-            prediction = PenguinService.predict(penguin)
+            # Keep the prediction with the stored penguin
+            with stage('predict', 'db_write'):
+                penguin.predicted_species = prediction[0]
+                penguin.model_version = model.name
+                penguin.save()
 
-            return Response(prediction, status=status.HTTP_200_OK)
+            return Response(prediction, status=status.HTTP_200_OK, headers={'X-Model-Version': model.name})
 
         return Response(serializer.data, status=status.HTTP_400_BAD_REQUEST)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # Render here rather than later in the handler, so rendering can be timed as its own stage
+        response = super().finalize_response(request, response, *args, **kwargs)
+        with stage('predict', 'render'):
+            response.render()
+
+        return response
+
+
+class PenguinPredictStreamController(APIView):
+
+    def post(self, request, format=None):
+        try:
+            model = get_registry().get(request.headers.get('X-Model-Version') or
+                                       request.query_params.get('model'))
+        except UnknownModelVersion as e:
+            return Response({'model': [f'Unknown model version {e}']}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Read the body line by line and answer chunk by chunk, `request.data` would buffer the whole file
+        records = read_csv(_streamed_body(request))
+        rows = stream_scored(records, model.artifact, write_csv, settings.PENGUINS_STREAM_CHUNK_SIZE)
+
+        return StreamingHttpResponse(rows, content_type='text/csv', headers={'X-Model-Version': model.name})
+
+
+def _streamed_body(request):
+    if not isinstance(request._request, ASGIRequest):
+        return request.stream or []
+
+    # Under ASGI the body file is closed as soon as the view returns, before the response is streamed,
+    # so move the already received body to a file the response owns
+    copy = tempfile.TemporaryFile()
+    if request.stream:
+        shutil.copyfileobj(request.stream, copy)
+    copy.seek(0)
+
+    def lines():
+        with copy:
+            yield from copy
+
+    return lines()
+
+
+def _reject_constant(name):
+    raise ValueError(f'{name} is not valid JSON')
+
+
+@csrf_exempt
+@require_POST
+def predict_fast(request):
+    """
+    Same answer as `PenguinPredictController` without the DRF machinery:
+    no authentication, content negotiation, serializer construction or
+    browsable API, and the penguin is not stored.
+    """
+    if request.content_type != 'application/json':
+        return JsonResponse({'detail': 'Expected an application/json body'},
+                            status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+    try:
+        model = get_registry().get(request.headers.get('X-Model-Version') or request.GET.get('model'))
+    except UnknownModelVersion as e:
+        return JsonResponse({'model': [f'Unknown model version {e}']}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        with stage('predict_fast', 'parse'):
+            data = json.loads(request.body, parse_constant=_reject_constant)
+            if not isinstance(data, dict):
+                raise ValueError('Expected a JSON object')
+
+        with stage('predict_fast', 'validate'):
+            row = parse_record(data)
+    except ValueError as e:
+        return JsonResponse({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    with stage('predict_fast', 'featurize'):
+        features = featurize([row], model.artifact.features)
+
+    with stage('predict_fast', 'model'):
+        prediction = model.artifact.predict(features)
+
+    with stage('predict_fast', 'render'):
+        return JsonResponse(prediction.tolist(), safe=False, headers={'X-Model-Version': model.name})
+
+
+@csrf_exempt
+@require_POST
+def predict_packed(request):
+    import numpy as np
+
+    from . import protocol
+
+    # Plain Django view: DRF content negotiation and parsers have nothing to offer a raw binary body
+    if request.content_type != 'application/octet-stream':
+        return JsonResponse({'detail': 'Expected an application/octet-stream body'},
+                            status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+    try:
+        model = get_registry().get(request.headers.get('X-Model-Version') or request.GET.get('model'))
+    except UnknownModelVersion as e:
+        return JsonResponse({'model': [f'Unknown model version {e}']}, status=status.HTTP_400_BAD_REQUEST)
+
+    if tuple(model.artifact.features) != protocol.FEATURES:
+        return JsonResponse({'model': [f'{model.name} does not use the packed protocol feature order']},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+    max_records = settings.PENGUINS_PACKED_MAX_RECORDS
+    if int(request.META.get('CONTENT_LENGTH') or 0) > protocol.REQUEST_HEADER.size + \
+            max_records * protocol.RECORD_DTYPE.itemsize:
+        return JsonResponse({'detail': f'At most {max_records} records are accepted per request'},
+                            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    # `request.read()` skips the form-data size limit on `request.body`, the length was checked above
+    try:
+        records = protocol.decode_request(request.read(), max_records)
+    except protocol.ProtocolError as e:
+        return JsonResponse({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    indices = np.full(len(records), protocol.INVALID, dtype=np.uint8)
+    valid = protocol.valid_records(records)
+    if valid.any():
+        features = np.column_stack([records[name][valid] for name in model.artifact.features])
+        indices[valid] = model.artifact.predict_indices(features)
+
+    return HttpResponse(protocol.encode_response(indices), content_type='application/octet-stream',
+                        headers={'X-Model-Version': model.name, 'X-Model-Classes': ','.join(model.artifact.classes)})
+
+
+class PredictionJobController(APIView):
+    parser_classes = [MultiPartParser, FileUploadParser]
+
+    def post(self, request, format=None):
+        upload = request.data.get('file')
+        if upload is None:
+            return Response({'file': ['Upload a CSV or NDJSON file']}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            version = get_registry().resolve(request.headers.get('X-Model-Version') or
+                                             request.query_params.get('model'))
+        except UnknownModelVersion as e:
+            return Response({'model': [f'Unknown model version {e}']}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = None
+        try:
+            job = jobs.create(input_file=upload, bytes_total=upload.size, model_version=version,
+                              input_format=jobs.input_format(upload, request.query_params.get('type')))
+            jobs.submit(job)
+        except jobs.JobQueueFull:
+            # Recorded, but this worker is about to be recycled
+            if job is not None:
+                job.delete()
+            return Response({'detail': 'Too many prediction jobs in progress'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '30'})
+
+        return Response(PredictionJobSerializer(job).data, status=status.HTTP_202_ACCEPTED,
+                        headers={'Location': f'{request.path}{job.pk}/'})
+
+
+class PredictionJobDetailController(APIView):
+    def get(self, request, pk, format=None):
+        job = get_object_or_404(PredictionJob, pk=pk)
+        return Response(PredictionJobSerializer(job).data, status=status.HTTP_200_OK)
+
+
+class PredictionJobResultController(APIView):
+    def get(self, request, pk, format=None):
+        job = get_object_or_404(PredictionJob, pk=pk)
+        if job.status != PredictionJob.Status.SUCCEEDED:
+            return Response(PredictionJobSerializer(job).data, status=status.HTTP_409_CONFLICT)
+
+        # Streamed from storage in blocks rather than read into memory
+        content_type = 'text/csv' if job.input_format == PredictionJob.Format.CSV else 'application/x-ndjson'
+        return FileResponse(job.output_file.open('rb'), as_attachment=True, content_type=content_type,
+                            filename=f'penguins-{job.pk}.{job.input_format}')
+
+
+class MemoryDiagnosticsController(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, format=None):
+        query = MemoryReportQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+
+        return Response(memory_tracer.report(**query.validated_data), status=status.HTTP_200_OK)
+
+    def post(self, request, format=None):
+        serializer = MemoryTracingSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        # `start` also takes a new baseline, `reset` only does that, `stop` releases the traces
+        action = serializer.validated_data['action']
+        if action == 'start':
+            memory_tracer.start(frames=serializer.validated_data['frames'])
+        elif action == 'reset':
+            memory_tracer.reset()
+        else:
+            memory_tracer.stop()
+
+        return Response({'tracing': memory_tracer.tracing}, status=status.HTTP_200_OK)
+
+
+class ModelRegistryController(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, format=None):
+        stats = get_registry().stats()
+
+        shadow = get_shadow()
+        stats['shadow'] = shadow.stats() if shadow is not None else None
+
+        return Response(stats, status=status.HTTP_200_OK)
+
+
+class ModelPromoteController(APIView):
+    permission_classes = [IsAdminUser]
+
+    def post(self, request, format=None):
+        serializer = ModelPromoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        registry = get_registry()
+        alias = serializer.validated_data.get('alias') or registry.default_alias
+
+        try:
+            version = registry.promote(serializer.validated_data['version'], alias)
+        except UnknownModelVersion as e:
+            return Response({'version': [f'Unknown model version {e}']}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({'alias': alias, 'version': version}, status=status.HTTP_200_OK)
+
+
+def metrics(request):
+    return HttpResponse(get_metrics().exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def healthz(request):
+    # Liveness: the process answers requests, nothing else is checked so a slow database never restarts the pod
+    return JsonResponse({'status': 'ok'})
+
+
+def readyz(request):
+    state = lifecycle.status()
+    return JsonResponse(state, status=status.HTTP_200_OK if state['ready'] else status.HTTP_503_SERVICE_UNAVAILABLE)
@@ -0,0 +1,112 @@
+import asyncio
+import itertools
+import json
+import logging
+from urllib.parse import parse_qs
+
+from django.conf import settings
+
+from penguins.batch import score_records
+from penguins.registry import UnknownModelVersion, get_registry
+
+logger = logging.getLogger(__name__)
+
+PATH = '/ws/penguins/predict/'
+
+_CLOSED = object()
+
+
+async def predict_socket(scope, receive, send):
+    """
+    Raw ASGI WebSocket endpoint for a continuous stream of measurements.
+
+    Each text message is one penguin as JSON, with the same fields as the
+    REST API plus an optional `id` that is echoed back:
+
+        -> {"id": 7, "island": "Dream", "sex": "female", "bill_length_mm": 46.5, ...}
+        <- {"id": 7, "species": "Chinstrap"}
+        <- {"id": 8, "error": "Bill Length (mm) must be greater than zero"}
+
+    Messages waiting in the connection's backlog are scored together in one
+    model call. The backlog is bounded: once it is full the socket stops
+    reading, so a client sending faster than the server scores is slowed
+    down by TCP flow control rather than buffered without limit.
+    """
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+
+    query = parse_qs(scope.get('query_string', b'').decode())
+    try:
+        model = get_registry().get(query.get('model', [None])[0]).artifact
+    except UnknownModelVersion:
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+
+    await send({'type': 'websocket.accept'})
+
+    backlog = asyncio.Queue(maxsize=settings.PENGUINS_WEBSOCKET_BACKLOG)
+    scorer = asyncio.create_task(_score(backlog, model, send))
+
+    try:
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+
+            if message['type'] == 'websocket.receive':
+                # Waits here while the backlog is full, which is the backpressure
+                await backlog.put(_parse(message))
+    finally:
+        await backlog.put(_CLOSED)
+        await scorer
+
+
+def _parse(message):
+    try:
+        record = json.loads(message.get('text') or message.get('bytes') or '')
+    except ValueError:
+        record = None
+
+    return record if isinstance(record, dict) else None
+
+
+async def _score(backlog, model, send):
+    closed = False
+    connected = True
+
+    while not closed:
+        # Wait for one message, then take the rest of the backlog along with it
+        records = [await backlog.get()]
+        while len(records) < settings.PENGUINS_WEBSOCKET_BATCH_SIZE and not backlog.empty():
+            records.append(backlog.get_nowait())
+
+        if records[-1] is _CLOSED:
+            closed = True
+            records.pop()
+
+        # Keep draining after a failed send, so the reader is never left waiting on a full backlog
+        if not records or not connected:
+            continue
+
+        # Scoring releases the event loop, other connections keep being served meanwhile. A batch that fails is
+        # answered with errors and the scorer carries on, so the connection keeps working
+        try:
+            results = iter(await asyncio.to_thread(score_records, [r for r in records if r is not None], model))
+        except Exception:
+            logger.exception('Scoring %s WebSocket messages failed', len(records))
+            results = itertools.repeat(('', 'The prediction failed'))
+
+        for record in records:
+            if record is None:
+                reply = {'error': 'Expected a JSON object'}
+            else:
+                species, error = next(results)
+                reply = {'id': record['id']} if 'id' in record else {}
+                reply.update({'error': error} if error else {'species': species})
+
+            try:
+                await send({'type': 'websocket.send', 'text': json.dumps(reply)})
+            except OSError:
+                connected = False
+                break
@@ -13,4 +13,40 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up, the WebSocket route needs settings and the model registry
+from penguins import websocket  # noqa: E402
+from penguins.lifecycle import lifecycle  # noqa: E402
+from penguins.metrics import get_metrics  # noqa: E402
+from penguins.sweep import get_sweeper  # noqa: E402
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Readiness waits for migrations, the model and warm-up, which run in the background from here.
+            # The server has installed its signal handlers by now, so draining on SIGTERM comes before its exit
+            lifecycle.start()
+            get_sweeper().start()
+            get_metrics().start()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+
+    # WebSocket prediction stream is served directly, everything else goes to Django
+    if scope['type'] == 'websocket':
+        if scope['path'] == websocket.PATH:
+            return await websocket.predict_socket(scope, receive, send)
+
+        await receive()
+        return await send({'type': 'websocket.close', 'code': 4404})
+
+    return await django_application(scope, receive, send)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'penguins.middleware.LifecycleMiddleware',
+    'penguins.middleware.MetricsMiddleware',
+    'penguins.middleware.AdmissionControlMiddleware',
+    'penguins.middleware.ReplicaRoutingMiddleware',
+    'penguins.middleware.QueryCountMiddleware',
+    'penguins.middleware.ProfilingMiddleware',
+    'penguins.middleware.AllocationLoggingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -82,6 +90,20 @@ DATABASES = {
     }
 }
 
+# Read replicas as SQLite copies of the primary, e.g. PENGUINS_DB_REPLICA_FILES=/data/replica0.sqlite3 (comma
+# separated). Other engines, such as a Postgres standby, are added as `replica*` aliases the same way. Tests mirror
+# every replica onto the default database, so the suite runs against a single database
+for index, name in enumerate(filter(None, os.environ.get('PENGUINS_DB_REPLICA_FILES', '').split(','))):
+    DATABASES[f'replica{index}'] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': name,
+                                    'TEST': {'MIRROR': 'default'}}
+
+# Penguin shards as SQLite files, e.g. PENGUINS_DB_SHARD_FILES=shard0=/data/shard0.sqlite3,shard1=/data/shard1.sqlite3
+for entry in filter(None, os.environ.get('PENGUINS_DB_SHARD_FILES', '').split(',')):
+    alias, _, name = entry.partition('=')
+    DATABASES[alias] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': name}
+
+DATABASE_ROUTERS = ['penguins.routers.ShardRouter', 'penguins.routers.PrimaryReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -118,3 +140,166 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.1/howto/static-files/
 
 STATIC_URL = '/static/'
+
+# Uploaded prediction job inputs and their results
+
+MEDIA_ROOT = BASE_DIR / 'media'
+
+
+# Decision Tree exports used by the penguins service, memory-mapped by every worker
+# See `5.decision-tree/decisiontree/model/export.py` and `penguins/registry.py`
+
+PENGUINS_MODEL_DIR = BASE_DIR / 'models'
+
+PENGUINS_MODEL_DEFAULT_ALIAS = 'live'
+
+PENGUINS_MODEL_CACHE_SIZE = 4
+
+# Candidate version or alias scored in the background against live predict traffic, None turns it off
+
+PENGUINS_SHADOW_MODEL = None
+
+PENGUINS_SHADOW_QUEUE_SIZE = 1000
+
+# Stale stored predictions (scored by another model than the default alias) are written in the background:
+# rows detail reads recomputed as they come, and a batch of the others every interval (seconds)
+
+PENGUINS_SWEEP_INTERVAL = 10.0
+
+PENGUINS_SWEEP_BATCH_SIZE = 1000
+
+# Bulk prediction jobs run on a thread pool in the process that accepted them. The limits are per node, shared
+# by every worker process through the job table: jobs running at once, and jobs accepted but not finished
+
+PENGUINS_JOB_WORKERS = 2
+
+PENGUINS_JOB_MAX_PENDING = 16
+
+PENGUINS_JOB_CHUNK_SIZE = 10000
+
+# Rows scored per chunk by the streaming CSV predict endpoint
+
+PENGUINS_STREAM_CHUNK_SIZE = 1000
+
+# Largest batch accepted by the packed binary predict endpoint, see `penguins/protocol.py`
+
+PENGUINS_PACKED_MAX_RECORDS = 1000000
+
+# WebSocket prediction stream (`/ws/penguins/predict/`): messages scored per model call,
+# and how many unscored messages a connection may queue before reads pause
+
+PENGUINS_WEBSOCKET_BATCH_SIZE = 256
+
+PENGUINS_WEBSOCKET_BACKLOG = 1024
+
+# Prometheus metrics served at `/metrics`. Worker processes share their values through files in this directory
+# so the exposition sums all of them; `manage.py serve` creates a temporary one when it is not set
+
+PENGUINS_METRICS_DIR = os.environ.get('PENGUINS_METRICS_DIR')
+
+PENGUINS_METRICS_FLUSH_INTERVAL = 1.0
+
+# Opt-in cProfile of single requests: send `X-Profile: <token>`, or sample a fraction of traffic
+
+PENGUINS_PROFILE_TOKEN = os.environ.get('PENGUINS_PROFILE_TOKEN')
+
+PENGUINS_PROFILE_SAMPLE_RATE = float(os.environ.get('PENGUINS_PROFILE_SAMPLE_RATE', 0))
+
+PENGUINS_PROFILE_DIR = os.environ.get('PENGUINS_PROFILE_DIR', BASE_DIR / 'profiles')
+
+PENGUINS_PROFILE_KEEP = 50
+
+PENGUINS_PROFILE_TOP = 8
+
+# Log per-request allocation deltas (via tracemalloc) for these URL patterns, off by default
+
+PENGUINS_LOG_ALLOCATIONS = os.environ.get('PENGUINS_LOG_ALLOCATIONS') == '1'
+
+PENGUINS_ALLOCATION_ROUTES = ('api/penguins/', 'api/penguins/predict/')
+
+# Per-request SQL instrumentation: statements slower than this are logged with their EXPLAIN plan,
+# and requests to these URL patterns may issue at most this many statements (on each shard, when sharded)
+
+PENGUINS_SLOW_QUERY_MS = float(os.environ.get('PENGUINS_SLOW_QUERY_MS', 100))
+
+PENGUINS_QUERY_BUDGETS = {
+    'api/penguins/': 1,
+    'api/penguins/<int:pk>/': 2,
+    'api/penguins/predict/': 1,
+    # The request that first builds the similarity index also loads the table
+    'api/penguins/<int:pk>/similar/': 3,
+    'api/penguins/similar/': 2,
+}
+
+PENGUINS_QUERY_BUDGET_STRICT = False
+
+# Admission control for the predict endpoints: requests beyond the concurrency limit wait in a bounded queue
+# for at most the timeout (seconds) since they reached the server, the rest get a 503 with Retry-After (seconds).
+# The limit is per worker process, `manage.py serve` defaults it to one below the threads of a worker
+
+PENGUINS_ADMISSION_LIMIT = int(os.environ.get('PENGUINS_ADMISSION_LIMIT', 0)) or None
+
+PENGUINS_ADMISSION_QUEUE_SIZE = int(os.environ.get('PENGUINS_ADMISSION_QUEUE_SIZE', 32))
+
+PENGUINS_ADMISSION_TIMEOUT = float(os.environ.get('PENGUINS_ADMISSION_TIMEOUT', 0.5))
+
+PENGUINS_ADMISSION_RETRY_AFTER = 1
+
+PENGUINS_ADMISSION_ROUTES = (
+    'api/penguins/predict/',
+    'api/penguins/predict/stream/',
+    'api/penguins/predict/packed/',
+    'api/penguins/predict/fast/',
+)
+
+# Start up and shutdown: warm-up inferences run before the pod reports ready, and on SIGTERM the pod stops being
+# ready, waits the delay (seconds) for endpoints to drop it, then up to the timeout for in-flight requests
+
+PENGUINS_WARMUP_ROUNDS = 20
+
+PENGUINS_WARMUP_BATCH_SIZE = 256
+
+PENGUINS_DRAIN_DELAY = float(os.environ.get('PENGUINS_DRAIN_DELAY', 5))
+
+PENGUINS_DRAIN_TIMEOUT = float(os.environ.get('PENGUINS_DRAIN_TIMEOUT', 20))
+
+# Production server (manage.py serve): gunicorn workers default to one per CPU of the container's cgroup limit,
+# each worker is recycled after max requests plus up to jitter more, to bound memory growth, once it runs no jobs
+
+PENGUINS_SERVER_BIND = os.environ.get('PENGUINS_SERVER_BIND', '0.0.0.0:8000')
+
+PENGUINS_SERVER_WORKERS = int(os.environ.get('PENGUINS_SERVER_WORKERS', 0)) or None
+
+PENGUINS_SERVER_THREADS = int(os.environ.get('PENGUINS_SERVER_THREADS', 4))
+
+PENGUINS_SERVER_KEEPALIVE = int(os.environ.get('PENGUINS_SERVER_KEEPALIVE', 5))
+
+PENGUINS_SERVER_MAX_REQUESTS = int(os.environ.get('PENGUINS_SERVER_MAX_REQUESTS', 10000))
+
+PENGUINS_SERVER_MAX_REQUESTS_JITTER = int(os.environ.get('PENGUINS_SERVER_MAX_REQUESTS_JITTER', 1000))
+
+PENGUINS_SERVER_TIMEOUT = int(os.environ.get('PENGUINS_SERVER_TIMEOUT', 30))
+
+# Read replicas: safe requests to these URL patterns read from one of the `replica*` database aliases,
+# everything else reads and writes the primary
+
+PENGUINS_DB_REPLICAS = [alias for alias in DATABASES if alias.startswith('replica')]
+
+PENGUINS_DB_REPLICA_ROUTES = ('api/penguins/', 'api/penguins/<int:pk>/')
+
+# Sharding of Penguin rows by island across database aliases, e.g. PENGUINS_SHARDS=Biscoe=shard0,Dream=shard1.
+# Islands not listed go to the default shard. Without either, every row stays in `default`
+
+PENGUINS_SHARDS = dict(entry.split('=', 1)
+                       for entry in filter(None, os.environ.get('PENGUINS_SHARDS', '').split(',')))
+
+PENGUINS_SHARD_DEFAULT = os.environ.get('PENGUINS_SHARD_DEFAULT', 'default')
+
+# Similar penguins: nearest neighbours by standardized measurements from an in-memory KD-tree. Penguins saved since
+# it was built are searched from a buffer until it holds the rebuild size or the tree reaches the max age (seconds)
+
+PENGUINS_SIMILAR_REBUILD_SIZE = 1000
+
+PENGUINS_SIMILAR_MAX_AGE = float(os.environ.get('PENGUINS_SIMILAR_MAX_AGE', 300))
+
+PENGUINS_SIMILAR_MAX_K = 100
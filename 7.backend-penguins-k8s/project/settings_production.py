@@ -0,0 +1,47 @@
+"""
+Settings for API pods, selected with `DJANGO_SETTINGS_MODULE=project.settings_production`.
+
+Everything in `project/settings.py` applies, except:
+- DEBUG is off, so executed SQL is no longer kept in `connection.queries`
+- only the middleware the JSON API needs runs, without sessions, CSRF,
+  messages or clickjacking protection, and the Django admin is not served
+- DRF renders and parses JSON only, no browsable API, and authenticates
+  admin endpoints with HTTP Basic instead of sessions
+- database connections are kept open between requests
+"""
+
+from project.settings import *  # noqa: F401,F403
+from project.settings import INSTALLED_APPS, MIDDLEWARE, TEMPLATES, DATABASES, os
+
+SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+
+DEBUG = False
+
+# Comma separated, including the pod IP the kubelet's HTTP probes send as Host
+ALLOWED_HOSTS = os.environ['DJANGO_ALLOWED_HOSTS'].split(',')
+
+# The admin needs sessions and messages, admin pages are served by pods on the default settings
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in ('django.contrib.admin', 'django.contrib.messages')]
+
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in (
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+)]
+
+TEMPLATES = [{**TEMPLATES[0], 'OPTIONS': {'context_processors': [
+    processor for processor in TEMPLATES[0]['OPTIONS']['context_processors'] if 'messages' not in processor
+]}}]
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+    'DEFAULT_PARSER_CLASSES': ['rest_framework.parsers.JSONParser'],
+    'DEFAULT_AUTHENTICATION_CLASSES': ['rest_framework.authentication.BasicAuthentication'],
+}
+
+# Seconds a connection is reused for, health checked before reuse after an error
+DATABASES = {alias: {**database, 'CONN_MAX_AGE': int(os.environ.get('DJANGO_CONN_MAX_AGE', 60)),
+                     'CONN_HEALTH_CHECKS': True}
+             for alias, database in DATABASES.items()}
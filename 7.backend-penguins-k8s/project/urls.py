@@ -13,9 +13,18 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
+from penguins.views import healthz, metrics, readyz
+
 urlpatterns = [
     path('api/penguins/', include('penguins.urls')),
-    path('admin/', admin.site.urls)]
+    path('metrics', metrics),
+    path('healthz', healthz),
+    path('readyz', readyz)]
+
+# API pods run without the admin, see `project/settings_production.py`
+if 'django.contrib.admin' in settings.INSTALLED_APPS:
+    urlpatterns.append(path('admin/', admin.site.urls))